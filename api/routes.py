@@ -1,30 +1,41 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 import os
+import time
 import json  # <-- ADICIONE ESTA LINHA
+import unicodedata
+from urllib.parse import quote
 from backend.main import WordStylerProcessor
+from backend.file_manager import FileManager
+from backend.job_queue import JobQueue
+from backend.sanitization_rules import SANITIZATION_PROFILES
 from backend.config import Config
 
 app = Flask(__name__)
 CORS(app)
 
+job_queue = JobQueue()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
-@app.route('/api/process', methods=['POST'])
-def process_document():
-    """Endpoint principal para processar documento"""
+def _read_process_request():
+    """
+    Valida o upload e os dados do formulário e salva o arquivo.
+    Retorna (dados, None) ou (None, resposta_de_erro).
+    """
     # Verifica se arquivo foi enviado
     if 'file' not in request.files:
-        return jsonify({'error': 'Nenhum arquivo enviado'}), 400
+        return None, (jsonify({'error': 'Nenhum arquivo enviado'}), 400)
     
     file = request.files['file']
     if file.filename == '':
-        return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
+        return None, (jsonify({'error': 'Nenhum arquivo selecionado'}), 400)
     
     if not allowed_file(file.filename):
-        return jsonify({'error': 'Tipo de arquivo não permitido. Use .docx'}), 400
+        return None, (jsonify({'error': 'Tipo de arquivo não permitido. Use .docx'}), 400)
     
     # Obtém dados do formulário
     data = request.form
@@ -32,42 +43,193 @@ def process_document():
     api_key = data.get('api_key')
     styles = json.loads(data.get('styles', '[]'))
     removal_prompts = json.loads(data.get('removal_prompts', '[]'))
+    sanitization_profile = data.get('sanitization_profile') or Config.SANITIZATION_PROFILE
     
     if not all([book_name, api_key, styles]):
-        return jsonify({'error': 'Dados incompletos'}), 400
+        return None, (jsonify({'error': 'Dados incompletos'}), 400)
     
-    # Salva arquivo temporariamente
-    filename = secure_filename(file.filename)
-    file_path = os.path.join(Config.UPLOAD_DIR, filename)
+    if sanitization_profile not in SANITIZATION_PROFILES:
+        return None, (jsonify({
+            'error': f'Perfil de sanitização desconhecido: {sanitization_profile}',
+            'available_profiles': sorted(SANITIZATION_PROFILES)
+        }), 400)
+    
+    # Salva arquivo temporariamente na área de trabalho do job, para que
+    # uploads com o mesmo nome não se sobrescrevam
+    job_id = FileManager.new_job_id()
+    filename = secure_filename(file.filename) or 'documento.docx'
+    file_path = os.path.join(FileManager.create_workspace(job_id), filename)
     file.save(file_path)
     
+    return {
+        'job_id': job_id,
+        'file_path': file_path,
+        'book_name': book_name,
+        'api_key': api_key,
+        'styles': styles,
+        'removal_prompts': removal_prompts,
+        'sanitization_profile': sanitization_profile
+    }, None
+
+def _enqueue(params):
+    try:
+        job_id = job_queue.submit(
+            params['file_path'], params['book_name'], params['api_key'],
+            params['styles'], params['removal_prompts'],
+            sanitization_profile=params['sanitization_profile'],
+            job_id=params['job_id']
+        )
+    except Exception as e:
+        # submit já marcou o job como falho; garante que o upload não fique para trás
+        FileManager.remove_workspace(params['job_id'])
+        return jsonify({'error': f'Não foi possível enfileirar o documento: {e}', 'job_id': params['job_id']}), 503
+    return jsonify({
+        'job_id': job_id,
+        'state': 'queued',
+        'status_url': f'/api/jobs/{job_id}',
+        'events_url': f'/api/jobs/{job_id}/events'
+    }), 202
+
+@app.route('/api/process', methods=['POST'])
+def process_document():
+    """
+    Endpoint principal para processar documento.
+    Com o campo 'async' = true, o documento é enfileirado (ver /api/jobs).
+    """
+    params, error = _read_process_request()
+    if error:
+        return error
+    
+    if request.form.get('async', '').lower() in ('1', 'true'):
+        return _enqueue(params)
+    
+    job_id = params['job_id']
+    file_path = params['file_path']
+    book_name = params['book_name']
+    api_key = params['api_key']
+    styles = params['styles']
+    removal_prompts = params['removal_prompts']
+    
     try:
         # Processa documento
         processor = WordStylerProcessor()
         result = processor.process_document(
-            file_path, book_name, api_key, styles, removal_prompts
+            file_path, book_name, api_key, styles, removal_prompts,
+            sanitization_profile=params['sanitization_profile'],
+            job_id=job_id
         )
         
-        # Remove arquivo temporário
-        os.remove(file_path)
-        
         return jsonify(result)
         
     except Exception as e:
-        # Remove arquivo em caso de erro
-        if os.path.exists(file_path):
-            os.remove(file_path)
         return jsonify({'error': str(e)}), 500
+    
+    finally:
+        # Remove a área de trabalho do job, com o arquivo enviado
+        FileManager.remove_workspace(job_id)
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Enfileira um documento para processamento assíncrono e retorna o id do job"""
+    params, error = _read_process_request()
+    if error:
+        return error
+    return _enqueue(params)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Retorna estado, etapa atual e resultado de um job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    return jsonify(job)
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Stream de progresso do job via Server-Sent Events.
+    Envia 'progress' a cada mudança de estado/etapa (com itens/s, tokens e ETA
+    durante a IA) e um 'done' final com o job completo, ou 'error' se o job
+    ficar Config.SSE_IDLE_TIMEOUT_SECONDS sem atualização.
+    """
+    if job_queue.get(job_id) is None:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    
+    def generate():
+        last_update = None
+        last_sent = time.time()
+        while True:
+            job = job_queue.get(job_id)
+            if job is None:
+                yield _sse('error', {'error': 'Job não encontrado'})
+                return
+            
+            if job['updated_at'] != last_update:
+                last_update = job['updated_at']
+                last_sent = time.time()
+                yield _sse('progress', {
+                    'job_id': job_id,
+                    'state': job['state'],
+                    'stage': job['stage'],
+                    'progress': job['progress']
+                })
+            
+            if job['state'] in ('completed', 'failed'):
+                yield _sse('done', job)
+                return
+            
+            # Job parado (ex.: worker morto sem registrar falha): não espera para sempre
+            if time.time() - job['updated_at'] >= Config.SSE_IDLE_TIMEOUT_SECONDS:
+                yield _sse('error', {
+                    'job_id': job_id,
+                    'error': f"Nenhuma atualização do job há {int(Config.SSE_IDLE_TIMEOUT_SECONDS)}s"
+                })
+                return
+            
+            # Comentário periódico mantém a conexão viva em proxies
+            if time.time() - last_sent >= Config.SSE_KEEPALIVE_SECONDS:
+                last_sent = time.time()
+                yield ': keepalive\n\n'
+            
+            time.sleep(Config.SSE_POLL_INTERVAL)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/api/download/<path:filename>', methods=['GET'])
 def download_file(filename):
-    """Endpoint para download de arquivos"""
-    file_path = os.path.join(Config.OUTPUT_DIR, filename)
+    """
+    Endpoint para download de arquivos. O ZIP é enviado em pedaços de
+    Config.DOWNLOAD_CHUNK_SIZE, sem carregar o arquivo inteiro na memória.
+    """
+    file_path = safe_join(Config.OUTPUT_DIR, filename)
     
-    if not os.path.exists(file_path):
+    if file_path is None or not os.path.isfile(file_path):
         return jsonify({'error': 'Arquivo não encontrado'}), 404
     
-    return send_file(file_path, as_attachment=True)
+    if not file_path.endswith('.zip'):
+        return send_file(file_path, as_attachment=True)
+    
+    response = Response(
+        stream_with_context(FileManager.iter_file_chunks(file_path)),
+        mimetype='application/zip',
+        direct_passthrough=True,
+        headers={'Content-Length': str(os.path.getsize(file_path))}
+    )
+    # Nome do livro pode ter acentos: versão ASCII + filename* (RFC 5987), como no send_file
+    download_name = os.path.basename(file_path)
+    ascii_name = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+    names = {'filename': ascii_name}
+    if ascii_name != download_name:
+        names['filename*'] = f"UTF-8''{quote(download_name)}"
+    response.headers.set('Content-Disposition', 'attachment', **names)
+    return response
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
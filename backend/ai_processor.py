@@ -1,110 +1,600 @@
 # Substitua todo o conteúdo de backend/ai_processor.py por este código:
 
+import asyncio
+import json
+import threading
 import time
 import requests
-from typing import List, Dict
+from typing import Callable, Iterable, List, Dict, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from backend.config import Config
+from backend.classification_cache import ClassificationCache
+from backend.rate_limiter import AdaptiveRateLimiter
+from backend.rule_classifier import RuleClassifier
+from backend.document_reader import classify_line
+
+# Motor assíncrono (opcional): httpx com HTTP/2 se o pacote 'h2' estiver instalado
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+class _ParagraphFeed:
+    """
+    Consome um iterável de parágrafos em uma thread, acumulando-os na lista
+    'target', para que a classificação comece antes do fim da leitura.
+    """
+
+    def __init__(self, source: Iterable[Dict], target: List[Dict]):
+        self.target = target
+        self.done = False
+        self.error = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._consume, args=(source,), daemon=True)
+        self._thread.start()
+
+    def _consume(self, source: Iterable[Dict]):
+        try:
+            for item in source:
+                with self._cond:
+                    self.target.append(item)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    def wait_for(self, count: int) -> int:
+        """Bloqueia até haver 'count' itens lidos (ou o fim da leitura) e retorna quantos há"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.done or len(self.target) >= count)
+            if self.error is not None:
+                raise self.error
+            return len(self.target)
 
 class AIProcessor:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, engine: str = None):
         self.api_key = api_key
         self.model = Config.GPT_MODEL
-        self.api_url = "https://api.openai.com/v1/chat/completions"
+        self.api_url = Config.OPENAI_API_URL
+        self.engine = engine or Config.AI_ENGINE
+        self.max_workers = Config.AI_MAX_WORKERS
         self.styles = []
         self.removal_prompts = []
         self.total_prompt_tokens = 0
         self.total_completion_tokens = 0
-        print(f"AIProcessor inicializado com modelo: {self.model} (Modo Concorrente Otimizado)")
+
+        # Sessão compartilhada pelas threads: reaproveita conexões (keep-alive)
+        # em vez de pagar um handshake TLS por requisição
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+        if self.engine == 'asyncio' and httpx is None:
+            print("AVISO: httpx não está instalado - usando o motor com threads.")
+            self.engine = 'threads'
+        self.rate_limiter = self._create_rate_limiter()
+        print(f"AIProcessor inicializado com modelo: {self.model} (Modo Concorrente Otimizado, motor: {self.engine})")
 
     # Em backend/ai_processor.py
 
     def _get_style_for_single_paragraph(self, para_data: Dict, all_paragraphs: List[Dict]) -> tuple:
         """
         Pede à IA o estilo para um único parágrafo e retorna uma tupla:
-        (paragrafo_atualizado, prompt_tokens, completion_tokens)
+        (paragrafo_atualizado, prompt_tokens, completion_tokens, respondido)
+        
+        'respondido' é False quando a requisição falhou ou a resposta não era um
+        marcador válido (o parágrafo fica sem marcador, mas o resultado não é cacheado).
         """
-        i = para_data['index']
-        total_paragraphs = len(all_paragraphs)
+        data = self._build_single_request(para_data, all_paragraphs)
+        result = self._call_api(data, timeout=45)
+        return self._handle_single_result(para_data, result)
+
+    async def _get_style_for_single_paragraph_async(self, client, para_data: Dict, all_paragraphs: List[Dict]) -> tuple:
+        """Versão assíncrona de _get_style_for_single_paragraph"""
+        data = self._build_single_request(para_data, all_paragraphs)
+        result = await self._call_api_async(client, data, timeout=45)
+        return self._handle_single_result(para_data, result)
 
-        prev_text = all_paragraphs[i-1]['text'] if i > 0 else "INÍCIO DO DOCUMENTO"
-        current_text = para_data['text']
-        next_text = all_paragraphs[i+1]['text'] if i < total_paragraphs - 1 else "FIM DO DOCUMENTO"
+    def _build_single_request(self, para_data: Dict, all_paragraphs: List[Dict]) -> Dict:
+        inputs = self._classification_inputs(para_data, all_paragraphs)
         
         # A linha abaixo é a que faltava para passar as "dicas" para o prompt
-        user_prompt = self._build_user_prompt(prev_text, current_text, next_text, para_data)
+        user_prompt = self._build_user_prompt(inputs['prev_text'], inputs['current_text'], inputs['next_text'], para_data)
         system_prompt = self._build_system_prompt()
 
-        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-        data = {
+        return {
             "model": self.model,
             "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
             "temperature": 0.05,
             "max_tokens": 50
         }
 
+    def _handle_single_result(self, para_data: Dict, result: Optional[Dict]) -> tuple:
         prompt_tokens, completion_tokens = 0, 0
         marker = "[[NONE]]"
+        answered = False
+
+        if result is not None:
+            if 'usage' in result:
+                # Captura os tokens desta chamada específica
+                prompt_tokens = result['usage'].get('prompt_tokens', 0)
+                completion_tokens = result['usage'].get('completion_tokens', 0)
+
+            api_marker = result['choices'][0]['message']['content'].strip()
+            
+            if api_marker in self._valid_markers():
+                marker = api_marker
+            answered = marker == api_marker or api_marker == "[[NONE]]"
+
+        self._set_marker(para_data, marker)
+        return para_data, prompt_tokens, completion_tokens, answered
+
+    def _get_styles_for_batch(self, batch: List[Dict], all_paragraphs: List[Dict]) -> tuple:
+        """
+        Pede à IA os estilos de uma janela de parágrafos em uma única
+        requisição. Retorna uma tupla:
+        (marcadores_por_indice, prompt_tokens, completion_tokens)
+        
+        Índices ausentes em marcadores_por_indice não puderam ser validados e
+        devem ser reprocessados individualmente.
+        """
+        data = self._build_batch_request(batch, all_paragraphs)
+        result = self._call_api(data, timeout=90)
+        return self._handle_batch_result(batch, result)
+
+    async def _get_styles_for_batch_async(self, client, batch: List[Dict], all_paragraphs: List[Dict]) -> tuple:
+        """Versão assíncrona de _get_styles_for_batch"""
+        data = self._build_batch_request(batch, all_paragraphs)
+        result = await self._call_api_async(client, data, timeout=90)
+        return self._handle_batch_result(batch, result)
+
+    def _build_batch_request(self, batch: List[Dict], all_paragraphs: List[Dict]) -> Dict:
+        system_prompt = self._build_system_prompt() + self._build_batch_instructions()
+        user_prompt = self._build_batch_user_prompt(batch, all_paragraphs)
+
+        return {
+            "model": self.model,
+            "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+            "temperature": 0.05,
+            "max_tokens": 30 * len(batch) + 50,
+            "response_format": {"type": "json_object"}
+        }
+
+    def _handle_batch_result(self, batch: List[Dict], result: Optional[Dict]) -> tuple:
+        prompt_tokens, completion_tokens = 0, 0
+        markers_by_index = {}
+
+        if result is not None:
+            if 'usage' in result:
+                prompt_tokens = result['usage'].get('prompt_tokens', 0)
+                completion_tokens = result['usage'].get('completion_tokens', 0)
+
+            content = result['choices'][0]['message']['content']
+            markers_by_index = self._parse_batch_response(content, {p['index'] for p in batch})
+
+        return markers_by_index, prompt_tokens, completion_tokens
 
+    def _call_api(self, data: Dict, timeout: int) -> Optional[Dict]:
+        """
+        POST na API usando a sessão compartilhada, sob o controle do rate limiter
+        (vaga de concorrência + orçamento por minuto). 429/5xx/falhas de conexão são
+        repetidos com backoff. Retorna None se todas as tentativas falharem.
+        """
+        limiter = self.rate_limiter
+        estimated_tokens = self._estimate_tokens(data)
+
+        for attempt in range(limiter.max_retries + 1):
+            status_code, headers, result = None, None, None
+
+            limiter.acquire()
+            try:
+                wait = limiter.reserve(estimated_tokens)
+                if wait > 0:
+                    time.sleep(wait)
+                response = self._session.post(self.api_url, headers=self._build_headers(), json=data, timeout=timeout)
+                status_code, headers = response.status_code, response.headers
+                if status_code == 200:
+                    result = response.json()
+            except (requests.exceptions.RequestException, ValueError):
+                pass
+            finally:
+                limiter.release()
+
+            done = self._register_response(status_code, headers, result)
+            if done:
+                return result
+            if not limiter.is_retryable(status_code) or attempt == limiter.max_retries:
+                break
+            time.sleep(limiter.backoff_delay(attempt, headers))
+
+        limiter.record_failure()
+        return None
+
+    async def _call_api_async(self, client, data: Dict, timeout: int) -> Optional[Dict]:
+        """Versão assíncrona de _call_api, usando o pool de conexões do cliente httpx"""
+        limiter = self.rate_limiter
+        estimated_tokens = self._estimate_tokens(data)
+
+        for attempt in range(limiter.max_retries + 1):
+            status_code, headers, result = None, None, None
+
+            await limiter.acquire_async()
+            try:
+                wait = limiter.reserve(estimated_tokens)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                response = await client.post(self.api_url, headers=self._build_headers(), json=data, timeout=timeout)
+                status_code, headers = response.status_code, response.headers
+                if status_code == 200:
+                    result = response.json()
+            except (httpx.HTTPError, ValueError):
+                pass
+            finally:
+                await limiter.release_async()
+
+            done = self._register_response(status_code, headers, result)
+            if done:
+                return result
+            if not limiter.is_retryable(status_code) or attempt == limiter.max_retries:
+                break
+            await asyncio.sleep(limiter.backoff_delay(attempt, headers))
+
+        limiter.record_failure()
+        return None
+
+    def _register_response(self, status_code: Optional[int], headers, result: Optional[Dict]) -> bool:
+        """Alimenta o rate limiter com a resposta; True se a resposta é utilizável"""
+        limiter = self.rate_limiter
+        limiter.update_from_headers(headers)
+        if status_code == 200 and result is not None:
+            limiter.on_success()
+            return True
+        if status_code == 429:
+            limiter.on_throttle()
+        return False
+
+    def _estimate_tokens(self, data: Dict) -> int:
+        """Estimativa grosseira (~4 caracteres por token) + max_tokens, como a OpenAI contabiliza"""
+        prompt_chars = sum(len(m['content']) for m in data['messages'])
+        return prompt_chars // 4 + data.get('max_tokens', 0)
+
+    def _create_rate_limiter(self) -> AdaptiveRateLimiter:
+        max_concurrency = Config.AI_ASYNC_MAX_IN_FLIGHT if self.engine == 'asyncio' else self.max_workers
+        return AdaptiveRateLimiter(
+            max_concurrency=max_concurrency,
+            initial_concurrency=Config.AI_INITIAL_CONCURRENCY,
+            max_retries=Config.AI_MAX_RETRIES
+        )
+
+    def _run_requests(self, worker: str, items: List, all_paragraphs: List[Dict], on_result: Callable):
+        """
+        Executa worker(item, all_paragraphs) para cada item com o motor configurado e
+        chama on_result(item, resultado, exceção) na thread principal, na ordem de
+        conclusão.
+        
+        - 'threads': ThreadPoolExecutor com até AI_MAX_WORKERS requisições simultâneas.
+        - 'asyncio': um único event loop com até AI_ASYNC_MAX_IN_FLIGHT requisições
+          em andamento sobre um pool de conexões httpx (HTTP/2 quando disponível).
+        """
+        if self.engine == 'asyncio':
+            asyncio.run(self._run_requests_async(worker, items, all_paragraphs, on_result))
+            return
+
+        func = getattr(self, worker)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            future_to_item = {executor.submit(func, item, all_paragraphs): item for item in items}
+            for future in as_completed(future_to_item):
+                item = future_to_item[future]
+                try:
+                    result, exc = future.result(), None
+                except Exception as e:
+                    result, exc = None, e
+                on_result(item, result, exc)
+
+    async def _run_requests_async(self, worker: str, items: List, all_paragraphs: List[Dict], on_result: Callable):
+        func = getattr(self, f"{worker}_async")
+        max_in_flight = Config.AI_ASYNC_MAX_IN_FLIGHT
+        semaphore = asyncio.Semaphore(max_in_flight)
+        limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+        async with httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=limits) as client:
+            async def run(item):
+                async with semaphore:
+                    try:
+                        return item, await func(client, item, all_paragraphs), None
+                    except Exception as exc:
+                        return item, None, exc
+
+            for next_done in asyncio.as_completed([run(item) for item in items]):
+                item, result, exc = await next_done
+                on_result(item, result, exc)
+
+    def _parse_batch_response(self, content: str, expected_indices: set) -> Dict[int, str]:
+        """
+        Valida a resposta JSON de um lote e mapeia cada marcador de volta ao
+        'index' do parágrafo. Entradas inválidas, duplicadas ou de índices que não
+        pertencem ao lote são descartadas.
+        """
         try:
-            response = requests.post(self.api_url, headers=headers, json=data, timeout=45)
-            if response.status_code == 200:
-                result = response.json()
-                if 'usage' in result:
-                    # Captura os tokens desta chamada específica
-                    prompt_tokens = result['usage'].get('prompt_tokens', 0)
-                    completion_tokens = result['usage'].get('completion_tokens', 0)
-
-                api_marker = result['choices'][0]['message']['content'].strip()
-                all_valid_markers = [s['marker'] for s in self.styles] + [r['startMarker'] for r in self.removal_prompts] + [r['endMarker'] for r in self.removal_prompts]
-                
-                if api_marker in all_valid_markers:
-                    marker = api_marker
-        except requests.exceptions.RequestException:
-            pass 
+            payload = json.loads(content)
+        except (TypeError, ValueError):
+            return {}
 
-        para_data['markers'] = [marker] if marker != "[[NONE]]" else []
-        # Retorna os 3 valores
-        return para_data, prompt_tokens, completion_tokens
+        items = payload.get('results') if isinstance(payload, dict) else payload
+        if not isinstance(items, list):
+            return {}
+
+        valid_markers = set(self._valid_markers())
+        valid_markers.add("[[NONE]]")
+
+        markers_by_index = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get('index'))
+            except (TypeError, ValueError):
+                continue
+            marker = str(item.get('marker', '')).strip()
+            if index in expected_indices and index not in markers_by_index and marker in valid_markers:
+                markers_by_index[index] = marker
 
-    def process_document(self, paragraphs: List[Dict], styles: List[Dict], removal_prompts: List[Dict]) -> Dict:
-        """Processa o documento de forma concorrente para máxima velocidade e precisão."""
+        return markers_by_index
+
+    def process_document(self, paragraphs: Iterable[Dict], styles: List[Dict], removal_prompts: List[Dict],
+                         batch_size: int = None, use_cache: bool = None, use_rules: bool = None,
+                         deduplicate: bool = None, progress_callback: Callable = None) -> Dict:
+        """
+        Processa o documento de forma concorrente para máxima velocidade e precisão.
+        
+        Parágrafos óbvios (regras declaradas nos estilos, vazios, só imagem) são
+        resolvidos localmente pelo RuleClassifier. Parágrafos já classificados em execuções anteriores (mesmo modelo, prompts e
+        contexto) são respondidos pelo ClassificationCache sem chamar a API. Dentro da
+        execução, parágrafos com entradas idênticas ("GABARITO", "Resposta:", ...) são
+        agrupados: uma requisição por grupo, com o resultado replicado para os demais.
+        
+        Com batch_size > 1, janelas de parágrafos são classificadas em uma única
+        requisição; apenas os parágrafos cuja resposta não pôde ser validada
+        voltam para o modo de uma requisição por parágrafo.
+        
+        As requisições são disparadas pelo motor escolhido em self.engine
+        ('threads' ou 'asyncio'), ver _run_requests.
+        
+        'paragraphs' pode ser uma lista ou um iterável (ex.: DocumentReader.iter_paragraphs
+        no modo 'stream'). No segundo caso a leitura continua em uma thread enquanto
+        trechos de Config.AI_STREAM_SEGMENT_SIZE parágrafos já são classificados.
+        
+        progress_callback(concluídos, total, tokens), se informado, é chamado a cada
+        parágrafo resolvido (regras, cache ou IA). Durante a leitura em streaming o
+        total é o número de parágrafos lidos até o momento.
+        """
         self.styles = styles
         self.removal_prompts = removal_prompts
         self.total_prompt_tokens = 0
         self.total_completion_tokens = 0
 
-        marked_content = [None] * len(paragraphs)
-        total_paragraphs = len(paragraphs)
-        
-        # Define o número de trabalhadores (requisições simultâneas)
-        # Um bom ponto de partida é entre 10 e 20.
-        MAX_WORKERS = 20
+        if batch_size is None:
+            batch_size = Config.AI_BATCH_SIZE
+        if use_cache is None:
+            use_cache = Config.CLASSIFICATION_CACHE_ENABLED
+        if use_rules is None:
+            use_rules = Config.RULE_PRECLASSIFIER_ENABLED
+        if deduplicate is None:
+            deduplicate = Config.AI_DEDUP_ENABLED
 
-        print(f"Iniciando processamento concorrente de {total_paragraphs} parágrafos com até {MAX_WORKERS} workers...")
+        # Entrada em streaming: 'paragraphs' passa a ser a lista preenchida pela leitura
+        feed = None
+        if not isinstance(paragraphs, list):
+            source = paragraphs
+            paragraphs = []
+            feed = _ParagraphFeed(source, paragraphs)
+
+        marked_content = []
+        api_calls = 0
+        batch_calls = 0
+        rule_classified = 0
+        deduplicated = 0
+        self.rate_limiter = self._create_rate_limiter()
+        concurrency = self.rate_limiter.max_concurrency
+        resolved = 0
+
+        def report(count: int):
+            nonlocal resolved
+            resolved += count
+            if progress_callback:
+                progress_callback(resolved, len(paragraphs), self.total_prompt_tokens + self.total_completion_tokens)
+
+        rule_classifier = RuleClassifier(styles) if use_rules else None
+        cache = ClassificationCache() if use_cache else None
+        system_prompt = self._build_system_prompt() if cache else None
+        cache_keys = {}
+        new_cache_entries = {}
+        group_leader = {}
+        followers = {}
+
+        def fan_out(leader: Dict) -> int:
+            """Replica o resultado do representante para os parágrafos idênticos"""
+            group = followers.pop(leader['index'], [])
+            for para in group:
+                para['markers'] = list(leader.get('markers', []))
+                marked_content[para['index']] = para
+            return len(group)
+
+        def process_segment(segment: List[Dict]):
+            nonlocal api_calls, batch_calls, rule_classified, deduplicated
+            pending = segment
+
+            # --- Pré-classificação local por regras ---
+            if rule_classifier and pending:
+                pending = []
+                for para in segment:
+                    marker = rule_classifier.classify(para)
+                    if marker is None:
+                        pending.append(para)
+                    else:
+                        self._set_marker(para, marker)
+                        marked_content[para['index']] = para
+                classified = len(segment) - len(pending)
+                rule_classified += classified
+                print(f"Pré-classificação por regras: {classified} parágrafos resolvidos localmente.")
+                report(classified)
+
+            # --- Consulta ao cache de classificações ---
+            inputs_by_index = {para['index']: self._classification_inputs(para, paragraphs) for para in pending}
+            if cache and pending:
+                for para in pending:
+                    cache_keys[para['index']] = ClassificationCache.make_key(self.model, system_prompt, inputs_by_index[para['index']])
+
+                cached = cache.get_many(cache_keys[para['index']] for para in pending)
+                to_classify = []
+                for para in pending:
+                    marker = cached.get(cache_keys[para['index']])
+                    if marker is None:
+                        to_classify.append(para)
+                    else:
+                        self._set_marker(para, marker)
+                        marked_content[para['index']] = para
+                print(f"Cache de classificações: {len(pending) - len(to_classify)} parágrafos reaproveitados, {len(to_classify)} para a IA.")
+                report(len(pending) - len(to_classify))
+                pending = to_classify
+
+            # --- Deduplicação: uma requisição por grupo de entradas idênticas ---
+            if deduplicate and pending:
+                representatives = []
+                reused = 0
+                for para in pending:
+                    key = json.dumps(inputs_by_index[para['index']], ensure_ascii=False, sort_keys=True)
+                    leader = group_leader.get(key)
+                    if leader is None:
+                        group_leader[key] = para
+                        representatives.append(para)
+                    elif marked_content[leader['index']] is not None:
+                        # Representante de um trecho anterior, já resolvido
+                        para['markers'] = list(leader.get('markers', []))
+                        marked_content[para['index']] = para
+                        reused += 1
+                    else:
+                        followers.setdefault(leader['index'], []).append(para)
+                grouped = len(pending) - len(representatives)
+                deduplicated += grouped
+                if grouped:
+                    print(f"Deduplicação: {len(pending)} parágrafos agrupados em {len(representatives)} requisições distintas.")
+                report(reused)
+                pending = representatives
+
+            if batch_size > 1 and pending:
+                # Parágrafos sem contexto vão em lotes próprios, para não servirem de
+                # vizinhos (nem terem vizinhos) no prompt dos demais
+                context_free = [para for para in pending if self._ignores_context(para)]
+                with_context = [para for para in pending if not self._ignores_context(para)]
+                batches = [group[i:i + batch_size]
+                           for group in (with_context, context_free)
+                           for i in range(0, len(group), batch_size)]
+                print(f"Iniciando processamento em lote de {len(pending)} parágrafos "
+                      f"({len(batches)} lotes de até {batch_size}) com até {concurrency} requisições simultâneas...")
+
+                failed = []
+                batch_progress = {'processed': 0, 'total': len(pending)}
+
+                def on_batch_result(batch, result, exc):
+                    nonlocal api_calls, batch_calls
+                    if exc is not None:
+                        print(f'Lote iniciado no parágrafo {batch[0]["index"]} gerou uma exceção: {exc}')
+                        result = ({}, 0, 0)
+                    markers_by_index, p_tokens, c_tokens = result
 
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            future_to_para = {executor.submit(self._get_style_for_single_paragraph, para, paragraphs): para['index'] for para in paragraphs}
-            
-            processed_count = 0
-            for future in as_completed(future_to_para):
-                original_index = future_to_para[future]
-                try:
-                    # Coleta os 3 valores retornados
-                    result_para, p_tokens, c_tokens = future.result()
                     self.total_prompt_tokens += p_tokens
                     self.total_completion_tokens += c_tokens
-                    marked_content[original_index] = result_para
-                except Exception as exc:
-                    print(f'Parágrafo {original_index} gerou uma exceção: {exc}')
-                    marked_content[original_index] = next(p for p in paragraphs if p['index'] == original_index)
-
-                processed_count += 1
-                if processed_count % 50 == 0 or processed_count == total_paragraphs:
-                    print(f"  Processados {processed_count}/{total_paragraphs} parágrafos...")
-        
+                    api_calls += 1
+                    batch_calls += 1
+
+                    completed = 0
+                    for para in batch:
+                        marker = markers_by_index.get(para['index'])
+                        if marker is None:
+                            failed.append(para)
+                            continue
+                        self._set_marker(para, marker)
+                        marked_content[para['index']] = para
+                        completed += 1 + fan_out(para)
+                        if cache:
+                            new_cache_entries[cache_keys[para['index']]] = marker
+                    report(completed)
+
+                    batch_progress['processed'] += len(batch)
+                    print(f"  Processados {batch_progress['processed']}/{batch_progress['total']} parágrafos em lote...")
+
+                self._run_requests('_get_styles_for_batch', batches, paragraphs, on_batch_result)
+
+                pending = sorted(failed, key=lambda p: p['index'])
+                if pending:
+                    print(f"  {len(pending)} parágrafos sem resposta válida no lote serão reprocessados individualmente...")
+
+            if pending:
+                print(f"Iniciando processamento concorrente de {len(pending)} parágrafos com até {concurrency} requisições simultâneas...")
+
+                progress = {'processed': 0, 'total': len(pending)}
+
+                def on_single_result(para, result, exc):
+                    nonlocal api_calls
+                    original_index = para['index']
+                    if exc is not None:
+                        print(f'Parágrafo {original_index} gerou uma exceção: {exc}')
+                        marked_content[original_index] = para
+                    else:
+                        result_para, p_tokens, c_tokens, answered = result
+                        self.total_prompt_tokens += p_tokens
+                        self.total_completion_tokens += c_tokens
+                        marked_content[original_index] = result_para
+                        if cache and answered:
+                            new_cache_entries[cache_keys[original_index]] = result_para['markers'][0] if result_para['markers'] else "[[NONE]]"
+                    report(1 + fan_out(para))
+                    api_calls += 1
+
+                    progress['processed'] += 1
+                    if progress['processed'] % 50 == 0 or progress['processed'] == progress['total']:
+                        print(f"  Processados {progress['processed']}/{progress['total']} parágrafos...")
+
+                self._run_requests('_get_style_for_single_paragraph', pending, paragraphs, on_single_result)
+
+        if feed is None:
+            marked_content.extend([None] * len(paragraphs))
+            process_segment(list(paragraphs))
+        else:
+            # Cada trecho só é processado quando o parágrafo seguinte já foi lido,
+            # para que o contexto "próximo parágrafo" (e o FIM DO DOCUMENTO) esteja correto
+            segment_size = Config.AI_STREAM_SEGMENT_SIZE
+            start = 0
+            while True:
+                available = feed.wait_for(start + segment_size + 1)
+                end = available if feed.done else start + segment_size
+                if end <= start:
+                    break
+                marked_content.extend([None] * (end - start))
+                print(f"Streaming: classificando parágrafos {start} a {end - 1} ({available} lidos até agora)...")
+                process_segment(paragraphs[start:end])
+                start = end
+
+        total_paragraphs = len(paragraphs)
+        cache_stats = {'cache_hits': 0, 'cache_misses': 0}
+        if cache:
+            cache.put_many(new_cache_entries)
+            cache_stats = cache.stats()
+            cache.close()
+
         # Adiciona uma pequena pausa para não sobrecarregar a API entre diferentes execuções
-        time.sleep(1)
+        if api_calls:
+            time.sleep(1)
 
         marked_count = sum(1 for p in marked_content if p and p.get('markers'))
         total_cost = self._calculate_cost()
@@ -112,12 +602,72 @@ class AIProcessor:
             'total_paragraphs': total_paragraphs,
             'marked': marked_count,
             'unmarked': total_paragraphs - marked_count,
-            'api_calls': total_paragraphs,
+            'api_calls': api_calls,
+            'batch_calls': batch_calls,
+            'batch_fallbacks': api_calls - batch_calls if batch_calls else 0,
+            'prompt_tokens': self.total_prompt_tokens,
+            'completion_tokens': self.total_completion_tokens,
+            'rule_classified': rule_classified,
+            'deduplicated': deduplicated,
+            'cache_hits': cache_stats['cache_hits'],
+            'cache_misses': cache_stats['cache_misses'],
+            **self.rate_limiter.stats(),
             'estimated_cost_usd': total_cost
         }
 
         return {'marked_content': marked_content, 'stats': stats}
 
+    def _classification_inputs(self, para_data: Dict, all_paragraphs: List[Dict]) -> Dict:
+        """
+        Tudo o que a IA recebe sobre um parágrafo: contexto vizinho (já truncado como
+        no prompt), texto atual e dicas de imagem/lista. Serve de chave do cache.
+        """
+        i = para_data['index']
+        total_paragraphs = len(all_paragraphs)
+
+        if self._ignores_context(para_data):
+            prev_text = next_text = "CONTEXTO IGNORADO"
+        else:
+            prev_text = all_paragraphs[i-1]['text'] if i > 0 else "INÍCIO DO DOCUMENTO"
+            next_text = all_paragraphs[i+1]['text'] if i < total_paragraphs - 1 else "FIM DO DOCUMENTO"
+        is_list_item = bool(para_data.get('is_list_item'))
+
+        return {
+            'prev_text': prev_text[:500],
+            'current_text': para_data['text'],
+            'next_text': next_text[:500],
+            'is_image_paragraph': bool(para_data.get('is_image_paragraph', False)),
+            'is_list_item': is_list_item,
+            'list_type': para_data.get('list_type', 'unknown') if is_list_item else None
+        }
+
+    @staticmethod
+    def _ignores_context(para_data: Dict) -> bool:
+        """
+        Linhas muito curtas ou estruturais (configurável) são classificadas sem o
+        contexto vizinho, para que ocorrências repetidas colapsem em um único grupo
+        na deduplicação e no cache.
+        """
+        text = (para_data.get('text') or '').strip()
+        if Config.AI_CONTEXT_FREE_MAX_CHARS and len(text) <= Config.AI_CONTEXT_FREE_MAX_CHARS:
+            return True
+        if Config.AI_CONTEXT_FREE_LINE_TYPES and classify_line(text) in Config.AI_CONTEXT_FREE_LINE_TYPES:
+            return True
+        return False
+
+    @staticmethod
+    def _set_marker(para_data: Dict, marker: str):
+        para_data['markers'] = [marker] if marker != "[[NONE]]" else []
+
+    def _build_headers(self) -> Dict:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    def _valid_markers(self) -> List[str]:
+        """Todos os marcadores que a IA pode devolver (estilos + início/fim de remoção)"""
+        return ([s['marker'] for s in self.styles]
+                + [r['startMarker'] for r in self.removal_prompts]
+                + [r['endMarker'] for r in self.removal_prompts])
+
     def _calculate_cost(self) -> float:
         input_cost = (self.total_prompt_tokens / 1_000_000) * Config.GPT4_1_INPUT_PRICE_PER_MILLION_TOKENS
         output_cost = (self.total_completion_tokens / 1_000_000) * Config.GPT4_1_OUTPUT_PRICE_PER_MILLION_TOKENS
@@ -148,17 +698,75 @@ ESTILOS DISPONÍVEIS:
         """Constrói o prompt do usuário com contexto e informações do parágrafo"""
         prompt = f'CONTEXTO ANTERIOR: """{prev_text[:500]}"""\n'
         prompt += f'PARÁGRAFO ATUAL PARA CLASSIFICAR: """{current_text}"""\n'
+        prompt += self._build_paragraph_hints(para_data)
+        prompt += f'CONTEXTO POSTERIOR: """{next_text[:500]}"""\n\n'
+        prompt += "Qual é o marcador para o PARÁGRAFO ATUAL?"
+        return prompt
+
+    def _build_paragraph_hints(self, para_data: Dict) -> str:
+        """Avisos sobre imagem/lista anexados logo após o texto do parágrafo"""
+        hints = ""
         
         # Verifica se é um parágrafo de imagem
         is_image_para = para_data.get('is_image_paragraph', False)
         if is_image_para:
-            prompt += "(AVISO: Este parágrafo contém apenas uma imagem e nenhum texto.)\n"
+            hints += "(AVISO: Este parágrafo contém apenas uma imagem e nenhum texto.)\n"
             
         # Adiciona informações sobre listas se relevante
         if para_data.get('is_list_item'):
             list_type = para_data.get('list_type', 'unknown')
-            prompt += f"(AVISO: Este é um item de lista do tipo: {list_type})\n"
-            
-        prompt += f'CONTEXTO POSTERIOR: """{next_text[:500]}"""\n\n'
-        prompt += "Qual é o marcador para o PARÁGRAFO ATUAL?"
+            hints += f"(AVISO: Este é um item de lista do tipo: {list_type})\n"
+        
+        return hints
+
+    def _build_batch_instructions(self) -> str:
+        """Instruções extras do modo lote, anexadas ao prompt do sistema"""
+        return """
+MODO LOTE:
+Você receberá VÁRIOS parágrafos consecutivos, cada um identificado por `<<índice>>`.
+Classifique CADA um deles usando as regras acima. Neste modo a regra 1 é substituída: responda APENAS com um objeto JSON no formato
+{"results": [{"index": <índice>, "marker": "<marcador>"}, ...]}
+com exatamente uma entrada por parágrafo recebido, na mesma ordem. Use `[[NONE]]` quando nenhum estilo se aplicar.
+"""
+
+    def _build_batch_user_prompt(self, batch: List[Dict], all_paragraphs: List[Dict]) -> str:
+        """
+        Constrói o prompt de um lote. Parágrafos consecutivos do próprio lote servem de
+        contexto uns para os outros; sempre que o vizinho de um parágrafo não está no
+        lote (bordas da janela ou lacunas deixadas pelo cache), ele entra como linha de
+        CONTEXTO, sobrepondo-se aos lotes adjacentes.
+        
+        Parágrafos que ignoram o contexto (_ignores_context) não recebem linhas de
+        CONTEXTO e vêm com um aviso para serem classificados isoladamente, como no
+        modo individual: a resposta é cacheada e replicada sob a chave sem contexto.
+        """
+        total_paragraphs = len(all_paragraphs)
+        batch_indices = {p['index'] for p in batch}
+        context_shown = set()
+
+        def context_line(i: int) -> str:
+            if i in batch_indices or i in context_shown:
+                return ""
+            context_shown.add(i)
+            if i < 0:
+                text = "INÍCIO DO DOCUMENTO"
+            elif i >= total_paragraphs:
+                text = "FIM DO DOCUMENTO"
+            else:
+                text = all_paragraphs[i]['text']
+            return f'CONTEXTO (não classificar): """{text[:500]}"""\n'
+
+        prompt = "PARÁGRAFOS PARA CLASSIFICAR (linhas de CONTEXTO servem apenas de referência):\n"
+        for para in batch:
+            i = para['index']
+            if self._ignores_context(para):
+                prompt += f'<<{i}>> """{para["text"]}"""\n'
+                prompt += self._build_paragraph_hints(para)
+                prompt += "(AVISO: classifique este parágrafo isoladamente, sem usar os parágrafos vizinhos.)\n"
+                continue
+            prompt += context_line(i - 1)
+            prompt += f'<<{i}>> """{para["text"]}"""\n'
+            prompt += self._build_paragraph_hints(para)
+            prompt += context_line(i + 1)
+        prompt += "\nQual é o marcador de cada parágrafo marcado com <<índice>>? Responda no formato JSON indicado."
         return prompt
\ No newline at end of file
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, Optional
+from backend.config import Config
+
+class ClassificationCache:
+    """
+    Cache persistente (SQLite) dos marcadores devolvidos pela IA.
+
+    A chave é o hash de tudo que influencia a resposta: modelo, prompt do sistema,
+    contexto anterior/atual/posterior e as dicas de imagem/lista. Assim, reprocessar
+    o mesmo livro depois de alterar um único prompt de estilo só paga pelos
+    parágrafos afetados. O tamanho é limitado com despejo LRU.
+    """
+
+    # Limite de parâmetros por consulta do SQLite
+    _CHUNK_SIZE = 500
+
+    def __init__(self, db_path: str = None, max_entries: int = None):
+        self.db_path = db_path or os.path.join(Config.CACHE_DIR, 'classifications.sqlite3')
+        self.max_entries = max_entries or Config.CLASSIFICATION_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS classifications ('
+            ' key TEXT PRIMARY KEY,'
+            ' marker TEXT NOT NULL,'
+            ' last_used REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_last_used ON classifications (last_used)')
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, inputs: Dict) -> str:
+        """Gera a chave de conteúdo para um parágrafo"""
+        payload = json.dumps([model, system_prompt, inputs], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Busca vários marcadores de uma vez, atualizando o uso das entradas encontradas"""
+        keys = list(keys)
+        unique_keys = list(dict.fromkeys(keys))
+        found = {}
+
+        for start in range(0, len(unique_keys), self._CHUNK_SIZE):
+            chunk = unique_keys[start:start + self._CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self._conn.execute(
+                f'SELECT key, marker FROM classifications WHERE key IN ({placeholders})', chunk
+            ).fetchall()
+            found.update(rows)
+
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                'UPDATE classifications SET last_used = ? WHERE key = ?',
+                [(now, key) for key in found]
+            )
+            self._conn.commit()
+
+        # Contadores por consulta (parágrafo), não por chave distinta
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, entries: Dict[str, str]):
+        """Grava vários marcadores e aplica o limite de tamanho"""
+        if not entries:
+            return
+
+        now = time.time()
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO classifications (key, marker, last_used) VALUES (?, ?, ?)',
+            [(key, marker, now) for key, marker in entries.items()]
+        )
+        self._evict()
+        self._conn.commit()
+
+    def _evict(self):
+        """Remove as entradas menos usadas recentemente quando o limite é excedido"""
+        count = self._conn.execute('SELECT COUNT(*) FROM classifications').fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                'DELETE FROM classifications WHERE key IN '
+                '(SELECT key FROM classifications ORDER BY last_used ASC LIMIT ?)',
+                (excess,)
+            )
+
+    def stats(self) -> Dict:
+        return {'cache_hits': self.hits, 'cache_misses': self.misses}
+
+    def close(self):
+        self._conn.close()
@@ -9,19 +9,107 @@ class Config:
     
     # Directories
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    UPLOAD_DIR = os.path.join(BASE_DIR, 'uploads')
     OUTPUT_DIR = os.path.join(BASE_DIR, 'output')
     TEMP_DIR = os.path.join(BASE_DIR, 'temp')
+    CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+    JOBS_DIR = os.path.join(BASE_DIR, 'jobs')
+    # Área de trabalho isolada de cada job (upload, saída parcial):
+    # TEMP_DIR/jobs/<id do job>, removida só pelo próprio job
+    WORKSPACE_DIR = os.path.join(TEMP_DIR, 'jobs')
+    
+    # Fila de jobs assíncronos (processos que executam o pipeline)
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    
+    # Progresso via Server-Sent Events (segundos)
+    SSE_POLL_INTERVAL = float(os.getenv('SSE_POLL_INTERVAL', 0.5))
+    # Encerra o stream se o job não tiver nenhuma atualização por este tempo
+    SSE_IDLE_TIMEOUT_SECONDS = float(os.getenv('SSE_IDLE_TIMEOUT_SECONDS', 900))
+    SSE_KEEPALIVE_SECONDS = 15
+    
+    # Leitura do .docx: 'fast' percorre o XML do corpo direto com lxml;
+    # 'docx' usa os objetos do python-docx (mais lento, mesmo resultado);
+    # 'stream' lê word/document.xml do zip com iterparse, descartando cada nó
+    # após o uso, e a IA começa a classificar enquanto a leitura continua
+    READER_MODE = os.getenv('READER_MODE', 'fast')
+    # Emite cada parágrafo das células (classificável e estilizável) em vez de um
+    # único elemento com o texto da tabela
+    READER_TABLE_CELLS = os.getenv('READER_TABLE_CELLS', '0') == '1'
+    
+    # Parágrafos de várias linhas que o leitor dividiu (was_split) viram um w:p
+    # por linha, cada um com o estilo da sua marcação; com '0', o parágrafo
+    # inteiro recebe o estilo do primeiro elemento marcado
+    STYLE_SPLIT_PARAGRAPHS = os.getenv('STYLE_SPLIT_PARAGRAPHS', '1') == '1'
+    
+    # Remoção dos trechos entre os marcadores de início/fim dos prompts de remoção
+    CONTENT_REMOVAL_ENABLED = os.getenv('CONTENT_REMOVAL_ENABLED', '1') == '1'
+    
+    # Sanitização: 'fast' limpa os w:rPr direto no XML em uma varredura do corpo;
+    # 'docx' usa as propriedades de fonte do python-docx (só o corpo e só para o
+    # perfil 'legacy')
+    SANITIZER_MODE = os.getenv('SANITIZER_MODE', 'fast')
+    # Perfil padrão de sanitização (ver SANITIZATION_PROFILES); cada job pode
+    # escolher outro pelo campo 'sanitization_profile'
+    SANITIZATION_PROFILE = os.getenv('SANITIZATION_PROFILE', 'default')
+    # Cabeçalhos, rodapés, notas e comentários são sanitizados em processos
+    # separados quando somam ao menos este tamanho (bytes de XML). O pool é
+    # único por processo e fica pequeno, pois cada worker da fila tem o seu
+    SANITIZER_WORKERS = int(os.getenv('SANITIZER_WORKERS', 2))
+    SANITIZER_PARALLEL_MIN_BYTES = int(os.getenv('SANITIZER_PARALLEL_MIN_BYTES', 512 * 1024))
+    
+    # Documentos de simulados: 'template' abre cada documento a partir de um molde
+    # do pacote de origem (estilos, numeração, mídias) e copia os w:p direto no XML;
+    # 'docx' parte de um Document() vazio e recria estilos e runs pelo python-docx
+    SPLITTER_BUILDER = os.getenv('SPLITTER_BUILDER', 'template')
     
     # File settings
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
     ALLOWED_EXTENSIONS = {'docx'}
+    # Saída: os documentos são serializados em memória e o ZIP é montado a partir
+    # desses buffers; com '0', os .docx avulsos não são gravados (só o ZIP)
+    OUTPUT_LOOSE_FILES = os.getenv('OUTPUT_LOOSE_FILES', '1') == '1'
+    # Tamanho de cada pedaço enviado no download (o arquivo nunca é lido inteiro)
+    DOWNLOAD_CHUNK_SIZE = int(os.getenv('DOWNLOAD_CHUNK_SIZE', 256 * 1024))
     
     # OpenAI settings
     GPT_MODEL = "gpt-4.1"  # Modelo mais recente e eficiente
+    OPENAI_API_URL = os.getenv('OPENAI_API_URL', 'https://api.openai.com/v1/chat/completions')
     MAX_TOKENS_PER_REQUEST = 4000
     TEMPERATURE = 0.3
     
+    # Classificação em lote: quantos parágrafos consecutivos vão em uma única
+    # requisição (1 = modo antigo, uma requisição por parágrafo)
+    AI_BATCH_SIZE = int(os.getenv('AI_BATCH_SIZE', 20))
+    
+    # Motor de requisições: 'threads' (ThreadPoolExecutor) ou 'asyncio' (httpx)
+    AI_ENGINE = os.getenv('AI_ENGINE', 'threads')
+    AI_MAX_WORKERS = int(os.getenv('AI_MAX_WORKERS', 64))
+    AI_ASYNC_MAX_IN_FLIGHT = int(os.getenv('AI_ASYNC_MAX_IN_FLIGHT', 200))
+    
+    # Leitura em streaming: tamanho dos trechos enviados à IA enquanto o resto
+    # do documento ainda está sendo lido
+    AI_STREAM_SEGMENT_SIZE = int(os.getenv('AI_STREAM_SEGMENT_SIZE', 500))
+    
+    # Rate limiter adaptativo: a concorrência parte deste valor e se ajusta (AIMD)
+    # entre 1 e o máximo do motor conforme a API responde 429 ou sucesso
+    AI_INITIAL_CONCURRENCY = int(os.getenv('AI_INITIAL_CONCURRENCY', 20))
+    AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', 5))
+    
+    # Pré-classificação local (regras dos estilos, parágrafos vazios/só imagem)
+    RULE_PRECLASSIFIER_ENABLED = os.getenv('RULE_PRECLASSIFIER_ENABLED', '1') == '1'
+    RULES_SKIP_EMPTY_PARAGRAPHS = True
+    
+    # Deduplicação de parágrafos idênticos dentro da mesma execução. Linhas com até
+    # AI_CONTEXT_FREE_MAX_CHARS caracteres (0 = desativado) ou cujo tipo em
+    # LINE_PATTERNS esteja em AI_CONTEXT_FREE_LINE_TYPES (ex.: ('answer',)) são
+    # classificadas sem o contexto vizinho, colapsando mais ocorrências
+    AI_DEDUP_ENABLED = os.getenv('AI_DEDUP_ENABLED', '1') == '1'
+    AI_CONTEXT_FREE_MAX_CHARS = int(os.getenv('AI_CONTEXT_FREE_MAX_CHARS', 0))
+    AI_CONTEXT_FREE_LINE_TYPES = tuple(t for t in os.getenv('AI_CONTEXT_FREE_LINE_TYPES', '').split(',') if t)
+    
+    # Cache persistente de classificações (reaproveitado entre execuções)
+    CLASSIFICATION_CACHE_ENABLED = os.getenv('CLASSIFICATION_CACHE_ENABLED', '1') == '1'
+    CLASSIFICATION_CACHE_MAX_ENTRIES = int(os.getenv('CLASSIFICATION_CACHE_MAX_ENTRIES', 200_000))
+    
     # Preços do GPT-4 (em USD por milhão de tokens)
     GPT4_1_INPUT_PRICE_PER_MILLION_TOKENS = 2.0   # $0.01 por 1K tokens
     GPT4_1_OUTPUT_PRICE_PER_MILLION_TOKENS = 8.0  # $0.03 por 1K tokens
@@ -29,5 +117,5 @@ class Config:
     @staticmethod
     def create_directories():
         """Cria diretórios necessários se não existirem"""
-        for directory in [Config.UPLOAD_DIR, Config.OUTPUT_DIR, Config.TEMP_DIR]:
+        for directory in [Config.OUTPUT_DIR, Config.TEMP_DIR, Config.WORKSPACE_DIR, Config.CACHE_DIR, Config.JOBS_DIR]:
             os.makedirs(directory, exist_ok=True)
\ No newline at end of file
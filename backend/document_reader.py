@@ -1,32 +1,429 @@
 from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.enum.text import WD_UNDERLINE
+from docx.opc.coreprops import CoreProperties
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from docx.oxml.simpletypes import ST_HpsMeasure, ST_OnOff
+from docx.styles import BabelFish
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from lxml import etree
+from backend.config import Config
+from backend.elements import DocumentElement, RunFormatTable
 import os
+import posixpath
 import re
+import zipfile
+
+# Padrões de linha que indicam tipos de conteúdo diferentes em livros de simulados.
+# Compilados uma única vez; usados para decidir a divisão de parágrafos e pelo
+# RuleClassifier (pré-classificação local).
+LINE_PATTERNS = {
+    'question': [
+        re.compile(r'^\d+[\.\)]\s', re.IGNORECASE),  # Numeração de questão (1. ou 1))
+        re.compile(r'^\d+\s*[-–]\s', re.IGNORECASE),  # 1 - 
+        re.compile(r'^Questão\s+\d+', re.IGNORECASE),  # "Questão 1"
+        re.compile(r'^Q\d+[\.\)]\s', re.IGNORECASE),  # Q1. ou Q1)
+        re.compile(r'^QUESTÃO\s+\d+', re.IGNORECASE),  # QUESTÃO 1
+    ],
+    'alternative': [
+        re.compile(r'^[a-eA-E][\.\)]\s', re.IGNORECASE),  # a) b) c) d) e) ou a. b. c. etc
+        re.compile(r'^\([a-eA-E]\)', re.IGNORECASE),  # (a) (b) (c) etc
+        re.compile(r'^[A-E]\s*[-–]\s', re.IGNORECASE),  # A - B - C - etc
+    ],
+    'answer': [
+        re.compile(r'^Resposta:', re.IGNORECASE),
+        re.compile(r'^Gabarito:', re.IGNORECASE),
+        re.compile(r'^Alternativa correta:', re.IGNORECASE),
+        re.compile(r'^[a-eA-E]\d+\s*[-–]', re.IGNORECASE),  # a1- b2- etc (padrão de gabarito)
+        re.compile(r'^GABARITO', re.IGNORECASE),
+    ],
+    'title': [
+        re.compile(r'^Simulado\s+\d+', re.IGNORECASE),
+        re.compile(r'^SIMULADO\s+\d+', re.IGNORECASE),
+        re.compile(r'^Prova\s+\d+', re.IGNORECASE),
+        re.compile(r'^Teste\s+\d+', re.IGNORECASE),
+    ],
+    'subtitle': [
+        re.compile(r'^Estudos\s+\d+', re.IGNORECASE),
+        re.compile(r'^Parte\s+[IVX]+', re.IGNORECASE),
+        re.compile(r'^Seção\s+\d+', re.IGNORECASE),
+    ]
+}
+
+# Apenas letra seguida de espaço: indica alternativa ao decidir a divisão de linhas,
+# mas é fraco demais para classificar sozinho ("A casa...", "E então...")
+LOOSE_ALTERNATIVE_PATTERN = re.compile(r'^[a-eA-E]\s', re.IGNORECASE)
+
+# Tags e consultas usadas na varredura do corpo do documento
+BODY_TAG = qn('w:body')
+P_TAG = qn('w:p')
+TBL_TAG = qn('w:tbl')
+SECT_PR_TAG = qn('w:sectPr')
+SECTION_IN_PARAGRAPH = f"{qn('w:pPr')}/{qn('w:sectPr')}"
+# Imagem dentro de um run direto do parágrafo (mesmo critério de para.runs)
+INLINE_IMAGE_XPATH = './w:r[.//w:drawing or .//w:pict]'
+
+# --- Leitura direta do XML (modo 'fast') ---
+# Consultas compiladas uma vez; funcionam tanto nos elementos do python-docx quanto
+# em árvores lxml puras
+_NS = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+_HAS_INLINE_IMAGE = etree.XPath(f'boolean({INLINE_IMAGE_XPATH})', namespaces=_NS)
+_HAS_NUM_PR = etree.XPath('boolean(.//w:numPr)', namespaces=_NS)
+_HAS_LVL_TEXT = etree.XPath('boolean(.//w:lvlText)', namespaces=_NS)
+
+R_TAG = qn('w:r')
+HYPERLINK_TAG = qn('w:hyperlink')
+_W_VAL = qn('w:val')
+_W_TYPE = qn('w:type')
+_P_STYLE = f"{qn('w:pPr')}/{qn('w:pStyle')}"
+_R_PR = qn('w:rPr')
+_T_TAG = qn('w:t')
+_BR_TAG = qn('w:br')
+_CR_TAG = qn('w:cr')
+# Equivalente textual do conteúdo de um run (mesma regra de CT_R.text)
+_RUN_CONTENT_TEXT = {
+    qn('w:tab'): '\t',
+    qn('w:ptab'): '\t',
+    qn('w:cr'): '\n',
+    qn('w:noBreakHyphen'): '-',
+}
+
+# Padrões de lista (compilados uma vez)
+_LETTER_ITEM = re.compile(r'^[a-zA-Z][\)\.]\s')
+_LETTER_A_E_ITEM = re.compile(r'^[a-eA-E][\)\.]\s')
+_PAREN_LETTER_ITEM = re.compile(r'^\([a-eA-E]\)')
+_NUMBER_ITEM = re.compile(r'^\d+[\)\.]\s')
+BULLET_PREFIXES = ('• ', '- ', '* ', '→ ', '▪ ')
+
+def _run_text(r_el) -> str:
+    parts = []
+    for child in r_el:
+        tag = child.tag
+        if tag == _T_TAG:
+            parts.append(child.text or '')
+        elif tag == _BR_TAG:
+            # Quebras de página/coluna não viram texto
+            if child.get(_W_TYPE) in (None, 'textWrapping'):
+                parts.append('\n')
+        else:
+            parts.append(_RUN_CONTENT_TEXT.get(tag, ''))
+    return ''.join(parts)
+
+def is_line_break(el) -> bool:
+    """w:br de quebra de linha (não de página/coluna) ou w:cr: vira '\\n' no texto"""
+    return el.tag == _CR_TAG or (el.tag == _BR_TAG and el.get(_W_TYPE) in (None, 'textWrapping'))
+
+def paragraph_text(p_el) -> str:
+    """Texto do w:p com a mesma regra de paragraph.text (runs diretos e de hyperlinks)"""
+    texts = []
+    for child in p_el:
+        if child.tag == R_TAG:
+            texts.append(_run_text(child))
+        elif child.tag == HYPERLINK_TAG:
+            texts.extend(_run_text(r) for r in child.iterchildren(R_TAG))
+    return ''.join(texts)
+
+def _on_off(rpr_el, tag):
+    """Valor tri-estado de uma propriedade liga/desliga (None quando ausente)"""
+    el = rpr_el.find(tag)
+    if el is None:
+        return None
+    val = el.get(_W_VAL)
+    return True if val is None else ST_OnOff.convert_from_xml(val)
+
+def _run_format_from_xml(r_el, text: str) -> dict:
+    """Mesmo dicionário de _extract_runs, lido direto do w:rPr"""
+    bold = italic = underline = font_size = font_color = None
+    rpr = r_el.find(_R_PR)
+    if rpr is not None:
+        bold = _on_off(rpr, qn('w:b'))
+        italic = _on_off(rpr, qn('w:i'))
+        u = rpr.find(qn('w:u'))
+        if u is not None and u.get(_W_VAL) is not None:
+            underline = WD_UNDERLINE.from_xml(u.get(_W_VAL))
+            if underline == WD_UNDERLINE.SINGLE:
+                underline = True
+            elif underline == WD_UNDERLINE.NONE:
+                underline = False
+        sz = rpr.find(qn('w:sz'))
+        if sz is not None and sz.get(_W_VAL) is not None:
+            # Tamanho zero vira None, como em run.font.size no caminho 'docx'
+            size = ST_HpsMeasure.convert_from_xml(sz.get(_W_VAL))
+            font_size = size.pt if size else None
+        color = rpr.find(qn('w:color'))
+        if color is not None and color.get(_W_VAL) not in (None, 'auto'):
+            font_color = RGBColor.from_string(color.get(_W_VAL))
+    return {
+        'text': text,
+        'bold': bold,
+        'italic': italic,
+        'underline': underline,
+        'font_size': font_size,
+        'font_color': font_color
+    }
+
+def _paragraph_from_xml(p_el):
+    """
+    Extrai de um w:p, em uma passada, o texto (runs e hyperlinks), o id do
+    estilo e os runs diretos com formatação. Retorna (texto, style_id, runs).
+    """
+    texts = []
+    runs = []
+    for child in p_el:
+        tag = child.tag
+        if tag == R_TAG:
+            text = _run_text(child)
+            texts.append(text)
+            runs.append(_run_format_from_xml(child, text))
+        elif tag == HYPERLINK_TAG:
+            texts.extend(_run_text(r) for r in child.iterchildren(R_TAG))
+    style = p_el.find(_P_STYLE)
+    style_id = style.get(_W_VAL) if style is not None else None
+    return ''.join(texts), style_id, runs
+
+def table_rows_from_xml(tbl_el):
+    """
+    Texto de cada célula, linha a linha, com a mesma grade de table.rows/row.cells
+    do python-docx: células mescladas (gridSpan/vMerge) se repetem.
+    """
+    col_count = len(tbl_el.findall(f"{qn('w:tblGrid')}/{qn('w:gridCol')}"))
+    cells = []
+    row_count = 0
+    for tr in tbl_el.iterchildren(qn('w:tr')):
+        row_count += 1
+        for tc in tr.iterchildren(qn('w:tc')):
+            grid_span = 1
+            v_merge = None
+            tc_pr = tc.find(qn('w:tcPr'))
+            if tc_pr is not None:
+                span_el = tc_pr.find(qn('w:gridSpan'))
+                if span_el is not None and span_el.get(_W_VAL):
+                    grid_span = int(span_el.get(_W_VAL))
+                merge_el = tc_pr.find(qn('w:vMerge'))
+                if merge_el is not None:
+                    v_merge = merge_el.get(_W_VAL) or 'continue'
+            for span_index in range(grid_span):
+                if v_merge == 'continue':
+                    cells.append(cells[-col_count])
+                elif span_index > 0:
+                    cells.append(cells[-1])
+                else:
+                    cells.append('\n'.join(_paragraph_from_xml(p)[0] for p in tc.iterchildren(P_TAG)))
+    return [cells[row * col_count:(row + 1) * col_count] for row in range(row_count)]
+
+# Parser sem resolução de entidades externas para o XML lido direto do zip
+_SAFE_PARSER = etree.XMLParser(resolve_entities=False, huge_tree=True)
+_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+def _main_part_names(package: zipfile.ZipFile):
+    """Localiza pelas relações do pacote o XML do documento principal e o de estilos"""
+    def targets(rels_path, base_dir):
+        if rels_path not in package.namelist():
+            return {}
+        rels = etree.fromstring(package.read(rels_path), parser=_SAFE_PARSER)
+        found = {}
+        for rel in rels.iterchildren(f'{_REL_NS}Relationship'):
+            target = rel.get('Target', '')
+            target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(base_dir, target))
+            found.setdefault(rel.get('Type', '').rsplit('/', 1)[-1], target)
+        return found
+    
+    document_part = targets('_rels/.rels', '').get('officeDocument', 'word/document.xml')
+    part_dir, part_name = posixpath.split(document_part)
+    styles_part = targets(posixpath.join(part_dir, '_rels', f'{part_name}.rels'), part_dir).get('styles', 'word/styles.xml')
+    return document_part, styles_part
+
+def paragraph_style_names(styles_el):
+    """
+    Mapa styleId -> nome (como o python-docx exibe) dos estilos de parágrafo,
+    mais o nome do estilo padrão. Recebe o elemento w:styles.
+    """
+    names = {}
+    seen_ids = set()
+    default_name = None
+    has_default = False
+    if styles_el is None:
+        return names, 'Normal'
+    for style in styles_el.iterchildren(qn('w:style')):
+        # Como no python-docx, vale o primeiro estilo com o id; se ele não for de
+        # parágrafo, o parágrafo cai no estilo padrão
+        style_id = style.get(qn('w:styleId'))
+        first = style_id not in seen_ids
+        seen_ids.add(style_id)
+        if (style.get(qn('w:type')) or 'paragraph') != 'paragraph':
+            continue
+        name_el = style.find(qn('w:name'))
+        raw_name = name_el.get(_W_VAL) if name_el is not None else None
+        name = BabelFish.internal2ui(raw_name) if raw_name is not None else None
+        if first:
+            names[style_id] = name
+        default = style.get(qn('w:default'))
+        if default is not None and ST_OnOff.convert_from_xml(default):
+            default_name = name
+            has_default = True
+    # Sem estilo padrão, para.style é None e o leitor usa 'Normal'
+    return names, (default_name if has_default else 'Normal')
+
+def classify_line(line: str) -> str:
+    """Retorna o tipo da linha segundo LINE_PATTERNS ('empty', 'text' ou a chave do padrão)"""
+    line_stripped = line.strip()
+    if not line_stripped:
+        return 'empty'
+    for pattern_type, pattern_list in LINE_PATTERNS.items():
+        for pattern in pattern_list:
+            if pattern.match(line_stripped):
+                return pattern_type
+    if LOOSE_ALTERNATIVE_PATTERN.match(line_stripped):
+        return 'alternative'
+    return 'text'
 
 class DocumentReader:
-    def __init__(self, file_path):
-        self.file_path = file_path
-        self.document = Document(file_path)
+    def __init__(self, source, mode: str = None):
+        """
+        'source' pode ser o caminho do .docx ou um Document já carregado; no
+        segundo caso o mesmo objeto é reaproveitado pelas etapas seguintes.
+        'mode' escolhe como read_paragraphs percorre o documento (Config.READER_MODE).
+        """
+        self.mode = mode or Config.READER_MODE
+        if isinstance(source, str):
+            self.file_path = source
+            # No modo 'stream' o python-docx não é usado na leitura
+            self.document = None if self.mode == 'stream' else Document(source)
+        else:
+            if self.mode == 'stream':
+                raise ValueError("O modo 'stream' precisa do caminho do arquivo, não de um Document")
+            self.file_path = None
+            self.document = source
+        self._body_scan = None
+        self._stream_style_names = None
+        # Formatações de run compartilhadas pelos elementos lidos
+        self.run_formats = RunFormatTable()
+    
+    def _scan_body(self):
+        """
+        Percorre o corpo do documento uma única vez (tempo linear) e guarda as
+        contagens de parágrafos, imagens, tabelas e seções para get_document_info.
+        """
+        if self._body_scan is not None:
+            return self._body_scan
+        
+        if self.mode == 'stream':
+            # As contagens saem da própria leitura em streaming
+            for _ in self._stream_block_sources():
+                pass
+            return self._body_scan
+        
+        paragraph_count = 0
+        image_count = 0
+        table_count = 0
+        section_count = 0
+        for element in self.document.element.body.iterchildren():
+            tag = element.tag
+            if tag == P_TAG:
+                paragraph_count += 1
+                image_count += _HAS_INLINE_IMAGE(element)
+                if element.find(SECTION_IN_PARAGRAPH) is not None:
+                    section_count += 1
+            elif tag == TBL_TAG:
+                table_count += 1
+            elif tag == SECT_PR_TAG:
+                section_count += 1
+        
+        self._body_scan = {
+            'total_paragraphs': paragraph_count,
+            'total_images': image_count,
+            'total_tables': table_count,
+            'total_sections': section_count
+        }
+        return self._body_scan
         
     def read_paragraphs(self):
         """Lê todos os parágrafos e elementos do documento incluindo imagens"""
-        elements = []
+        elements = list(self.iter_paragraphs())
+        
+        print(f"\nTotal de elementos lidos: {len(elements)}")
+        
+        # Conta tipos de elementos
+        types_count = {}
+        for elem in elements:
+            elem_type = elem['type']
+            types_count[elem_type] = types_count.get(elem_type, 0) + 1
+        
+        for elem_type, count in types_count.items():
+            print(f"  - {elem_type}: {count}")
+        
+        # Debug: mostra onde estão as imagens
+        image_positions = [elem['index'] for elem in elements if elem['type'] == 'image']
+        if image_positions:
+            print(f"  Posições das imagens: {image_positions}")
+        
+        return elements
+    
+    def iter_paragraphs(self):
+        """
+        Gera os elementos do documento um a um, na ordem do corpo (parágrafos e
+        tabelas intercalados). No modo 'stream' o XML é lido sob demanda, então quem
+        consome pode começar a trabalhar antes do fim da leitura.
+        
+        Cada elemento traz 'body_index', a posição do w:p/w:tbl entre os filhos do
+        corpo, usada pelo StyleApplier para achar o parágrafo em O(1). Com
+        Config.READER_TABLE_CELLS, os parágrafos das células são emitidos no lugar
+        do resumo da tabela, com 'cell_paragraph_index' (ordem dentro da tabela).
+        
+        Os elementos são DocumentElement (compactos, mas acessados como dicionário);
+        os runs referenciam as formatações de self.run_formats.
+        """
         element_index = 0
+        i = 0  # Ordem do parágrafo entre os parágrafos do corpo
         
-        # Primeiro, processa parágrafos normais
-        for i, para in enumerate(self.document.paragraphs):
+        for kind, body_index, cell_index, element, content in self._block_sources():
+            if kind == 'tbl':
+                table_text = []
+                for row in content:
+                    row_text = []
+                    for cell_text in row:
+                        if cell_text.strip():
+                            row_text.append(cell_text.strip())
+                    if row_text:
+                        table_text.append(' | '.join(row_text))
+                
+                if table_text:
+                    table = DocumentElement(
+                        self.run_formats,
+                        index=element_index,
+                        type='table',
+                        text='\n'.join(table_text),
+                        body_index=body_index,
+                        style='Table',
+                        markers=[]
+                    )
+                    # No modo 'stream' o nó é descartado logo após a leitura
+                    if self.mode != 'stream':
+                        table['original_element'] = element
+                    yield table
+                    element_index += 1
+                continue
+            
+            para_text, style_name, runs, has_inline_image = content
+            p_element = element
+            position = {'body_index': body_index}
+            if cell_index is None:
+                para_index = location = i
+                i += 1
+            else:
+                para_index = None
+                location = f"{body_index}.{cell_index} (tabela)"
+                position['cell_paragraph_index'] = cell_index
+            
             # Verifica se o parágrafo contém imagem inline
-            has_inline_image = False
-            for run in para.runs:
-                if run._element.xpath('.//w:drawing') or run._element.xpath('.//w:pict'):
-                    has_inline_image = True
-                    print(f"  Imagem inline detectada no parágrafo {i}")
-                    break
-            is_image_paragraph = has_inline_image and not para.text.strip()
+            if has_inline_image:
+                print(f"  Imagem inline detectada no parágrafo {location}")
+            is_image_paragraph = has_inline_image and not para_text.strip()
             
             # Verifica se o parágrafo tem múltiplas linhas que deveriam ser elementos separados
-            para_text = para.text
             if para_text and '\n' in para_text:
                 lines = para_text.split('\n')
                 
@@ -34,7 +431,7 @@ class DocumentReader:
                 should_split = self._should_split_paragraph_lines(lines)
                 
                 if should_split:
-                    print(f"  Parágrafo {i} será dividido em {len(lines)} elementos separados")
+                    print(f"  Parágrafo {location} será dividido em {len(lines)} elementos separados")
                     
                     # Cria um elemento para cada linha significativa
                     for line_idx, line in enumerate(lines):
@@ -44,15 +441,16 @@ class DocumentReader:
                         # Detecção de listas para cada linha
                         is_list_item, list_type, list_char = self._detect_list_item(line.strip())
                         
-                        elements.append({
+                        yield DocumentElement(self.run_formats, **{
                             'index': element_index,
                             'type': 'paragraph',
                             'text': line,
-                            'original_para_index': i,
+                            'original_para_index': para_index,
+                            **position,
                             'line_in_paragraph': line_idx,
                             'was_split': True,
-                            'style': para.style.name if para.style else 'Normal',
-                            'runs': self._extract_runs_for_line(para, line),
+                            'style': style_name,
+                            'runs': self._extract_runs_for_line(runs, line),
                             'has_image': False,
                             'is_image_paragraph': False,
                             'is_list_item': is_list_item,
@@ -69,52 +467,53 @@ class DocumentReader:
             list_char = None
             
             # Verifica se é um item de lista formatado pelo Word
-            if para._element.xpath('.//w:numPr'):
+            if _HAS_NUM_PR(p_element):
                 is_list_item = True
                 
                 # Tenta identificar o tipo baseado no texto
-                text_start = para.text.strip()[:10] if para.text else ""
+                text_start = para_text.strip()[:10] if para_text else ""
                 
                 # Detecta tipo de marcador
                 if text_start:
                     # Lista com letras (a), b), A), B)
-                    if re.match(r'^[a-zA-Z][\)\.]\s', text_start):
+                    if _LETTER_ITEM.match(text_start):
                         list_type = 'letter'
                         list_char = text_start[0]
                     # Lista numerada 1. 2. 1) 2)
-                    elif re.match(r'^\d+[\)\.]\s', text_start):
+                    elif _NUMBER_ITEM.match(text_start):
                         list_type = 'number'
                     # Bullets (•, -, *, etc)
                     else:
                         list_type = 'bullet'
                         # Tenta identificar o caractere do bullet
-                        if para._element.xpath('.//w:lvlText'):
+                        if _HAS_LVL_TEXT(p_element):
                             list_char = 'bullet'
             
             # Verifica também manualmente se parece uma lista (caso não esteja formatada)
-            elif para.text:
-                text_start = para.text.strip()
+            elif para_text:
+                text_start = para_text.strip()
                 # Padrões manuais de lista
-                if re.match(r'^[a-eA-E][\)\.]\s', text_start):
+                if _LETTER_A_E_ITEM.match(text_start):
                     is_list_item = True
                     list_type = 'letter'
                     list_char = text_start[0].upper()
-                elif re.match(r'^\d+[\)\.]\s', text_start):
+                elif _NUMBER_ITEM.match(text_start):
                     is_list_item = True
                     list_type = 'number'
-                elif text_start.startswith(('• ', '- ', '* ', '→ ', '▪ ')):
+                elif text_start.startswith(BULLET_PREFIXES):
                     is_list_item = True
                     list_type = 'bullet'
                     list_char = text_start[0]
             
             # SEMPRE adiciona o parágrafo, mesmo se vazio
-            elements.append({
+            yield DocumentElement(self.run_formats, **{
                 'index': element_index,
                 'type': 'paragraph',
-                'text': para.text,  # Pode ser vazio
-                'original_para_index': i,
-                'style': para.style.name if para.style else 'Normal',
-                'runs': self._extract_runs(para),
+                'text': para_text,  # Pode ser vazio
+                'original_para_index': para_index,
+                **position,
+                'style': style_name,
+                'runs': runs,
                 'has_image': has_inline_image,
                 'is_image_paragraph': is_image_paragraph, # <--- LINHA ADICIONADA/MODIFICADA
                 'is_list_item': is_list_item,
@@ -124,45 +523,120 @@ class DocumentReader:
             })
             element_index += 1
         
-        # Processa tabelas
-        for i, table in enumerate(self.document.tables):
-            table_text = []
-            for row in table.rows:
-                row_text = []
-                for cell in row.cells:
-                    if cell.text.strip():
-                        row_text.append(cell.text.strip())
-                if row_text:
-                    table_text.append(' | '.join(row_text))
-            
-            if table_text:
-                elements.append({
-                    'index': element_index,
-                    'type': 'table',
-                    'text': '\n'.join(table_text),
-                    'original_element': table._element,
-                    'style': 'Table',
-                    'markers': []
-                })
-                element_index += 1
+    def _block_sources(self):
+        """
+        Percorre os filhos do corpo (w:p e w:tbl) uma única vez, em ordem, gerando
+        ('p', body_index, cell_index, w:p, (texto, estilo, runs, tem imagem)) ou
+        ('tbl', body_index, None, w:tbl, linhas com o texto das células).
+        """
+        if self.mode == 'stream':
+            yield from self._stream_block_sources()
+            return
         
-        print(f"\nTotal de elementos lidos: {len(elements)}")
+        read_paragraph = self._paragraph_reader()
+        for body_index, child in enumerate(self.document.element.body.iterchildren(P_TAG, TBL_TAG)):
+            if child.tag == P_TAG:
+                yield 'p', body_index, None, child, read_paragraph(child)
+            else:
+                yield from self._table_block_sources(body_index, child, read_paragraph)
+    
+    def _paragraph_reader(self):
+        """
+        Função w:p -> (texto, nome do estilo, runs, tem imagem inline).
+        Nos modos 'fast'/'stream' lê o XML direto; no modo 'docx' usa o python-docx.
+        """
+        if self.mode in ('fast', 'stream'):
+            if self.mode == 'stream':
+                style_names, default_style = self._stream_style_names
+            else:
+                style_names, default_style = paragraph_style_names(self.document.styles.element)
+            
+            def read_xml(p_element):
+                text, style_id, runs = _paragraph_from_xml(p_element)
+                style_name = style_names.get(style_id, default_style) if style_id is not None else default_style
+                return text, style_name, runs, _HAS_INLINE_IMAGE(p_element)
+            return read_xml
         
-        # Conta tipos de elementos
-        types_count = {}
-        for elem in elements:
-            elem_type = elem['type']
-            types_count[elem_type] = types_count.get(elem_type, 0) + 1
+        def read_docx(p_element):
+            para = Paragraph(p_element, self.document._body)
+            style_name = para.style.name if para.style else 'Normal'
+            return para.text, style_name, self._extract_runs(para), _HAS_INLINE_IMAGE(p_element)
+        return read_docx
+    
+    def _table_block_sources(self, body_index, tbl, read_paragraph):
+        """Emite a tabela inteira ou, com Config.READER_TABLE_CELLS, cada parágrafo das células"""
+        if Config.READER_TABLE_CELLS:
+            for cell_index, p_element in enumerate(tbl.iter(P_TAG)):
+                yield 'p', body_index, cell_index, p_element, read_paragraph(p_element)
+            return
         
-        for elem_type, count in types_count.items():
-            print(f"  - {elem_type}: {count}")
+        if self.mode == 'docx':
+            table = Table(tbl, self.document._body)
+            rows = [[cell.text for cell in row.cells] for row in table.rows]
+        else:
+            rows = table_rows_from_xml(tbl)
+        yield 'tbl', body_index, None, tbl, rows
+    
+    def _stream_block_sources(self):
+        """
+        Modo 'stream': lê word/document.xml direto do zip com iterparse, sem montar
+        a árvore do python-docx. Cada filho do corpo é processado ao terminar e
+        descartado em seguida, então a memória fica limitada a um parágrafo/tabela.
+        """
+        image_count = 0
+        table_count = 0
+        section_count = 0
+        paragraph_count = 0
+        body_index = 0
         
-        # Debug: mostra onde estão as imagens
-        image_positions = [elem['index'] for elem in elements if elem['type'] == 'image']
-        if image_positions:
-            print(f"  Posições das imagens: {image_positions}")
+        with zipfile.ZipFile(self.file_path) as package:
+            document_part, styles_part = _main_part_names(package)
+            styles_el = None
+            if styles_part in package.namelist():
+                styles_el = etree.fromstring(package.read(styles_part), parser=_SAFE_PARSER)
+            self._stream_style_names = paragraph_style_names(styles_el)
+            read_paragraph = self._paragraph_reader()
+            
+            with package.open(document_part) as xml_file:
+                depth = 0
+                body_depth = None
+                for event, element in etree.iterparse(xml_file, events=('start', 'end'),
+                                                      resolve_entities=False, huge_tree=True):
+                    if event == 'start':
+                        depth += 1
+                        if element.tag == BODY_TAG:
+                            body_depth = depth
+                        continue
+                    
+                    depth -= 1
+                    if body_depth is None or depth != body_depth:
+                        continue
+                    
+                    # 'end' de um filho direto de w:body
+                    tag = element.tag
+                    if tag == P_TAG:
+                        content = read_paragraph(element)
+                        image_count += content[3]
+                        paragraph_count += 1
+                        if element.find(SECTION_IN_PARAGRAPH) is not None:
+                            section_count += 1
+                        yield 'p', body_index, None, element, content
+                        body_index += 1
+                    elif tag == TBL_TAG:
+                        table_count += 1
+                        yield from self._table_block_sources(body_index, element, read_paragraph)
+                        body_index += 1
+                    elif tag == SECT_PR_TAG:
+                        section_count += 1
+                    
+                    element.getparent().remove(element)
         
-        return elements
+        self._body_scan = {
+            'total_paragraphs': paragraph_count,
+            'total_images': image_count,
+            'total_tables': table_count,
+            'total_sections': section_count
+        }
     
     def _extract_runs(self, paragraph):
         """Extrai informações de formatação dos runs"""
@@ -191,59 +665,8 @@ class DocumentReader:
         if len(non_empty_lines) < 2:
             return False
         
-        # Padrões que indicam diferentes tipos de conteúdo
-        patterns = {
-            'question': [
-                r'^\d+[\.\)]\s',  # Numeração de questão (1. ou 1))
-                r'^\d+\s*[-–]\s',  # 1 - 
-                r'^Questão\s+\d+',  # "Questão 1"
-                r'^Q\d+[\.\)]\s',  # Q1. ou Q1)
-                r'^QUESTÃO\s+\d+',  # QUESTÃO 1
-            ],
-            'alternative': [
-                r'^[a-eA-E][\.\)]\s',  # a) b) c) d) e) ou a. b. c. etc
-                r'^\([a-eA-E]\)',  # (a) (b) (c) etc
-                r'^[A-E]\s*[-–]\s',  # A - B - C - etc
-                r'^[a-eA-E]\s',  # Apenas letra seguida de espaço
-            ],
-            'answer': [
-                r'^Resposta:',
-                r'^Gabarito:',
-                r'^Alternativa correta:',
-                r'^[a-eA-E]\d+\s*[-–]',  # a1- b2- etc (padrão de gabarito)
-                r'^GABARITO',
-            ],
-            'title': [
-                r'^Simulado\s+\d+',
-                r'^SIMULADO\s+\d+',
-                r'^Prova\s+\d+',
-                r'^Teste\s+\d+',
-            ],
-            'subtitle': [
-                r'^Estudos\s+\d+',
-                r'^Parte\s+[IVX]+',
-                r'^Seção\s+\d+',
-            ]
-        }
-        
         # Analisa cada linha para determinar seu tipo
-        line_types = []
-        for line in lines:
-            line_stripped = line.strip()
-            if not line_stripped:
-                line_types.append('empty')
-                continue
-            
-            found_type = 'text'
-            for pattern_type, pattern_list in patterns.items():
-                for pattern in pattern_list:
-                    if re.match(pattern, line_stripped, re.IGNORECASE):
-                        found_type = pattern_type
-                        break
-                if found_type != 'text':
-                    break
-            
-            line_types.append(found_type)
+        line_types = [classify_line(line) for line in lines]
         
         # Remove linhas vazias para análise
         non_empty_types = [t for t in line_types if t != 'empty']
@@ -284,41 +707,34 @@ class DocumentReader:
         list_char = None
         
         # Padrões de lista
-        if re.match(r'^[a-eA-E][\)\.]\s', text):
+        if _LETTER_A_E_ITEM.match(text):
             is_list_item = True
             list_type = 'letter'
             list_char = text[0].upper()
-        elif re.match(r'^\([a-eA-E]\)', text):
+        elif _PAREN_LETTER_ITEM.match(text):
             is_list_item = True
             list_type = 'letter'
             list_char = text[1].upper()
-        elif re.match(r'^\d+[\)\.]\s', text):
+        elif _NUMBER_ITEM.match(text):
             is_list_item = True
             list_type = 'number'
-        elif text.startswith(('• ', '- ', '* ', '→ ', '▪ ')):
+        elif text.startswith(BULLET_PREFIXES):
             is_list_item = True
             list_type = 'bullet'
             list_char = text[0]
         
         return is_list_item, list_type, list_char
     
-    def _extract_runs_for_line(self, paragraph, line_text):
+    def _extract_runs_for_line(self, paragraph_runs, line_text):
         """Extrai runs específicos para uma linha de texto dentro de um parágrafo"""
         # Por enquanto, retorna os runs do parágrafo inteiro
         # Em uma implementação mais sofisticada, poderíamos mapear os runs para cada linha
         runs = []
         
         # Simplificação: usa a formatação do primeiro run não vazio
-        for run in paragraph.runs:
-            if run.text.strip():
-                runs.append({
-                    'text': line_text,  # Usa o texto da linha
-                    'bold': run.bold,
-                    'italic': run.italic,
-                    'underline': run.underline,
-                    'font_size': run.font.size.pt if run.font.size else None,
-                    'font_color': run.font.color.rgb if run.font.color and run.font.color.rgb else None
-                })
+        for run in paragraph_runs:
+            if run['text'].strip():
+                runs.append({**run, 'text': line_text})  # Usa o texto da linha
                 break
         
         if not runs:
@@ -352,37 +768,27 @@ class DocumentReader:
     
     def get_document_info(self):
         """Retorna informações gerais do documento"""
-        # Conta elementos
-        paragraph_count = 0
-        image_count = 0
-        table_count = 0
-        
-        for element in self.document.element.body:
-            if element.tag.endswith('p'):
-                paragraph_count += 1
-                # Verifica se tem imagem
-                para = None
-                for p in self.document.paragraphs:
-                    if p._element == element:
-                        para = p
-                        break
-                if para:
-                    for run in para.runs:
-                        if run._element.xpath('.//w:drawing') or run._element.xpath('.//w:pict'):
-                            image_count += 1
-                            break
-            elif element.tag.endswith('tbl'):
-                table_count += 1
+        scan = self._scan_body()
+        core_properties = self._core_properties()
         
         return {
-            'total_paragraphs': paragraph_count,
-            'total_images': image_count,
-            'total_tables': table_count,
-            'total_sections': len(self.document.sections),
+            'total_paragraphs': scan['total_paragraphs'],
+            'total_images': scan['total_images'],
+            'total_tables': scan['total_tables'],
+            'total_sections': scan['total_sections'],
             'core_properties': {
-                'author': self.document.core_properties.author,
-                'created': str(self.document.core_properties.created) if self.document.core_properties.created else None,
-                'modified': str(self.document.core_properties.modified) if self.document.core_properties.modified else None,
-                'title': self.document.core_properties.title
+                'author': core_properties.author if core_properties else None,
+                'created': str(core_properties.created) if core_properties and core_properties.created else None,
+                'modified': str(core_properties.modified) if core_properties and core_properties.modified else None,
+                'title': core_properties.title if core_properties else None
             }
-        }
\ No newline at end of file
+        }
+    
+    def _core_properties(self):
+        if self.document is not None:
+            return self.document.core_properties
+        # Modo 'stream': lê docProps/core.xml direto do zip
+        with zipfile.ZipFile(self.file_path) as package:
+            if 'docProps/core.xml' not in package.namelist():
+                return None
+            return CoreProperties(parse_xml(package.read('docProps/core.xml')))
\ No newline at end of file
@@ -1,17 +1,177 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
 from docx.shared import RGBColor
-from typing import Dict, List
+from lxml import etree
+from backend.config import Config
+from backend.sanitization_rules import NORMALIZATION_RULES, RPR_TAG, compile_profile
+from typing import Dict, List, Tuple
+import multiprocessing
 import re
+import threading
+import time
+
+P_TAG = qn('w:p')
+R_TAG = qn('w:r')
+TBL_TAG = qn('w:tbl')
+TR_TAG = qn('w:tr')
+TC_TAG = qn('w:tc')
+TXBX_CONTENT_TAG = qn('w:txbxContent')
+
+# Partes do pacote, além de word/document.xml, que têm parágrafos de conteúdo
+CONTENT_PART_TYPES = (CT.WML_HEADER, CT.WML_FOOTER, CT.WML_FOOTNOTES, CT.WML_ENDNOTES, CT.WML_COMMENTS)
+
+_W_NS = {'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'}
+_PARAGRAPH_STYLE_ID = etree.XPath('string(./w:pPr/w:pStyle/@w:val)', namespaces=_W_NS)
+_IS_VMERGE_CONTINUE = etree.XPath('boolean(./w:tcPr/w:vMerge[not(@w:val) or @w:val="continue"])', namespaces=_W_NS)
+_SAFE_PARSER = etree.XMLParser(resolve_entities=False, huge_tree=True)
+
+def _iter_body_paragraphs(body):
+    """
+    Os mesmos parágrafos que document.paragraphs e document.tables percorrem,
+    com um flag indicando se o parágrafo está direto no corpo. Células de
+    continuação de mescla vertical ficam de fora, como em row.cells (o python-docx
+    devolve a célula de cima no lugar delas).
+    """
+    for child in body.iterchildren(P_TAG, TBL_TAG):
+        if child.tag == P_TAG:
+            yield child, True
+            continue
+        for tr in child.iterchildren(TR_TAG):
+            for tc in tr.iterchildren(TC_TAG):
+                if _IS_VMERGE_CONTINUE(tc):
+                    continue
+                for p_element in tc.iterchildren(P_TAG):
+                    yield p_element, False
+
+def _iter_all_body_paragraphs(body, skip):
+    """
+    Todos os parágrafos do corpo, inclusive os de tabelas aninhadas, células de
+    continuação de mescla e controles de conteúdo, menos os de 'skip' (os das
+    caixas de texto, varridos à parte). Mesmo flag de _iter_body_paragraphs.
+    """
+    for p_element in body.iter(P_TAG):
+        if p_element not in skip:
+            yield p_element, p_element.getparent() is body
+
+def _new_counters(rules: Dict) -> Dict[str, List]:
+    """[alterações, segundos] por regra do perfil"""
+    return {name: [0, 0.0] for scope in rules.values() for name, _ in scope}
+
+def _sweep(paragraphs, rules: Dict, counters: Dict[str, List]) -> int:
+    """
+    Aplica as regras de parágrafo, de run e de limpeza a cada parágrafo, em uma
+    única passada. Retorna quantos runs foram visitados.
+    """
+    paragraph_rules = rules['paragraph']
+    run_rules = rules['run']
+    cleanup_rules = rules['cleanup']
+    clock = time.perf_counter
+    runs = 0
+    
+    for p_element in paragraphs:
+        for name, rule in paragraph_rules:
+            started = clock()
+            counter = counters[name]
+            counter[0] += rule(p_element)
+            counter[1] += clock() - started
+        
+        # Só os runs diretos, como para.runs
+        for r_element in p_element.iterchildren(R_TAG):
+            rPr = r_element.find(RPR_TAG)
+            if rPr is not None and run_rules:
+                try:
+                    for name, rule in run_rules:
+                        started = clock()
+                        counter = counters[name]
+                        counter[0] += rule(rPr)
+                        counter[1] += clock() - started
+                except Exception:
+                    # Valor inválido: o restante do run fica sem modificar
+                    pass
+            runs += 1
+        
+        for name, rule in cleanup_rules:
+            started = clock()
+            counter = counters[name]
+            counter[0] += rule(p_element)
+            counter[1] += clock() - started
+    
+    return runs
+
+# Pool das partes, criado na primeira sanitização que precisar dele e
+# reaproveitado pelas seguintes (um por processo, inclusive nos workers da fila)
+_part_executor = None
+_part_executor_lock = threading.Lock()
+
+def _get_part_executor() -> ProcessPoolExecutor:
+    global _part_executor
+    with _part_executor_lock:
+        if _part_executor is None:
+            # 'spawn' pelo mesmo motivo da fila de jobs: não herdar threads
+            _part_executor = ProcessPoolExecutor(
+                max_workers=Config.SANITIZER_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _part_executor
+
+def _discard_part_executor():
+    """Descarta um pool quebrado (worker morto); o próximo uso cria outro"""
+    global _part_executor
+    with _part_executor_lock:
+        if _part_executor is not None:
+            _part_executor.shutdown(wait=False)
+            _part_executor = None
+
+def sanitize_part_xml(xml: bytes, profile: str) -> Tuple[bytes, Dict]:
+    """
+    Sanitiza uma parte do pacote (cabeçalho, rodapé, notas, comentários) a partir
+    do XML serializado; roda em processo separado. Todos os parágrafos da parte
+    são visitados, inclusive os de tabelas e caixas de texto. As regras de escopo
+    'document' valem só para o corpo.
+    """
+    root = etree.fromstring(xml, parser=_SAFE_PARSER)
+    rules = compile_profile(profile)
+    counters = _new_counters(rules)
+    runs_before = sum(1 for _ in root.iter(R_TAG))
+    paragraphs = list(root.iter(P_TAG))
+    runs = _sweep(paragraphs, rules, counters)
+    output = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+    return output, {
+        'paragraphs': len(paragraphs),
+        'runs_cleaned': runs,
+        'runs_before': runs_before,
+        'runs_after': sum(1 for _ in root.iter(R_TAG)),
+        'xml_bytes_before': len(xml),
+        'xml_bytes_after': len(output),
+        'rules': counters
+    }
 
 class DocumentSanitizer:
     """
     Sanitiza documentos Word para importação limpa no InDesign,
     removendo formatações locais que podem causar conflitos.
+    
+    O que é removido depende do perfil (ver SANITIZATION_PROFILES em
+    sanitization_rules); após a sanitização, self.stats traz quantas alterações
+    e quanto tempo cada regra gastou e, quando o perfil normaliza a estrutura,
+    o número de runs e o tamanho do XML antes e depois.
+    
+    Além do corpo (e das caixas de texto nele), cabeçalhos, rodapés, notas e
+    comentários também são sanitizados; quando são grandes, essas partes vão para
+    um pool de processos compartilhado enquanto o corpo é tratado no processo atual.
     """
     
-    def __init__(self, document: Document):
+    def __init__(self, document: Document, profile: str = None):
         self.document = document
-        print("DocumentSanitizer inicializado")
+        self.profile = profile or Config.SANITIZATION_PROFILE
+        self.rules = compile_profile(self.profile)
+        self.stats = {}
+        print(f"DocumentSanitizer inicializado (perfil: {self.profile})")
     
     def sanitize_local_formatting(self) -> Document:
         """
@@ -20,6 +180,157 @@ class DocumentSanitizer:
         """
         print("\nIniciando sanitização do documento...")
         
+        normalizes = any(name in NORMALIZATION_RULES for scope in self.rules.values() for name, _ in scope)
+        if normalizes:
+            before = self._measure_structure()
+        
+        # O caminho pelo python-docx só conhece a limpeza do perfil 'legacy' e
+        # só percorre o corpo
+        if Config.SANITIZER_MODE == 'docx' and self.profile == 'legacy':
+            stats = self._sanitize_runs()
+        else:
+            stats = self._sanitize_xml()
+        
+        print(f"\nSanitização concluída:")
+        print(f"  - Parágrafos processados: {stats['paragraphs_processed']}")
+        print(f"  - Runs limpos: {stats['runs_cleaned']}")
+        print(f"  - Estilos preservados: {len(stats['styles_preserved'])}")
+        for partname, part_stats in stats.get('parts', {}).items():
+            print(f"  - {partname}: {part_stats['paragraphs']} parágrafos, {part_stats['runs_cleaned']} runs")
+        for name, rule_stats in stats.get('rules', {}).items():
+            print(f"  - {name}: {rule_stats['changes']} alterações em {rule_stats['seconds']:.3f}s")
+        
+        self.stats = {
+            'profile': self.profile,
+            'paragraphs_processed': stats['paragraphs_processed'],
+            'runs_cleaned': stats['runs_cleaned'],
+            'styles_preserved': sorted(stats['styles_preserved']),
+            'rules': stats.get('rules', {}),
+            'parts': stats.get('parts', {})
+        }
+        
+        if normalizes:
+            after = self._measure_structure()
+            normalization = {
+                'runs_before': before['runs'],
+                'runs_after': after['runs'],
+                'xml_bytes_before': before['xml_bytes'],
+                'xml_bytes_after': after['xml_bytes']
+            }
+            # Soma as demais partes sanitizadas
+            for part_stats in self.stats['parts'].values():
+                for key in normalization:
+                    normalization[key] += part_stats[key]
+            self.stats['normalization'] = normalization
+            print(f"  - Runs: {normalization['runs_before']} → {normalization['runs_after']}")
+            print(f"  - XML: {normalization['xml_bytes_before'] / 1024:.1f} KB → {normalization['xml_bytes_after'] / 1024:.1f} KB")
+        
+        return self.document
+    
+    def _measure_structure(self) -> Dict:
+        """Número de runs e tamanho serializado de word/document.xml"""
+        root = self.document.element
+        return {
+            'runs': sum(1 for _ in root.body.iter(R_TAG)),
+            'xml_bytes': len(etree.tostring(root, encoding='UTF-8', standalone=True))
+        }
+    
+    def _content_parts(self) -> List[Tuple]:
+        """Partes de conteúdo além do corpo, com o XML serializado de cada uma"""
+        return [(part, part.blob) for part in self.document.part.package.iter_parts()
+                if part.content_type in CONTENT_PART_TYPES]
+    
+    def _sanitize_xml(self) -> Dict:
+        """
+        Caminho rápido: uma única varredura do corpo com lxml aplicando todas as
+        regras do perfil, sem criar objetos Paragraph/Run/Font por run. Os nomes de
+        estilo são resolvidos uma vez por id.
+        
+        As demais partes são enviadas serializadas ao pool de processos do módulo
+        antes da varredura do corpo (se somarem ao menos SANITIZER_PARALLEL_MIN_BYTES;
+        abaixo disso o envio não compensa e elas são tratadas aqui).
+        """
+        body = self.document.element.body
+        counters = _new_counters(self.rules)
+        clock = time.perf_counter
+        
+        stats = {
+            'paragraphs_processed': 0,
+            'runs_cleaned': 0,
+            'styles_preserved': set(),
+            'parts': {}
+        }
+        style_ids = set()
+        
+        parts = self._content_parts()
+        pending = None
+        if parts and Config.SANITIZER_WORKERS > 1 and \
+                sum(len(blob) for _, blob in parts) >= Config.SANITIZER_PARALLEL_MIN_BYTES:
+            executor = _get_part_executor()
+            pending = [(part, executor.submit(sanitize_part_xml, blob, self.profile)) for part, blob in parts]
+        
+        # Regras que precisam do documento inteiro (ex.: marcadores), antes da varredura
+        for name, rule in self.rules['document']:
+            started = clock()
+            counter = counters[name]
+            counter[0] += rule(self.document)
+            counter[1] += clock() - started
+        
+        # Caixas de texto ficam dentro de runs e são varridas à parte
+        text_box_paragraphs = [p_element for text_box in body.iter(TXBX_CONTENT_TAG)
+                               for p_element in text_box.iter(P_TAG)]
+        
+        # O perfil legado reproduz exatamente o que o caminho pelo python-docx
+        # alcança; os demais limpam todos os parágrafos do corpo
+        if self.profile == 'legacy':
+            paragraphs = _iter_body_paragraphs(body)
+        else:
+            paragraphs = _iter_all_body_paragraphs(body, set(text_box_paragraphs))
+        
+        def body_paragraphs():
+            for p_element, in_body in paragraphs:
+                style_ids.add(_PARAGRAPH_STYLE_ID(p_element) or None)
+                if in_body:
+                    stats['paragraphs_processed'] += 1
+                yield p_element
+        
+        stats['runs_cleaned'] += _sweep(body_paragraphs(), self.rules, counters)
+        stats['runs_cleaned'] += _sweep(text_box_paragraphs, self.rules, counters)
+        
+        results = None
+        if pending is not None:
+            try:
+                results = [(part, future.result()) for part, future in pending]
+            except BrokenProcessPool:
+                print("AVISO: pool de sanitização interrompido - tratando as partes no processo atual.")
+                _discard_part_executor()
+        if results is None:
+            results = [(part, sanitize_part_xml(blob, self.profile)) for part, blob in parts]
+        
+        for part, (xml, part_stats) in results:
+            # XmlPart (cabeçalho, rodapé) guarda a árvore; as demais, os bytes
+            if hasattr(part, '_element'):
+                part._element = parse_xml(xml)
+            else:
+                part._blob = xml
+            for name, (changes, seconds) in part_stats.pop('rules').items():
+                counters[name][0] += changes
+                counters[name][1] += seconds
+            stats['parts'][str(part.partname)] = part_stats
+        
+        for style_id in style_ids:
+            style = self.document.part.get_style(style_id, WD_STYLE_TYPE.PARAGRAPH)
+            if style:
+                stats['styles_preserved'].add(style.name)
+        
+        stats['rules'] = {
+            name: {'changes': changes, 'seconds': round(seconds, 4)}
+            for name, (changes, seconds) in counters.items()
+        }
+        return stats
+    
+    def _sanitize_runs(self) -> Dict:
+        """Caminho pelo python-docx (Config.SANITIZER_MODE = 'docx')"""
         stats = {
             'paragraphs_processed': 0,
             'runs_cleaned': 0,
@@ -56,12 +367,7 @@ class DocumentSanitizer:
                             self._clean_run_formatting(run)
                             stats['runs_cleaned'] += 1
         
-        print(f"\nSanitização concluída:")
-        print(f"  - Parágrafos processados: {stats['paragraphs_processed']}")
-        print(f"  - Runs limpos: {stats['runs_cleaned']}")
-        print(f"  - Estilos preservados: {len(stats['styles_preserved'])}")
-        
-        return self.document
+        return stats
     
     def _clean_run_formatting(self, run):
         """
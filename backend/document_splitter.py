@@ -1,22 +1,113 @@
 from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import OxmlElement
+from docx.text.paragraph import Paragraph
+from lxml import etree
+from backend.config import Config
+from backend.document_reader import INLINE_IMAGE_XPATH
+from backend.document_template import DocumentTemplate, append_block
 from typing import List, Dict, Tuple
 import re
 
+_HAS_IMAGE = etree.XPath(f'boolean({INLINE_IMAGE_XPATH})',
+                         namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
+
+GABARITO_WORDS = ('gabarito', 'resposta', 'answer')
+GABARITO_PATTERNS = [re.compile(pattern) for pattern in (
+    r'^[a-h]\d+\s*[–\-]',
+    r'^resposta:',
+    r'^gabarito:',
+    r'^alternativa correta:'
+)]
+
 class DocumentSplitter:
-    def __init__(self):
+    """
+    Divide o documento em simulados e em documentos de questões/gabaritos.
+    
+    document.paragraphs reconstrói a lista inteira a cada acesso; por isso cada
+    operação tira um único retrato dos parágrafos e trabalha com índices e fatias
+    dele, e os nomes de estilo são resolvidos uma vez por id.
+    
+    Os documentos gerados saem de um DocumentTemplate do documento de origem
+    (builder 'template', padrão) ou de um Document() vazio com estilos e runs
+    recriados pelo python-docx (builder 'docx', Config.SPLITTER_BUILDER).
+    """
+    
+    def __init__(self, builder: str = None):
         self.simulado_pattern = re.compile(r'Simulado\s+(\d+)', re.IGNORECASE)
-        
-    def split_simulados(self, document: Document) -> List[Dict]:
-        """Divide o documento em simulados individuais com precisão melhorada"""
-        print("\n=== DIVIDINDO DOCUMENTO EM SIMULADOS ===")
-        simulados = []
-        current_simulado = None
-        current_content = []
-        current_start = 0
-        
-        # Primeira passada: identifica todos os títulos de simulado
+        self.builder = builder or Config.SPLITTER_BUILDER
+        self._template = None
+        self._reset_caches()
+    
+    def _reset_caches(self):
+        # id do estilo -> nome, no documento de origem
+        self._style_names = {}
+        # (documento de destino, nome do estilo) -> id do estilo
+        self._target_style_ids = {}
+    
+    def _prepare_builder(self, source_doc: Document):
+        """Serializa o molde uma vez por documento de origem (builder 'template')"""
+        self._reset_caches()
+        self._template = DocumentTemplate(source_doc) if self.builder == 'template' else None
+    
+    def _new_document(self, source_doc: Document) -> Document:
+        if self._template is not None:
+            return self._template.new_document()
+        new_doc = Document()
+        self._copy_styles(source_doc, new_doc)
+        return new_doc
+    
+    def _copy_paragraph(self, target_doc: Document, source_para):
+        if self._template is not None:
+            self._template.append(target_doc, source_para._p)
+        else:
+            self._copy_paragraph_to_document(target_doc, source_para)
+    
+    def _finish_document(self, document: Document):
+        """Poda as mídias e links que o documento gerado não usa"""
+        if self._template is not None:
+            self._template.prune_unused_relationships(document)
+    
+    def _append_paragraph(self, target_doc: Document) -> Paragraph:
+        """
+        Equivalente a target_doc.add_paragraph(), mas insere antes do w:sectPr final
+        sem procurá-lo entre todos os filhos do corpo (O(1) por parágrafo).
+        """
+        return Paragraph(append_block(target_doc, OxmlElement('w:p')), target_doc._body)
+    
+    def _target_style_id(self, target_doc: Document, style_name: str):
+        """
+        Id do estilo no documento de destino, resolvido uma vez por nome (None para o
+        estilo padrão, como em paragraph.style = nome). Propaga o erro de estilo
+        inexistente.
+        """
+        key = (id(target_doc), style_name)
+        if key not in self._target_style_ids:
+            try:
+                self._target_style_ids[key] = target_doc.part.get_style_id(style_name, WD_STYLE_TYPE.PARAGRAPH)
+            except Exception as e:
+                self._target_style_ids[key] = e
+        style_id = self._target_style_ids[key]
+        if isinstance(style_id, Exception):
+            raise style_id
+        return style_id
+    
+    def _style_name(self, paragraph) -> str:
+        """Nome do estilo do parágrafo, resolvido uma vez por id de estilo"""
+        style_id = paragraph._p.style
+        if style_id not in self._style_names:
+            style = paragraph.style
+            self._style_names[style_id] = style.name if style else None
+        return self._style_names[style_id]
+    
+    def build_boundary_index(self, paragraphs: List) -> List[Dict]:
+        """
+        Posições dos títulos de simulado em uma única passada. Cada simulado vai do
+        seu título (start_index) até o parágrafo anterior ao próximo título
+        (end_index, exclusivo).
+        """
         simulado_positions = []
-        for i, para in enumerate(document.paragraphs):
+        for i, para in enumerate(paragraphs):
             text = para.text.strip()
             
             # Verifica se é título de simulado (mais preciso)
@@ -31,34 +122,43 @@ class DocumentSplitter:
                     })
                     print(f"  Encontrado Simulado {simulado_num} na posição {i}: {text[:50]}...")
         
-        # Segunda passada: coleta o conteúdo de cada simulado
+        boundaries = []
         for idx, sim_pos in enumerate(simulado_positions):
-            start_idx = sim_pos['index']
-            end_idx = simulado_positions[idx + 1]['index'] if idx + 1 < len(simulado_positions) else len(document.paragraphs)
-            
-            # Coleta parágrafos do simulado
-            content = []
-            for i in range(start_idx, end_idx):
-                content.append(document.paragraphs[i])
+            end_idx = simulado_positions[idx + 1]['index'] if idx + 1 < len(simulado_positions) else len(paragraphs)
+            boundaries.append({'number': sim_pos['number'], 'start_index': sim_pos['index'], 'end_index': end_idx})
+        return boundaries
+    
+    def split_simulados(self, document: Document) -> List[Dict]:
+        """Divide o documento em simulados individuais com precisão melhorada"""
+        print("\n=== DIVIDINDO DOCUMENTO EM SIMULADOS ===")
+        self._reset_caches()
+        paragraphs = document.paragraphs
+        total_document = len(paragraphs)
+        simulados = []
+        
+        for boundary in self.build_boundary_index(paragraphs):
+            start_idx = boundary['start_index']
+            end_idx = boundary['end_index']
+            content = paragraphs[start_idx:end_idx]
             
             simulados.append({
-                'number': sim_pos['number'],
+                'number': boundary['number'],
                 'content': content,
                 'start_index': start_idx,
                 'end_index': end_idx - 1,
                 'paragraph_count': len(content)
             })
             
-            print(f"  Simulado {sim_pos['number']}: {len(content)} parágrafos (índices {start_idx}-{end_idx-1})")
+            print(f"  Simulado {boundary['number']}: {len(content)} parágrafos (índices {start_idx}-{end_idx-1})")
         
         # Validação
         print(f"\nTotal de simulados encontrados: {len(simulados)}")
         total_paragraphs = sum(s['paragraph_count'] for s in simulados)
         print(f"Total de parágrafos em simulados: {total_paragraphs}")
-        print(f"Total de parágrafos no documento: {len(document.paragraphs)}")
+        print(f"Total de parágrafos no documento: {total_document}")
         
-        if total_paragraphs < len(document.paragraphs):
-            print(f"AVISO: {len(document.paragraphs) - total_paragraphs} parágrafos não atribuídos a nenhum simulado")
+        if total_paragraphs < total_document:
+            print(f"AVISO: {total_document - total_paragraphs} parágrafos não atribuídos a nenhum simulado")
         
         return simulados
     
@@ -73,8 +173,9 @@ class DocumentSplitter:
             return False
         
         # Verifica o estilo (títulos geralmente têm estilos específicos)
-        if paragraph.style and paragraph.style.name:
-            style_name = paragraph.style.name.lower()
+        style_name = self._style_name(paragraph)
+        if style_name:
+            style_name = style_name.lower()
             if any(h in style_name for h in ['heading', 'título', 'title']):
                 return True
         
@@ -107,6 +208,16 @@ class DocumentSplitter:
         gabarito_count = 0
         question_count = 0
         
+        # Marcadores e palavras-chave dos estilos de gabarito, calculados uma vez
+        # (para cada marcador vale o primeiro estilo que o declara)
+        first_styles = {}
+        for style in styles:
+            first_styles.setdefault(style.get('marker'), style)
+        gabarito_markers = {marker for marker, style in first_styles.items()
+                            if style and self._is_gabarito_name(style.get('name', ''))}
+        gabarito_keywords = [self._prompt_keywords(style.get('prompt', '')) for style in styles
+                             if self._is_gabarito_name(style.get('name', ''))]
+        
         for i, para in enumerate(simulado_content):
             # Encontra a marcação correspondente
             global_idx = start_idx + i
@@ -122,34 +233,23 @@ class DocumentSplitter:
             if marked_para and marked_para.get('markers'):
                 markers = marked_para['markers']
                 # Verifica se tem marcador de gabarito baseado nos estilos definidos
-                for marker in markers:
-                    style_info = next((s for s in styles if s.get('marker') == marker), None)
-                    if style_info:
-                        style_name = style_info.get('name', '').lower()
-                        if any(word in style_name for word in ['gabarito', 'resposta', 'answer']):
-                            is_gabarito = True
-                            break
+                if any(marker in gabarito_markers for marker in markers):
+                    is_gabarito = True
             
             # Fallback: verifica pelo estilo original se não tem marcação
-            if not is_gabarito and para.style and para.style.name:
-                style_name_lower = para.style.name.lower()
-                if 'gabarito' in style_name_lower or 'answer' in style_name_lower or 'resposta' in style_name_lower:
-                    is_gabarito = True
+            if not is_gabarito and self._is_gabarito_name(self._style_name(para) or ''):
+                is_gabarito = True
             
             # Fallback final: análise de conteúdo baseada nos estilos definidos
-            if not is_gabarito:
+            if not is_gabarito and gabarito_keywords:
                 text_lower = para.text.lower().strip()
                 
                 # Busca nos prompts dos estilos definidos se algum indica gabarito
-                for style in styles:
-                    style_name = style.get('name', '').lower()
-                    style_prompt = style.get('prompt', '').lower()
-                    
-                    if any(word in style_name for word in ['gabarito', 'resposta', 'answer']):
-                        # Verifica se o texto atual corresponde ao prompt deste estilo
-                        if self._text_matches_prompt(text_lower, style_prompt):
-                            is_gabarito = True
-                            break
+                for keywords in gabarito_keywords:
+                    # Verifica se o texto atual corresponde ao prompt deste estilo
+                    if self._matches_keywords(text_lower, keywords):
+                        is_gabarito = True
+                        break
             
             # Adiciona ao grupo apropriado
             if is_gabarito:
@@ -170,6 +270,7 @@ class DocumentSplitter:
         """Cria documentos separados usando as marcações da IA e estilos definidos"""
         print("\n=== CRIANDO DOCUMENTOS SEPARADOS ===")
         documents = {}
+        self._prepare_builder(document)
         
         for simulado in simulados:
             sim_num = simulado['number']
@@ -212,29 +313,29 @@ class DocumentSplitter:
         
         # 1. Documento completo estilizado
         print("\nCriando documento completo...")
-        complete_doc = Document()
-        self._copy_styles(document, complete_doc)
+        self._prepare_builder(document)
+        complete_doc = self._new_document(document)
+        paragraphs = document.paragraphs
         
         para_count = 0
-        for para in document.paragraphs:
+        for para in paragraphs:
             if para.text.strip() or self._has_image(para):
-                self._copy_paragraph_to_document(complete_doc, para)
+                self._copy_paragraph(complete_doc, para)
                 para_count += 1
         
+        self._finish_document(complete_doc)
         documents['completo'] = complete_doc
         print(f"  ✓ Documento completo: {para_count} parágrafos")
         
         # 2. Documento só com questões (todo o documento)
         print("\nCriando documento de todas as questões...")
-        all_questions_doc = Document()
-        all_answers_doc = Document()
-        self._copy_styles(document, all_questions_doc)
-        self._copy_styles(document, all_answers_doc)
+        all_questions_doc = self._new_document(document)
+        all_answers_doc = self._new_document(document)
         
         questions_count = 0
         answers_count = 0
         
-        for i, para in enumerate(document.paragraphs):
+        for i, para in enumerate(paragraphs):
             if i < len(marked_content):
                 marked = marked_content[i]
                 markers = marked.get('markers', [])
@@ -245,28 +346,21 @@ class DocumentSplitter:
                 if not is_gabarito:
                     # Também verifica padrões de gabarito no texto
                     text_lower = para.text.lower().strip()
-                    gabarito_patterns = [
-                        r'^[a-h]\d+\s*[–\-]',
-                        r'^resposta:',
-                        r'^gabarito:',
-                        r'^alternativa correta:'
-                    ]
-                    for pattern in gabarito_patterns:
-                        if re.search(pattern, text_lower):
-                            is_gabarito = True
-                            break
+                    is_gabarito = any(pattern.search(text_lower) for pattern in GABARITO_PATTERNS)
                 
                 if is_gabarito:
-                    self._copy_paragraph_to_document(all_answers_doc, para)
+                    self._copy_paragraph(all_answers_doc, para)
                     answers_count += 1
                 else:
-                    self._copy_paragraph_to_document(all_questions_doc, para)
+                    self._copy_paragraph(all_questions_doc, para)
                     questions_count += 1
             else:
                 # Se não tem marcação, adiciona às questões por padrão
-                self._copy_paragraph_to_document(all_questions_doc, para)
+                self._copy_paragraph(all_questions_doc, para)
                 questions_count += 1
         
+        self._finish_document(all_questions_doc)
+        self._finish_document(all_answers_doc)
         documents['todas_questoes'] = all_questions_doc
         documents['todos_gabaritos'] = all_answers_doc
         
@@ -278,10 +372,8 @@ class DocumentSplitter:
     def _create_document_from_paragraphs(self, paragraphs: List, source_doc: Document, 
                                        title: str = None) -> Document:
         """Cria um novo documento a partir de uma lista de parágrafos"""
-        new_doc = Document()
-        
-        # Copia estilos
-        self._copy_styles(source_doc, new_doc)
+        # Molde do documento de origem ou documento vazio com os estilos copiados
+        new_doc = self._new_document(source_doc)
         
         # Adiciona título se fornecido
         if title:
@@ -293,22 +385,31 @@ class DocumentSplitter:
         # Copia parágrafos
         for para in paragraphs:
             if para.text.strip() or self._has_image(para):
-                self._copy_paragraph_to_document(new_doc, para)
+                self._copy_paragraph(new_doc, para)
         
+        self._finish_document(new_doc)
         return new_doc
     
     def _has_image(self, paragraph) -> bool:
         """Verifica se o parágrafo contém imagem"""
-        for run in paragraph.runs:
-            if run._element.xpath('.//w:drawing') or run._element.xpath('.//w:pict'):
-                return True
-        return False
+        return _HAS_IMAGE(paragraph._p)
+    
+    @staticmethod
+    def _is_gabarito_name(name: str) -> bool:
+        name = name.lower()
+        return any(word in name for word in GABARITO_WORDS)
+    
+    @staticmethod
+    def _prompt_keywords(prompt: str) -> List[str]:
+        """Palavras-chave do prompt definido pelo usuário"""
+        return re.findall(r'\b\w+\b', prompt.lower())
     
     def _text_matches_prompt(self, text: str, prompt: str) -> bool:
         """Verifica se o texto corresponde ao prompt definido pelo usuário"""
-        # Extrai palavras-chave do prompt
-        keywords = re.findall(r'\b\w+\b', prompt.lower())
-        
+        return self._matches_keywords(text, self._prompt_keywords(prompt))
+    
+    @staticmethod
+    def _matches_keywords(text: str, keywords: List[str]) -> bool:
         # Conta quantas palavras-chave estão presentes no texto
         matches = sum(1 for keyword in keywords if keyword in text)
         
@@ -362,12 +463,13 @@ class DocumentSplitter:
     def _copy_paragraph_to_document(self, target_doc: Document, source_para):
         """Copia um parágrafo mantendo toda formatação e conteúdo"""
         # Cria novo parágrafo
-        new_para = target_doc.add_paragraph()
+        new_para = self._append_paragraph(target_doc)
         
         # Copia o estilo
         try:
-            if source_para.style:
-                new_para.style = source_para.style.name
+            style_name = self._style_name(source_para)
+            if style_name:
+                new_para._p.style = self._target_style_id(target_doc, style_name)
         except:
             pass
         
@@ -0,0 +1,92 @@
+from copy import deepcopy
+from io import BytesIO
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from typing import Iterable
+
+SECTPR_TAG = qn('w:sectPr')
+R_NS_PREFIX = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+# Relações do corpo que só existem por causa do conteúdo (imagens, objetos,
+# gráficos, links). Estilos, numeração, cabeçalhos etc. nunca são podados.
+CONTENT_RELTYPES = frozenset((
+    RT.IMAGE, RT.HYPERLINK, RT.OLE_OBJECT, RT.PACKAGE, RT.CHART,
+    RT.DIAGRAM_DATA, RT.DIAGRAM_LAYOUT, RT.DIAGRAM_QUICK_STYLE, RT.DIAGRAM_COLORS,
+    RT.VIDEO, RT.AUDIO,
+))
+
+def append_block(document: Document, element):
+    """
+    Acrescenta um w:p/w:tbl ao fim do corpo, antes do w:sectPr final, sem
+    procurá-lo entre todos os filhos do corpo (O(1) por elemento).
+    """
+    body = document.element.body
+    last = next(body.iterchildren(reversed=True), None)
+    if last is not None and last.tag == SECTPR_TAG:
+        last.addprevious(element)
+    else:
+        body.append(element)
+    return element
+
+class DocumentTemplate:
+    """
+    Molde para gerar documentos derivados de um documento de origem.
+
+    O pacote de origem é serializado uma única vez, com o corpo vazio (só o
+    w:sectPr final): estilos, numeração, tema, cabeçalhos, rodapés e mídias vêm
+    prontos. Cada documento novo é aberto a partir desse molde e recebe cópias
+    (deepcopy) dos w:p/w:tbl de origem; como os ids de relação são os mesmos do
+    pacote de origem, imagens e links continuam válidos. Ao final, as relações de
+    conteúdo que o novo corpo não usa são podadas, e as mídias correspondentes
+    não são gravadas.
+    """
+
+    def __init__(self, source_doc: Document):
+        buffer = BytesIO()
+        source_doc.save(buffer)
+        template = Document(BytesIO(buffer.getvalue()))
+
+        body = template.element.body
+        for child in list(body):
+            if child.tag != SECTPR_TAG:
+                body.remove(child)
+
+        buffer = BytesIO()
+        template.save(buffer)
+        self._blob = buffer.getvalue()
+
+    def new_document(self) -> Document:
+        """Documento vazio com todas as partes do documento de origem"""
+        return Document(BytesIO(self._blob))
+
+    def append(self, document: Document, element):
+        """Copia um w:p/w:tbl do documento de origem para o fim do documento"""
+        return append_block(document, deepcopy(element))
+
+    def build(self, elements: Iterable) -> Document:
+        """Novo documento com cópias dos elementos, já com as relações podadas"""
+        document = self.new_document()
+        for element in elements:
+            self.append(document, element)
+        self.prune_unused_relationships(document)
+        return document
+
+    @staticmethod
+    def prune_unused_relationships(document: Document) -> int:
+        """
+        Remove as relações de conteúdo do documento que nenhum atributo r:* do
+        XML (r:embed, r:id, r:link...) referencia. Retorna quantas saíram.
+        """
+        referenced = set()
+        for element in document.element.iter():
+            for name, value in element.attrib.items():
+                if name.startswith(R_NS_PREFIX):
+                    referenced.add(value)
+
+        rels = document.part.rels
+        unused = [rId for rId, rel in rels.items()
+                  if rel.reltype in CONTENT_RELTYPES and rId not in referenced]
+        for rId in unused:
+            rels.pop(rId)
+        return len(unused)
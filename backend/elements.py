@@ -0,0 +1,107 @@
+import sys
+from typing import Dict, List, Tuple
+
+class RunFormatTable:
+    """
+    Formatações de run compartilhadas pelo documento inteiro: cada combinação
+    distinta (negrito, itálico, sublinhado, tamanho, cor) é guardada uma única vez
+    e os runs apenas referenciam seu índice. Em livros, poucas dezenas de
+    combinações cobrem dezenas de milhares de runs.
+    """
+
+    FIELDS = ('bold', 'italic', 'underline', 'font_size', 'font_color')
+
+    def __init__(self):
+        self.formats: List[Tuple] = []
+        self._ids: Dict[Tuple, int] = {}
+
+    def intern(self, run: Dict) -> int:
+        key = tuple(run.get(field) for field in self.FIELDS)
+        format_id = self._ids.get(key)
+        if format_id is None:
+            format_id = len(self.formats)
+            self._ids[key] = format_id
+            self.formats.append(key)
+        return format_id
+
+    def as_dict(self, format_id: int) -> Dict:
+        return dict(zip(self.FIELDS, self.formats[format_id]))
+
+
+class DocumentElement:
+    """
+    Elemento lido do documento (parágrafo, linha de parágrafo dividido ou tabela).
+
+    Usa __slots__ em vez de um dict por elemento, nomes de estilo internados e runs
+    guardados como (texto, id da formatação) na RunFormatTable do documento.
+    Continua acessível como dicionário (elem['text'], elem.get('markers'),
+    'was_split' in elem, dict(elem)), então AIProcessor, RuleClassifier,
+    StyleApplier e DocumentSplitter não mudam. Campos não definidos se comportam
+    como chaves ausentes.
+    """
+
+    KEYS = ('index', 'type', 'text', 'original_para_index', 'body_index', 'cell_paragraph_index',
+            'line_in_paragraph', 'was_split', 'style', 'runs', 'has_image', 'is_image_paragraph',
+            'is_list_item', 'list_type', 'list_char', 'markers', 'original_element')
+
+    __slots__ = tuple(key for key in KEYS if key != 'runs') + ('_runs', '_format_table')
+
+    # Valores repetidos em milhares de elementos: uma única cópia de cada string
+    _INTERNED = ('type', 'style', 'list_type', 'list_char')
+
+    def __init__(self, format_table: RunFormatTable = None, **fields):
+        self._format_table = format_table
+        for key, value in fields.items():
+            self[key] = value
+
+    def __getitem__(self, key: str):
+        if key == 'runs':
+            try:
+                runs = self._runs
+            except AttributeError:
+                raise KeyError(key) from None
+            return [{'text': text, **self._format_table.as_dict(format_id)} for text, format_id in runs]
+        if key not in self.KEYS:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value):
+        if key == 'runs':
+            if self._format_table is None:
+                self._format_table = RunFormatTable()
+            self._runs = tuple((run['text'], self._format_table.intern(run)) for run in value)
+            return
+        if key not in self.KEYS:
+            raise KeyError(f"Campo desconhecido para DocumentElement: {key}")
+        if key in self._INTERNED and isinstance(value, str):
+            value = sys.intern(value)
+        setattr(self, key, value)
+
+    def __contains__(self, key) -> bool:
+        if key == 'runs':
+            return hasattr(self, '_runs')
+        return key in self.KEYS and hasattr(self, key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[str]:
+        return [key for key in self.KEYS if key in self]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self) -> Dict:
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"DocumentElement(index={self.get('index')}, type={self.get('type')!r}, text={self.get('text', '')[:40]!r})"
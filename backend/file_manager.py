@@ -1,15 +1,30 @@
 import os
 import shutil
+import uuid
+import zipfile
 from datetime import datetime
-from typing import Dict, List
+from io import BytesIO
+from typing import Dict, Iterator, List
 from docx import Document
 from backend.config import Config
 
 class FileManager:
-    def __init__(self, book_name: str):
+    """
+    Saída de um job. Tudo é montado na área de trabalho do job
+    (Config.WORKSPACE_DIR/<job_id>) e só vai para Config.OUTPUT_DIR pronto, com
+    os.replace; jobs em paralelo nunca veem nem apagam arquivos uns dos outros.
+    """
+    def __init__(self, book_name: str, job_id: str = None):
         self.book_name = self._sanitize_filename(book_name)
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.job_id = job_id or self.new_job_id()
+        self.workspace = self.create_workspace(self.job_id)
         self.output_dir = None
+        self._folder_name = None
+        # Pasta dos .docx avulsos dentro da área do job, até publish_output
+        self._staging_dir = None
+        # Documentos já serializados: (caminho dentro do ZIP, bytes do .docx)
+        self._buffers = []
         
     def _sanitize_filename(self, filename: str) -> str:
         """Remove caracteres inválidos do nome do arquivo"""
@@ -18,70 +33,98 @@ class FileManager:
             filename = filename.replace(char, '_')
         return filename.strip()
     
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex
+    
+    @staticmethod
+    def workspace_path(job_id: str) -> str:
+        return os.path.join(Config.WORKSPACE_DIR, job_id)
+    
+    @staticmethod
+    def create_workspace(job_id: str) -> str:
+        """Cria (se preciso) e retorna a área de trabalho do job"""
+        path = FileManager.workspace_path(job_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+    
+    @staticmethod
+    def remove_workspace(job_id: str):
+        """Remove a área de trabalho do job (upload e restos de saída parcial)"""
+        shutil.rmtree(FileManager.workspace_path(job_id), ignore_errors=True)
+    
     def create_output_structure(self) -> str:
-        """Cria estrutura de pastas para os arquivos de saída"""
-        # Cria pasta principal com nome do livro e timestamp
-        folder_name = f"{self.book_name}_{self.timestamp}"
-        self.output_dir = os.path.join(Config.OUTPUT_DIR, folder_name)
+        """
+        Cria estrutura de pastas para os arquivos de saída, dentro da área do
+        job. Retorna o caminho final em Config.OUTPUT_DIR, que só passa a existir
+        com publish_output. Sem arquivos avulsos (Config.OUTPUT_LOOSE_FILES =
+        False) só o caminho é definido.
+        """
+        # Nome do livro e timestamp, mais o início do id do job para que dois
+        # jobs do mesmo livro no mesmo segundo não usem a mesma pasta
+        self._folder_name = f"{self.book_name}_{self.timestamp}_{self.job_id[:8]}"
+        self.output_dir = os.path.join(Config.OUTPUT_DIR, self._folder_name)
+        self._staging_dir = os.path.join(self.workspace, 'output', self._folder_name)
         
-        # Cria diretórios
-        os.makedirs(self.output_dir, exist_ok=True)
-        
-        # Cria subpastas
-        subdirs = ['completo', 'questoes', 'gabaritos']
-        for subdir in subdirs:
-            os.makedirs(os.path.join(self.output_dir, subdir), exist_ok=True)
+        if Config.OUTPUT_LOOSE_FILES:
+            # Cria diretórios e subpastas
+            subdirs = ['completo', 'questoes', 'gabaritos']
+            for subdir in subdirs:
+                os.makedirs(os.path.join(self._staging_dir, subdir), exist_ok=True)
         
         return self.output_dir
     
-    def save_documents(self, documents: Dict[str, Document]) -> List[Dict]:
-        """Salva todos os documentos gerados"""
+    def _document_subdir(self, doc_name: str) -> str:
+        """Determina o subdiretório apropriado"""
+        if 'completo' in doc_name:
+            return 'completo'
+        if 'questoes' in doc_name:
+            return 'questoes'
+        if 'gabarito' in doc_name:
+            return 'gabaritos'
+        return ''
+    
+    def save_documents(self, documents: Dict[str, Document], write_files: bool = None) -> List[Dict]:
+        """
+        Serializa cada documento uma única vez em memória; o tamanho vem do buffer
+        e o ZIP é montado a partir dele. Os .docx avulsos só são gravados com
+        write_files (padrão: Config.OUTPUT_LOOSE_FILES), na área do job; 'path' é o
+        caminho final após publish_output, ou None sem arquivos avulsos.
+        """
+        if write_files is None:
+            write_files = Config.OUTPUT_LOOSE_FILES
         saved_files = []
         
         for doc_name, document in documents.items():
-            # Determina o subdiretório apropriado
-            if 'completo' in doc_name:
-                subdir = 'completo'
-            elif 'questoes' in doc_name:
-                subdir = 'questoes'
-            elif 'gabarito' in doc_name:
-                subdir = 'gabaritos'
-            else:
-                subdir = ''
-            
-            # Cria caminho completo
+            subdir = self._document_subdir(doc_name)
             filename = f"{self.book_name}_{doc_name}.docx"
-            file_path = os.path.join(self.output_dir, subdir, filename)
+            buffer = BytesIO()
+            document.save(buffer)
+            data = buffer.getvalue()
+            self._buffers.append((f"{subdir}/{filename}" if subdir else filename, data))
             
-            # ADICIONE: Garante que o diretório existe
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            
-            # Salva documento
-            document.save(file_path)
-            
-            # ADICIONE: Garante que o arquivo não está somente leitura
-            try:
-                # Remove atributo somente leitura se existir (Windows)
-                import stat
-                os.chmod(file_path, stat.S_IWRITE | stat.S_IREAD)
-            except:
-                pass
+            file_path = None
+            if write_files:
+                staging_path = os.path.join(self._staging_dir, subdir, filename)
+                os.makedirs(os.path.dirname(staging_path), exist_ok=True)
+                with open(staging_path, 'wb') as f:
+                    f.write(data)
+                file_path = os.path.join(self.output_dir, subdir, filename)
             
             # Adiciona informações do arquivo salvo
             saved_files.append({
                 'name': filename,
                 'path': file_path,
-                'size': self._get_file_size(file_path),
+                'size': self._format_size(len(data)),
                 'type': subdir or 'other'
             })
         
         return saved_files
 
     
-    def _get_file_size(self, file_path: str) -> str:
-        """Retorna o tamanho do arquivo formatado"""
-        size = os.path.getsize(file_path)
-        
+    @staticmethod
+    def _format_size(size: float) -> str:
+        """Retorna o tamanho formatado"""
         for unit in ['B', 'KB', 'MB', 'GB']:
             if size < 1024.0:
                 return f"{size:.1f} {unit}"
@@ -90,17 +133,53 @@ class FileManager:
         return f"{size:.1f} TB"
     
     def create_zip_archive(self) -> str:
-        """Cria arquivo ZIP com todos os documentos"""
-        zip_path = os.path.join(Config.OUTPUT_DIR, f"{self.book_name}_{self.timestamp}")
-        shutil.make_archive(zip_path, 'zip', self.output_dir)
+        """
+        Cria arquivo ZIP com todos os documentos a partir dos buffers de
+        save_documents, sem reler a pasta de saída. Os .docx já são compactados,
+        então entram sem nova compressão (ZIP_STORED). O ZIP é escrito na área do
+        job e movido pronto para Config.OUTPUT_DIR, então um download nunca pega
+        um arquivo pela metade.
+        """
+        zip_name = f"{self._folder_name}.zip"
+        zip_path = os.path.join(Config.OUTPUT_DIR, zip_name)
+        partial_path = os.path.join(self.workspace, zip_name)
+        
+        if self._buffers:
+            with zipfile.ZipFile(partial_path, 'w', zipfile.ZIP_STORED) as archive:
+                for arcname, data in self._buffers:
+                    archive.writestr(arcname, data)
+        else:
+            # Nada serializado por esta instância: compacta a pasta de saída
+            shutil.make_archive(partial_path[:-len('.zip')], 'zip', self._staging_dir)
         
-        return f"{zip_path}.zip"
+        os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
+        os.replace(partial_path, zip_path)
+        return zip_path
+    
+    def publish_output(self) -> str:
+        """
+        Move a pasta de .docx avulsos da área do job para Config.OUTPUT_DIR de uma
+        vez (os.replace). Sem arquivos avulsos não há o que mover.
+        """
+        if self._staging_dir and os.path.isdir(self._staging_dir):
+            os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
+            os.replace(self._staging_dir, self.output_dir)
+        return self.output_dir
+    
+    @staticmethod
+    def iter_file_chunks(file_path: str, chunk_size: int = None) -> Iterator[bytes]:
+        """Lê o arquivo em pedaços, para respostas de download em streaming"""
+        chunk_size = chunk_size or Config.DOWNLOAD_CHUNK_SIZE
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
     
     def cleanup_temp_files(self):
-        """Remove arquivos temporários"""
-        if os.path.exists(Config.TEMP_DIR):
-            shutil.rmtree(Config.TEMP_DIR)
-            os.makedirs(Config.TEMP_DIR, exist_ok=True)
+        """Remove arquivos temporários deste job (nunca a TEMP_DIR inteira)"""
+        self.remove_workspace(self.job_id)
     
     def get_output_summary(self, saved_files: List[Dict]) -> Dict:
         """Retorna resumo dos arquivos gerados"""
@@ -122,4 +201,4 @@ class FileManager:
                     'size': file_info['size']
                 })
         
-        return summary
\ No newline at end of file
+        return summary
@@ -0,0 +1,236 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import traceback
+import uuid
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+from backend.config import Config
+from backend.file_manager import FileManager
+from backend.main import WordStylerProcessor, ProgressMonitor
+
+class JobStore:
+    """
+    Estado dos jobs em SQLite, compartilhado entre o processo da API e os workers.
+    Cada operação abre sua própria conexão, então pode ser usado de qualquer processo.
+    """
+
+    # Colunas guardadas como JSON
+    _JSON_FIELDS = ('progress', 'result')
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.path.join(Config.JOBS_DIR, 'jobs.sqlite3')
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY,'
+                ' book_name TEXT,'
+                ' state TEXT NOT NULL,'
+                ' stage TEXT,'
+                ' progress TEXT,'
+                ' result TEXT,'
+                ' error TEXT,'
+                ' created_at REAL NOT NULL,'
+                ' updated_at REAL NOT NULL,'
+                ' owner_pid INTEGER)'
+            )
+            # Bancos criados antes da coluna owner_pid
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+            if 'owner_pid' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN owner_pid INTEGER')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def create(self, job_id: str, book_name: str):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, book_name, state, stage, created_at, updated_at, owner_pid)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, book_name, 'queued', 'queued', now, now, os.getpid())
+            )
+
+    def update(self, job_id: str, **fields):
+        """Atualiza as colunas informadas (state, stage, progress, result, error)"""
+        for name in self._JSON_FIELDS:
+            if name in fields:
+                fields[name] = json.dumps(fields[name], ensure_ascii=False, default=str)
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for name in self._JSON_FIELDS:
+            if job[name]:
+                job[name] = json.loads(job[name])
+        return job
+
+    def fail_orphaned_jobs(self) -> List[str]:
+        """
+        Marca como 'failed' os jobs 'queued'/'running' cujo processo dono (o da
+        API que os enfileirou, dono do pool de workers) não existe mais: depois de
+        um reinício ou queda eles nunca terminariam. Retorna os ids marcados.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, owner_pid FROM jobs WHERE state IN ('queued', 'running')"
+            ).fetchall()
+        orphaned = [job_id for job_id, owner_pid in rows if not _process_alive(owner_pid)]
+        for job_id in orphaned:
+            self.update(job_id, state='failed',
+                        error='Job interrompido: o servidor foi reiniciado antes da conclusão')
+        return orphaned
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    # O processo atual acabou de subir: um job registrado com o mesmo pid é de
+    # um processo anterior que reaproveitou o número
+    if not pid or pid == os.getpid():
+        return False
+    if os.name == 'nt':
+        # No Windows os.kill(pid, 0) envia CTRL_C_EVENT; lá a API roda em um só processo
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_job(job_id: str, file_path: str, book_name: str, api_key: str,
+            styles: List[Dict], removal_prompts: List[Dict], sanitization_profile: str = None):
+    """
+    Executa o pipeline completo dentro de um processo worker, registrando estado,
+    etapa e resultado no JobStore. A API key só trafega como argumento, nunca é
+    gravada no banco.
+    """
+    store = JobStore()
+    store.update(job_id, state='running', stage='reading')
+
+    def on_progress(info: Dict):
+        store.update(job_id, stage=info['step'], progress=info)
+
+    try:
+        processor = WordStylerProcessor()
+        result = processor.process_document(
+            file_path, book_name, api_key, styles, removal_prompts,
+            progress_monitor=ProgressMonitor(callback=on_progress),
+            sanitization_profile=sanitization_profile,
+            job_id=job_id
+        )
+        if result.get('success'):
+            store.update(job_id, state='completed', stage='completed', result=result)
+        else:
+            store.update(job_id, state='failed', stage=result.get('stage', 'unknown'),
+                         result=result, error=result.get('error'))
+    except Exception as e:
+        traceback.print_exc()
+        store.update(job_id, state='failed', error=str(e))
+    finally:
+        # Remove a área de trabalho do job, com o arquivo enviado
+        FileManager.remove_workspace(job_id)
+
+
+class JobQueue:
+    """
+    Fila de processamento assíncrono: o endpoint HTTP apenas enfileira e devolve o
+    id do job; um pool de processos executa o pipeline e o estado é consultado pelo
+    JobStore.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.store = JobStore()
+        self.max_workers = max_workers or Config.JOB_WORKERS
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        
+        # Jobs de um processo anterior (reinício/queda) não voltam para a fila: a
+        # API key não é gravada, então eles são encerrados como falha
+        for job_id in self.store.fail_orphaned_jobs():
+            FileManager.remove_workspace(job_id)
+            print(f"Job {job_id} marcado como falho: interrompido por reinício do servidor")
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Criado sob demanda, com 'spawn' para não herdar threads do servidor web
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        """
+        Descarta um pool quebrado (worker morto, ex.: falta de memória); o próximo
+        submit cria outro. Só descarta se ainda for o pool atual.
+        """
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def submit(self, file_path: str, book_name: str, api_key: str,
+               styles: List[Dict], removal_prompts: List[Dict], sanitization_profile: str = None,
+               job_id: str = None) -> str:
+        """
+        Enfileira um documento e retorna o id do job. 'job_id' reaproveita o id já
+        usado na área de trabalho onde o upload foi salvo.
+        
+        Se o job não puder ser enfileirado, ele é marcado como falho, a área de
+        trabalho é removida e a exceção é repassada.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        self.store.create(job_id, book_name)
+        args = (job_id, file_path, book_name, api_key, styles, removal_prompts, sanitization_profile)
+        try:
+            try:
+                executor = self._get_executor()
+                future = executor.submit(run_job, *args)
+            except BrokenProcessPool:
+                # Um worker morreu desde o último job: troca o pool e tenta de novo
+                self._discard_executor(executor)
+                executor = self._get_executor()
+                future = executor.submit(run_job, *args)
+        except Exception as e:
+            self.store.update(job_id, state='failed', error=str(e) or e.__class__.__name__)
+            FileManager.remove_workspace(job_id)
+            raise
+        future.add_done_callback(lambda f: self._on_job_done(job_id, executor, f))
+        print(f"Job {job_id} enfileirado: {book_name}")
+        return job_id
+
+    def _on_job_done(self, job_id: str, executor: ProcessPoolExecutor, future):
+        """Registra falhas que impediram o worker de rodar (ex.: processo morto)"""
+        exc = future.exception()
+        if exc is not None:
+            print(f"Job {job_id} falhou no worker: {exc}")
+            if isinstance(exc, BrokenProcessPool):
+                # O run_job não chegou ao 'finally' que limpa a área do job
+                FileManager.remove_workspace(job_id)
+                self._discard_executor(executor)
+            self.store.update(job_id, state='failed', error=str(exc) or exc.__class__.__name__)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.store.get(job_id)
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
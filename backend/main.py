@@ -16,11 +16,20 @@ class WordStylerProcessor:
         Config.create_directories()
         
     def process_document(self, file_path: str, book_name: str, api_key: str, 
-                         styles: List[Dict], removal_prompts: List[Dict]) -> Dict:
+                         styles: List[Dict], removal_prompts: List[Dict],
+                         progress_monitor: 'ProgressMonitor' = None,
+                         sanitization_profile: str = None, job_id: str = None) -> Dict:
         """
         Processa o documento com a lógica de modificação direta.
+        
+        Se um ProgressMonitor for informado, cada etapa é reportada a ele
+        (usado pela fila de jobs para expor a etapa atual). 'sanitization_profile'
+        escolhe as regras de limpeza (padrão: Config.SANITIZATION_PROFILE).
+        'job_id' identifica a área de trabalho do job (ver FileManager); sem ele,
+        um id novo é gerado.
         """
         start_time = time.time()
+        monitor = progress_monitor or ProgressMonitor()
         
         try:
             print("\n" + "="*60)
@@ -29,31 +38,60 @@ class WordStylerProcessor:
             
             # --- ETAPA 1: LEITURA E ANÁLISE ---
             print("\n[1/7] Lendo documento...")
-            reader = DocumentReader(file_path)
-            paragraphs_data = reader.read_paragraphs()
-            doc_info = reader.get_document_info()
-            print(f"✓ Documento lido com sucesso: {doc_info['total_paragraphs']} parágrafos, {doc_info['total_images']} imagens, {doc_info['total_tables']} tabelas.")
+            monitor.update('reading', 5, 'Lendo documento')
+            streaming = Config.READER_MODE == 'stream'
+            if streaming:
+                # O XML é lido sob demanda enquanto a IA classifica; o Document só é
+                # carregado depois, para a aplicação de estilos
+                document = None
+                reader = DocumentReader(file_path, mode='stream')
+                paragraphs_data = reader.iter_paragraphs()
+                print("✓ Leitura em streaming iniciada.")
+            else:
+                # O pacote é carregado uma única vez e o mesmo Document segue por
+                # leitura, estilos, sanitização e gravação
+                document = Document(file_path)
+                reader = DocumentReader(document)
+                paragraphs_data = reader.read_paragraphs()
+                doc_info = reader.get_document_info()
+                print(f"✓ Documento lido com sucesso: {doc_info['total_paragraphs']} parágrafos, {doc_info['total_images']} imagens, {doc_info['total_tables']} tabelas.")
 
             # --- ETAPA 2: PROCESSAMENTO COM IA ---
             print("\n[2/7] Processando com IA...")
+            if streaming:
+                monitor.update('ai_processing', 10, "Classificando elementos durante a leitura")
+            else:
+                monitor.update('ai_processing', 10, f"Classificando {len(paragraphs_data)} elementos")
             ai_processor = AIProcessor(api_key)
-            ai_results = ai_processor.process_document(paragraphs_data, styles, removal_prompts)
+            ai_results = ai_processor.process_document(
+                paragraphs_data, styles, removal_prompts,
+                progress_callback=lambda done, total, tokens: monitor.update_items(
+                    'ai_processing', done, total, 10, 70, tokens)
+            )
             marked_content = ai_results['marked_content']
             ai_stats = ai_results['stats']
             print(f"✓ Processamento com IA concluído: {ai_stats.get('marked', 0)} elementos marcados.")
             if ai_stats.get('unmarked', 0) > 0:
                 print(f"  - ATENÇÃO: {ai_stats.get('unmarked', 0)} elementos não foram marcados pela IA.")
+            if ai_stats.get('failed_requests', 0) > 0:
+                print(f"  - ATENÇÃO: {ai_stats['failed_requests']} requisições falharam mesmo após {ai_stats.get('retries', 0)} retentativas.")
             if not marked_content:
                 raise Exception("ERRO CRÍTICO: Nenhum elemento foi marcado pela IA!")
+            if streaming:
+                doc_info = reader.get_document_info()
+                print(f"✓ Documento lido com sucesso: {doc_info['total_paragraphs']} parágrafos, {doc_info['total_images']} imagens, {doc_info['total_tables']} tabelas.")
+                document = Document(file_path)
 
             # --- ETAPA 3: APLICAÇÃO DE ESTILOS ---
             print("\n[3/7] Aplicando estilos...")
-            style_applier = StyleApplier(file_path)
+            monitor.update('styling', 70, 'Aplicando estilos')
+            style_applier = StyleApplier(document)
             style_applier.register_styles(styles)
             styled_doc = style_applier.apply_styles(marked_content)
             
             # --- ETAPA 4: REMOÇÃO DE CONTEÚDO ---
             print("\n[4/7] Removendo conteúdo marcado...")
+            monitor.update('removal', 78, 'Removendo conteúdo marcado')
             clean_doc = style_applier.remove_marked_content(styled_doc, marked_content, removal_prompts)
             
             # --- ETAPA 5: DIVISÃO EM SIMULADOS (SE NECESSÁRIO) ---
@@ -62,7 +100,8 @@ class WordStylerProcessor:
 
             # --- ETAPA 6: SANITIZAÇÃO DO DOCUMENTO ---
             print("\n[6/8] Sanitizando documento para importação no InDesign...")
-            sanitizer = DocumentSanitizer(clean_doc)
+            monitor.update('sanitizing', 82, 'Sanitizando documento')
+            sanitizer = DocumentSanitizer(clean_doc, profile=sanitization_profile)
             sanitized_doc = sanitizer.sanitize_local_formatting()
             
             # --- ETAPA 7: CRIAÇÃO DO DOCUMENTO FINAL ---
@@ -73,16 +112,23 @@ class WordStylerProcessor:
             
             # --- ETAPA 8: SALVANDO ARQUIVOS ---
             print("\n[8/8] Salvando arquivos...")
-            file_manager = FileManager(book_name)
+            monitor.update('saving', 90, 'Salvando arquivos')
+            file_manager = FileManager(book_name, job_id)
             output_dir = file_manager.create_output_structure()
             saved_files = file_manager.save_documents(documents)
             
-            print(f"✓ Arquivos salvos em: {output_dir}")
-            
             zip_path = file_manager.create_zip_archive()
+            file_manager.publish_output()
+            file_manager.cleanup_temp_files()
+            
+            if Config.OUTPUT_LOOSE_FILES:
+                print(f"✓ Arquivos salvos em: {output_dir}")
+            else:
+                print(f"✓ {len(saved_files)} documentos serializados em memória (sem arquivos avulsos)")
             print(f"✓ Arquivo ZIP criado: {os.path.basename(zip_path)}")
             
             processing_time = time.time() - start_time
+            monitor.complete()
             print("\n" + "="*60)
             print("PROCESSAMENTO CONCLUÍDO COM SUCESSO!")
             print(f"Tempo total: {int(processing_time // 60)}m {int(processing_time % 60)}s")
@@ -94,9 +140,12 @@ class WordStylerProcessor:
                     'total_pages': doc_info.get('total_pages', 'N/A'),
                     'questions_processed': ai_stats.get('marked', 0),
                     'api_calls': ai_stats.get('api_calls', 0),
-                    'estimated_cost_usd': ai_stats.get('estimated_cost_usd', 0)
+                    'estimated_cost_usd': ai_stats.get('estimated_cost_usd', 0),
+                    'removal': style_applier.removal_stats,
+                    'sanitization': sanitizer.stats
                 },
                 'files': saved_files,
+                'job_id': file_manager.job_id,
                 'output_directory': output_dir,
                 'zip_file': os.path.basename(zip_path),
             }
@@ -146,14 +195,20 @@ class WordStylerProcessor:
 class ProgressMonitor:
     """Monitor de progresso para feedback em tempo real"""
     
+    # Intervalo mínimo entre relatórios por item (evita um evento por parágrafo)
+    ITEM_REPORT_INTERVAL = 0.5
+    
     def __init__(self, callback=None):
         self.callback = callback
         self.current_step = ''
         self.current_progress = 0
         self.start_time = time.time()
+        self._items_step = None
+        self._items_start = 0.0
+        self._last_item_report = 0.0
     
-    def update(self, step: str, progress: int, details: str = ''):
-        """Atualiza o progresso"""
+    def update(self, step: str, progress: int, details: str = '', log: bool = True, **metrics):
+        """Atualiza o progresso; métricas extras (vazão, tokens, ETA) vão junto no evento"""
         self.current_step = step
         self.current_progress = progress
         
@@ -162,12 +217,48 @@ class ProgressMonitor:
                 'step': step,
                 'progress': progress,
                 'details': details,
-                'elapsed_time': time.time() - self.start_time
+                'elapsed_time': time.time() - self.start_time,
+                **metrics
             })
         
         # Log no console
-        print(f"[{progress:3d}%] {step}: {details}")
+        if log:
+            print(f"[{progress:3d}%] {step}: {details}")
+    
+    def update_items(self, step: str, completed: int, total: int,
+                     start_progress: int, end_progress: int, tokens: int = None):
+        """
+        Progresso de uma etapa medida em itens (ex.: parágrafos classificados pela IA).
+        Calcula itens/s e ETA da etapa e mapeia o avanço para o intervalo
+        [start_progress, end_progress] do progresso geral.
+        """
+        now = time.time()
+        if self._items_step != step:
+            self._items_step = step
+            self._items_start = now
+            self._last_item_report = 0.0
+        
+        finished = completed >= total
+        if not finished and now - self._last_item_report < self.ITEM_REPORT_INTERVAL:
+            return
+        self._last_item_report = now
+        
+        elapsed = now - self._items_start
+        rate = completed / elapsed if elapsed > 0 else 0.0
+        eta = (total - completed) / rate if rate > 0 else None
+        fraction = completed / total if total else 1.0
+        progress = int(start_progress + (end_progress - start_progress) * fraction)
+        
+        self.update(
+            step, progress, f"{completed}/{total} parágrafos",
+            log=finished,
+            items_completed=completed,
+            items_total=total,
+            items_per_second=round(rate, 2),
+            tokens=tokens,
+            eta_seconds=round(eta, 1) if eta is not None else None
+        )
     
     def complete(self):
         """Marca como completo"""
-        self.update('Processamento concluído!', 100)
\ No newline at end of file
+        self.update('completed', 100, 'Processamento concluído!')
\ No newline at end of file
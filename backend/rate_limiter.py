@@ -0,0 +1,228 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+class _TokenBucket:
+    """
+    Balde de fichas reabastecido continuamente (limite por minuto).
+    Enquanto o limite não é conhecido (nenhum cabeçalho recebido), não restringe nada.
+    """
+
+    def __init__(self):
+        self.capacity = None
+        self.tokens = 0.0
+        self.updated_at = time.monotonic()
+
+    @property
+    def known(self) -> bool:
+        return self.capacity is not None
+
+    def _refill(self, now: float):
+        if self.known:
+            rate = self.capacity / 60.0
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Reserva 'amount' fichas e retorna quantos segundos esperar até poder usá-las"""
+        self._refill(now)
+        if not self.known:
+            return 0.0
+        # Uma requisição maior que o balde inteiro nunca caberia; limita ao total
+        amount = min(amount, self.capacity)
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / (self.capacity / 60.0)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], now: float):
+        """Ajusta o balde com os valores informados pela API"""
+        self._refill(now)
+        if limit:
+            if not self.known:
+                self.tokens = limit
+            self.capacity = limit
+        if remaining is not None and self.known:
+            # As respostas chegam fora de ordem; fica com a estimativa mais conservadora
+            self.tokens = min(self.tokens, remaining)
+
+
+class AdaptiveRateLimiter:
+    """
+    Limitador de taxa para a API da OpenAI.
+
+    - Dois baldes de fichas (requisições/min e tokens/min) sincronizados pelos
+      cabeçalhos x-ratelimit-* de cada resposta.
+    - Concorrência adaptativa AIMD: cresce aditivamente a cada sucesso e cai pela
+      metade quando a API responde 429.
+    - Backoff exponencial com jitter para 429/5xx/falhas de conexão, respeitando
+      retry-after quando presente.
+    """
+
+    def __init__(self, max_concurrency: int, initial_concurrency: int = None, min_concurrency: int = 1,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(min(initial_concurrency or max_concurrency, max_concurrency))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        # A condição assíncrona pertence a um event loop; o AIProcessor abre um
+        # loop novo (asyncio.run) a cada rodada, então ela é recriada por loop
+        self._async_cond = None
+        self._async_loop = None
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._requests = _TokenBucket()
+        self._tokens = _TokenBucket()
+
+        self.retries = 0
+        self.throttled_responses = 0
+        self.failed_requests = 0
+        self.throttle_time = 0.0
+
+    # --- Concorrência (AIMD) ---
+
+    def _has_free_slot(self) -> bool:
+        return self._in_flight < max(self.min_concurrency, int(self.concurrency_limit))
+
+    def acquire(self):
+        """Bloqueia a thread até haver uma vaga dentro do limite de concorrência atual"""
+        with self._cond:
+            self._cond.wait_for(self._has_free_slot)
+            self._in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _get_async_cond(self) -> asyncio.Condition:
+        """Condição do event loop em execução (criada na primeira espera de cada loop)"""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_cond = asyncio.Condition()
+            self._async_loop = loop
+        return self._async_cond
+
+    async def acquire_async(self):
+        """Equivalente de acquire() para o motor asyncio"""
+        cond = self._get_async_cond()
+        async with cond:
+            await cond.wait_for(self._has_free_slot)
+            self._in_flight += 1
+
+    async def release_async(self):
+        self._in_flight -= 1
+        cond = self._get_async_cond()
+        async with cond:
+            cond.notify_all()
+
+    def on_success(self):
+        """Aumento aditivo: +1 vaga a cada 'limite' respostas bem-sucedidas"""
+        with self._cond:
+            self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1.0 / self.concurrency_limit)
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        """Redução multiplicativa, no máximo uma vez por segundo (rajadas de 429 contam uma vez)"""
+        with self._cond:
+            self.throttled_responses += 1
+            now = time.monotonic()
+            if now - self._last_decrease >= 1.0:
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+                self._last_decrease = now
+
+    def record_failure(self):
+        """Conta uma requisição que falhou mesmo após as retentativas"""
+        with self._cond:
+            self.failed_requests += 1
+
+    # --- Orçamento por minuto ---
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """
+        Reserva uma requisição e 'estimated_tokens' tokens nos baldes.
+        Retorna o tempo (s) que o chamador deve esperar antes de enviar.
+        """
+        with self._cond:
+            now = time.monotonic()
+            wait = max(self._requests.reserve(1, now), self._tokens.reserve(estimated_tokens, now))
+            self.throttle_time += wait
+            return wait
+
+    def update_from_headers(self, headers) -> None:
+        """Sincroniza os baldes com os cabeçalhos x-ratelimit-* da resposta"""
+        if not headers:
+            return
+        with self._cond:
+            now = time.monotonic()
+            self._requests.sync(_to_float(headers.get('x-ratelimit-limit-requests')),
+                                _to_float(headers.get('x-ratelimit-remaining-requests')), now)
+            self._tokens.sync(_to_float(headers.get('x-ratelimit-limit-tokens')),
+                              _to_float(headers.get('x-ratelimit-remaining-tokens')), now)
+
+    # --- Retentativas ---
+
+    @staticmethod
+    def is_retryable(status_code: Optional[int]) -> bool:
+        """429, 5xx e falhas de conexão (status None) merecem nova tentativa"""
+        return status_code is None or status_code == 429 or status_code >= 500
+
+    def backoff_delay(self, attempt: int, headers=None) -> float:
+        """Backoff exponencial com jitter completo; nunca menor que o retry-after da API"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = _retry_after(headers)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        with self._cond:
+            self.retries += 1
+            self.throttle_time += delay
+        return delay
+
+    def stats(self) -> Dict:
+        return {
+            'retries': self.retries,
+            'throttled_responses': self.throttled_responses,
+            'failed_requests': self.failed_requests,
+            'throttle_time_s': round(self.throttle_time, 2),
+            'final_concurrency': int(self.concurrency_limit)
+        }
+
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Converte durações no formato da OpenAI ('1s', '6m0s', '20ms') em segundos"""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return _to_float(value)
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+def _retry_after(headers) -> Optional[float]:
+    if not headers:
+        return None
+    retry_after_ms = _to_float(headers.get('retry-after-ms'))
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000.0
+    retry_after = _to_float(headers.get('retry-after'))
+    if retry_after is not None:
+        return retry_after
+    # Sem retry-after explícito, usa o tempo até o reset do limite mais próximo
+    resets = [_parse_duration(headers.get(name)) for name in ('x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens')]
+    resets = [r for r in resets if r is not None]
+    return min(resets) if resets else None
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,68 @@
+import re
+from typing import Dict, List, Optional
+from backend.config import Config
+from backend.document_reader import LINE_PATTERNS
+
+class RuleClassifier:
+    """
+    Pré-classificação local, antes da IA.
+
+    Cada estilo do payload pode declarar regras opcionais:
+        "rules": ["alternative", "^Resposta:"]   # grupos de LINE_PATTERNS ou regex
+        "matchImage": true                        # parágrafos que são só imagem
+        "matchEmpty": true                        # parágrafos vazios
+
+    Um parágrafo só é classificado localmente quando exatamente um estilo casa com
+    ele (alta confiança); havendo empate ou nenhuma regra, ele segue para a IA.
+    Parágrafos vazios sem estilo 'matchEmpty' ficam sem marcador
+    (Config.RULES_SKIP_EMPTY_PARAGRAPHS).
+    """
+
+    def __init__(self, styles: List[Dict]):
+        self.text_rules = []
+        self.image_markers = []
+        self.empty_markers = []
+
+        for style in styles:
+            marker = style['marker']
+            patterns = []
+            for rule in style.get('rules') or []:
+                if rule in LINE_PATTERNS:
+                    patterns.extend(LINE_PATTERNS[rule])
+                    continue
+                try:
+                    patterns.append(re.compile(rule, re.IGNORECASE))
+                except re.error as e:
+                    print(f"  ✗ Regra inválida ignorada no estilo '{style.get('name', marker)}': {rule} ({e})")
+            if patterns:
+                self.text_rules.append((marker, patterns))
+            if style.get('matchImage'):
+                self.image_markers.append(marker)
+            if style.get('matchEmpty'):
+                self.empty_markers.append(marker)
+
+    def classify(self, para_data: Dict) -> Optional[str]:
+        """Retorna o marcador (ou '[[NONE]]') quando a decisão é segura; None se ambíguo"""
+        if para_data.get('type') != 'paragraph':
+            return None
+
+        text = (para_data.get('text') or '').strip()
+
+        if para_data.get('is_image_paragraph'):
+            return self._single(self.image_markers)
+
+        if not text:
+            if para_data.get('has_image'):
+                return None
+            if self.empty_markers:
+                return self._single(self.empty_markers)
+            return "[[NONE]]" if Config.RULES_SKIP_EMPTY_PARAGRAPHS else None
+
+        matches = [marker for marker, patterns in self.text_rules
+                   if any(pattern.match(text) for pattern in patterns)]
+        return self._single(matches)
+
+    @staticmethod
+    def _single(markers: List[str]) -> Optional[str]:
+        unique = set(markers)
+        return unique.pop() if len(unique) == 1 else None
@@ -0,0 +1,318 @@
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.oxml.ns import qn
+from docx.oxml.simpletypes import ST_HpsMeasure
+from docx.shared import RGBColor
+from lxml import etree
+from typing import Callable, Dict, List, Tuple
+import re
+
+R_TAG = qn('w:r')
+T_TAG = qn('w:t')
+PPR_TAG = qn('w:pPr')
+RPR_TAG = qn('w:rPr')
+SZ_TAG = qn('w:sz')
+COLOR_TAG = qn('w:color')
+RFONTS_TAG = qn('w:rFonts')
+HIGHLIGHT_TAG = qn('w:highlight')
+SPACING_TAG = qn('w:spacing')
+RSTYLE_TAG = qn('w:rStyle')
+LANG_TAG = qn('w:lang')
+VAL_ATTR = qn('w:val')
+ASCII_ATTR = qn('w:ascii')
+ID_ATTR = qn('w:id')
+NAME_ATTR = qn('w:name')
+ANCHOR_ATTR = qn('w:anchor')
+INSTR_ATTR = qn('w:instr')
+PROOF_ERR_TAG = qn('w:proofErr')
+BOOKMARK_START_TAG = qn('w:bookmarkStart')
+BOOKMARK_END_TAG = qn('w:bookmarkEnd')
+HYPERLINK_TAG = qn('w:hyperlink')
+INSTR_TEXT_TAG = qn('w:instrText')
+FLD_SIMPLE_TAG = qn('w:fldSimple')
+FLD_CHAR_TAG = qn('w:fldChar')
+FLD_CHAR_TYPE_ATTR = qn('w:fldCharType')
+XML_SPACE_ATTR = '{http://www.w3.org/XML/1998/namespace}space'
+
+# Marcas de revisão: o conteúdo inserido fica, o excluído sai
+REVISION_UNWRAP_TAGS = (qn('w:ins'), qn('w:moveTo'))
+REVISION_REMOVE_TAGS = (qn('w:del'), qn('w:moveFrom'))
+REVISION_MARK_TAGS = (qn('w:rPrChange'), qn('w:pPrChange'),
+                      qn('w:moveFromRangeStart'), qn('w:moveFromRangeEnd'),
+                      qn('w:moveToRangeStart'), qn('w:moveToRangeEnd'))
+
+BLACK = RGBColor(0, 0, 0)
+
+def _remove_all(parent, tag) -> int:
+    removed = 0
+    for element in parent.findall(tag):
+        parent.remove(element)
+        removed += 1
+    return removed
+
+# --- Regras de run (recebem o w:rPr) ---
+
+def remove_font_size(rPr) -> int:
+    """w:sz com valor diferente de zero (como run.font.size = None)"""
+    sz = rPr.find(SZ_TAG)
+    if sz is not None and ST_HpsMeasure.from_xml(sz.attrib[VAL_ATTR]):
+        return _remove_all(rPr, SZ_TAG)
+    return 0
+
+def remove_black_color(rPr) -> int:
+    """w:color preto; 'auto' e outras cores ficam"""
+    color = rPr.find(COLOR_TAG)
+    if color is not None:
+        val = color.attrib[VAL_ATTR]
+        if val != 'auto' and RGBColor.from_string(val) == BLACK:
+            return _remove_all(rPr, COLOR_TAG)
+    return 0
+
+def remove_font_name(rPr) -> int:
+    """w:rFonts quando há fonte definida (como run.font.name = None)"""
+    rFonts = rPr.find(RFONTS_TAG)
+    if rFonts is not None and rFonts.get(ASCII_ATTR):
+        return _remove_all(rPr, RFONTS_TAG)
+    return 0
+
+def remove_highlight(rPr) -> int:
+    return _remove_all(rPr, HIGHLIGHT_TAG)
+
+def remove_character_spacing(rPr) -> int:
+    return _remove_all(rPr, SPACING_TAG)
+
+def remove_character_style(rPr) -> int:
+    return _remove_all(rPr, RSTYLE_TAG)
+
+def remove_language(rPr) -> int:
+    return _remove_all(rPr, LANG_TAG)
+
+# --- Regras de parágrafo (recebem o w:p) ---
+
+def remove_paragraph_spacing(p_element) -> int:
+    pPr = p_element.find(PPR_TAG)
+    return _remove_all(pPr, SPACING_TAG) if pPr is not None else 0
+
+def accept_revisions(p_element) -> int:
+    """
+    Aceita as alterações controladas do parágrafo: inserções viram texto normal,
+    exclusões saem e as marcas de alteração de formatação são descartadas. A marca
+    de exclusão do fim de parágrafo é só removida (os parágrafos não são unidos).
+    """
+    changes = 0
+    for element in list(p_element.iter(*REVISION_REMOVE_TAGS)):
+        parent = element.getparent()
+        if parent is not None:
+            parent.remove(element)
+            changes += 1
+    for element in list(p_element.iter(*REVISION_MARK_TAGS)):
+        element.getparent().remove(element)
+        changes += 1
+    for element in list(p_element.iter(*REVISION_UNWRAP_TAGS)):
+        for child in list(element):
+            element.addprevious(child)
+        element.getparent().remove(element)
+        changes += 1
+    return changes
+
+def remove_proof_errors(p_element) -> int:
+    """Marcas de erro de ortografia/gramática (w:proofErr), que separam runs iguais"""
+    removed = 0
+    for element in list(p_element.iter(PROOF_ERR_TAG)):
+        element.getparent().remove(element)
+        removed += 1
+    return removed
+
+_FIELD_TOKEN = re.compile(r'[^\s"\\]+')
+
+# Partes que o python-docx guarda só como bytes, mas que podem citar marcadores
+REFERENCE_BLOB_PART_TYPES = (CT.WML_FOOTNOTES, CT.WML_ENDNOTES, CT.WML_COMMENTS)
+_SAFE_PARSER = etree.XMLParser(resolve_entities=False, huge_tree=True)
+
+def _part_roots(document):
+    """Raiz XML de cada parte do pacote que pode referenciar marcadores"""
+    for part in document.part.package.iter_parts():
+        root = getattr(part, '_element', None)
+        if root is None and part.content_type in REFERENCE_BLOB_PART_TYPES:
+            root = etree.fromstring(part.blob, parser=_SAFE_PARSER)
+        if root is not None:
+            yield root
+
+def _field_references(root, names: set):
+    """
+    Palavras das instruções de campo da parte. A instrução de um campo complexo
+    costuma vir quebrada em vários w:instrText ('PAGEREF _Toc12' + '3456 \\h');
+    os pedaços entre o fldChar 'begin' e o 'separate' (ou 'end') são unidos antes
+    de separar as palavras. Campos aninhados têm cada um a sua instrução.
+    """
+    # Uma lista de pedaços por campo aberto; None depois do 'separate'
+    fields = []
+    for element in root.iter(INSTR_TEXT_TAG, FLD_SIMPLE_TAG, FLD_CHAR_TAG):
+        if element.tag == FLD_SIMPLE_TAG:
+            names.update(_FIELD_TOKEN.findall(element.get(INSTR_ATTR) or ''))
+        elif element.tag == INSTR_TEXT_TAG:
+            if fields and fields[-1] is not None:
+                fields[-1].append(element.text or '')
+            else:
+                names.update(_FIELD_TOKEN.findall(element.text or ''))
+        else:
+            kind = element.get(FLD_CHAR_TYPE_ATTR)
+            if kind == 'begin':
+                fields.append([])
+            elif kind in ('separate', 'end') and fields:
+                if fields[-1] is not None:
+                    names.update(_FIELD_TOKEN.findall(''.join(fields[-1])))
+                if kind == 'separate':
+                    fields[-1] = None
+                else:
+                    fields.pop()
+    # Campos sem 'end' (XML malformado): usa o que foi lido
+    for pieces in fields:
+        if pieces:
+            names.update(_FIELD_TOKEN.findall(''.join(pieces)))
+
+def _referenced_bookmarks(document) -> set:
+    """
+    Nomes citados por âncoras de hiperlink ou por instruções de campo (REF,
+    PAGEREF, HYPERLINK \\l, sumário...) em qualquer parte XML do pacote, inclusive
+    notas e comentários. Qualquer palavra de uma instrução conta como referência,
+    para não remover demais.
+    """
+    names = set()
+    for root in _part_roots(document):
+        for element in root.iter(HYPERLINK_TAG):
+            anchor = element.get(ANCHOR_ATTR)
+            if anchor:
+                names.add(anchor)
+        _field_references(root, names)
+    return names
+
+def remove_unreferenced_bookmarks(document) -> int:
+    """
+    Marcadores que nada referencia (_GoBack, restos de edição) e finais de
+    marcador órfãos. Percorre o corpo inteiro, pois início e fim do marcador
+    podem estar em parágrafos diferentes.
+    """
+    body = document.element.body
+    referenced = _referenced_bookmarks(document)
+    bookmarks = list(body.iter(BOOKMARK_START_TAG, BOOKMARK_END_TAG))
+    kept_ids = {element.get(ID_ATTR) for element in bookmarks
+                if element.tag == BOOKMARK_START_TAG and element.get(NAME_ATTR) in referenced}
+    removed = 0
+    for element in bookmarks:
+        if element.get(ID_ATTR) not in kept_ids:
+            element.getparent().remove(element)
+            removed += 1
+    return removed
+
+def _is_empty_run(r_element) -> bool:
+    for child in r_element:
+        if child.tag == RPR_TAG or (child.tag == T_TAG and not child.text):
+            continue
+        return False
+    return True
+
+def remove_empty_runs(p_element) -> int:
+    """Runs sem conteúdo (só w:rPr ou w:t vazio)"""
+    removed = 0
+    for r_element in list(p_element.iterchildren(R_TAG)):
+        if _is_empty_run(r_element):
+            p_element.remove(r_element)
+            removed += 1
+    return removed
+
+def _text_run_key(r_element):
+    """Chave de formatação de um run só de texto; None se o run tiver outro conteúdo"""
+    rPr = None
+    has_text = False
+    for child in r_element:
+        if child.tag == RPR_TAG:
+            rPr = child
+        elif child.tag == T_TAG:
+            has_text = True
+        else:
+            return None
+    if not has_text:
+        return None
+    return etree.tostring(rPr) if rPr is not None and len(rPr) else b''
+
+def merge_runs(p_element) -> int:
+    """
+    Une runs de texto vizinhos com o mesmo w:rPr em um só w:t. Runs com outro
+    conteúdo (tabulação, quebra, campo, imagem) separam os grupos.
+    """
+    groups = []
+    group = []
+    group_key = None
+    for child in p_element:
+        key = _text_run_key(child) if child.tag == R_TAG else None
+        if key is not None and group and key == group_key:
+            group.append(child)
+            continue
+        if len(group) > 1:
+            groups.append(group)
+        group = [child] if key is not None else []
+        group_key = key
+    if len(group) > 1:
+        groups.append(group)
+
+    merged = 0
+    for group in groups:
+        first = group[0]
+        texts = first.findall(T_TAG)
+        pieces = [t.text or '' for t in texts]
+        for r_element in group[1:]:
+            pieces.extend(t.text or '' for t in r_element.findall(T_TAG))
+            p_element.remove(r_element)
+            merged += 1
+        for t in texts[1:]:
+            first.remove(t)
+        texts[0].text = ''.join(pieces)
+        texts[0].set(XML_SPACE_ATTR, 'preserve')
+    return merged
+
+# Regras na ordem de execução. Escopos:
+#   'document'  - uma vez, antes da varredura (recebe o Document)
+#   'paragraph' - antes dos runs (recebe o w:p)
+#   'run'       - para cada run direto com w:rPr (recebe o w:rPr)
+#   'cleanup'   - depois dos runs (recebe o w:p)
+SANITIZATION_RULES: List[Tuple[str, str, Callable]] = [
+    ('bookmarks', 'document', remove_unreferenced_bookmarks),
+    ('revisions', 'paragraph', accept_revisions),
+    ('proof_errors', 'paragraph', remove_proof_errors),
+    ('paragraph_spacing', 'paragraph', remove_paragraph_spacing),
+    ('font_size', 'run', remove_font_size),
+    ('black_color', 'run', remove_black_color),
+    ('font_name', 'run', remove_font_name),
+    ('highlight', 'run', remove_highlight),
+    ('character_spacing', 'run', remove_character_spacing),
+    ('character_styles', 'run', remove_character_style),
+    ('language', 'run', remove_language),
+    ('empty_runs', 'cleanup', remove_empty_runs),
+    ('merge_runs', 'cleanup', merge_runs),
+]
+
+# Normalização estrutural: une runs fragmentados e tira o ruído que os separa,
+# sem alterar texto nem formatação
+NORMALIZATION_RULES = ('proof_errors', 'bookmarks', 'empty_runs', 'merge_runs')
+
+# 'legacy' é a limpeza histórica (tamanho, cor preta e fonte); 'default'
+# acrescenta a normalização
+SANITIZATION_PROFILES: Dict[str, Tuple[str, ...]] = {
+    'default': ('font_size', 'black_color', 'font_name') + NORMALIZATION_RULES,
+    'legacy': ('font_size', 'black_color', 'font_name'),
+    'indesign': ('revisions', 'font_size', 'black_color', 'font_name', 'highlight',
+                 'paragraph_spacing', 'character_spacing',
+                 'character_styles', 'language') + NORMALIZATION_RULES,
+    'none': (),
+}
+
+def compile_profile(profile: str) -> Dict[str, List[Tuple[str, Callable]]]:
+    """Separa as regras do perfil por escopo, mantendo a ordem de execução"""
+    if profile not in SANITIZATION_PROFILES:
+        raise ValueError(f"Perfil de sanitização desconhecido: {profile}")
+    enabled = set(SANITIZATION_PROFILES[profile])
+    compiled = {'document': [], 'paragraph': [], 'run': [], 'cleanup': []}
+    for name, scope, rule in SANITIZATION_RULES:
+        if name in enabled:
+            compiled[scope].append((name, rule))
+    return compiled
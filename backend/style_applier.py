@@ -1,15 +1,201 @@
-import os
-import tempfile # <--- ADICIONE ESTA LINHA
+from copy import deepcopy
 from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.style import WD_STYLE_TYPE
-from typing import List, Dict
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from backend.config import Config
+from backend.document_reader import HYPERLINK_TAG, R_TAG, is_line_break, paragraph_text
+from typing import List, Dict, Union
+import time
+
+# Posição sem estilo a aplicar (None é um id válido: o estilo padrão)
+_NO_STYLE = object()
+
+P_TAG = qn('w:p')
+TBL_TAG = qn('w:tbl')
+PPR_TAG = qn('w:pPr')
+RPR_TAG = qn('w:rPr')
+PSTYLE_TAG = qn('w:pStyle')
+SECTPR_TAG = qn('w:sectPr')
+NUMPR_TAG = qn('w:numPr')
+PAGE_BREAK_BEFORE_TAG = qn('w:pageBreakBefore')
+KEEP_NEXT_TAG = qn('w:keepNext')
+KEEP_LINES_TAG = qn('w:keepLines')
+SPACING_TAG = qn('w:spacing')
+IND_TAG = qn('w:ind')
+PBDR_TAG = qn('w:pBdr')
+VAL_ATTR = qn('w:val')
+# Atributos de w:spacing/w:ind e bordas de w:pBdr que só valem na primeira ou
+# na última linha do parágrafo original
+_FIRST_LINE_SPACING = tuple(qn(f'w:{name}') for name in ('before', 'beforeLines', 'beforeAutospacing'))
+_LAST_LINE_SPACING = tuple(qn(f'w:{name}') for name in ('after', 'afterLines', 'afterAutospacing'))
+_FIRST_LINE_INDENT = tuple(qn(f'w:{name}') for name in ('firstLine', 'firstLineChars', 'hanging', 'hangingChars'))
+# Ids que não podem se repetir entre os parágrafos de uma divisão
+UNIQUE_P_ATTRS = ('{http://schemas.microsoft.com/office/word/2010/wordml}paraId',
+                  '{http://schemas.microsoft.com/office/word/2010/wordml}textId')
+
+def set_paragraph_style(p_element, style_id):
+    """
+    Grava o w:pStyle do parágrafo direto no XML, com o mesmo resultado do setter
+    do python-docx (w:pPr é sempre o primeiro filho do w:p e w:pStyle o primeiro
+    do w:pPr; None remove o w:pStyle), sem percorrer as listas de sucessores.
+    """
+    pPr = p_element.find(PPR_TAG)
+    if pPr is None:
+        pPr = OxmlElement('w:pPr')
+        p_element.insert(0, pPr)
+    pStyle = pPr.find(PSTYLE_TAG)
+    if style_id is None:
+        if pStyle is not None:
+            pPr.remove(pStyle)
+    elif pStyle is None:
+        pStyle = OxmlElement('w:pStyle', {VAL_ATTR: style_id})
+        pPr.insert(0, pStyle)
+    else:
+        pStyle.set(VAL_ATTR, style_id)
+
+def _remove_attrs(element, names):
+    if element is not None:
+        for name in names:
+            element.attrib.pop(name, None)
+
+def _remove_children(parent, tag):
+    for child in parent.findall(tag):
+        parent.remove(child)
+
+def _trim_line_pPr(pPr, first: bool, last: bool, keep_lines: bool):
+    """
+    Ajusta a cópia do w:pPr de uma linha da divisão para que o bloco de linhas
+    se pareça com o parágrafo original: numeração, quebra de página antes, espaço
+    antes, recuo de primeira linha e borda superior só na primeira linha; w:sectPr,
+    espaço depois e borda inferior só na última. Manter com o próximo fica só na
+    última linha, a menos que o original mantivesse as linhas juntas (aí toda
+    linha, menos a última, mantém com a seguinte).
+    """
+    spacing = pPr.find(SPACING_TAG)
+    borders = pPr.find(PBDR_TAG)
+    if not first:
+        _remove_children(pPr, NUMPR_TAG)
+        _remove_children(pPr, PAGE_BREAK_BEFORE_TAG)
+        _remove_attrs(spacing, _FIRST_LINE_SPACING)
+        _remove_attrs(pPr.find(IND_TAG), _FIRST_LINE_INDENT)
+        if borders is not None:
+            _remove_children(borders, qn('w:top'))
+    if not last:
+        _remove_children(pPr, SECTPR_TAG)
+        _remove_attrs(spacing, _LAST_LINE_SPACING)
+        if borders is not None:
+            _remove_children(borders, qn('w:bottom'))
+        if keep_lines:
+            if pPr.find(KEEP_NEXT_TAG) is None:
+                keep_next = OxmlElement('w:keepNext')
+                # Ordem do esquema: keepNext vem logo após pStyle
+                pStyle = pPr.find(PSTYLE_TAG)
+                pPr.insert(0 if pStyle is None else pPr.index(pStyle) + 1, keep_next)
+        else:
+            _remove_children(pPr, KEEP_NEXT_TAG)
+    for element in (spacing, borders):
+        if element is not None and not len(element) and not element.attrib:
+            pPr.remove(element)
+
+def _is_on(element) -> bool:
+    return element is not None and element.get(VAL_ATTR) not in ('0', 'false', 'off')
+
+def split_paragraph_at_breaks(p_element) -> List:
+    """
+    Divide o w:p em um w:p por linha, nas mesmas quebras que geram '\\n' em
+    paragraph.text (w:br de linha e w:cr em runs diretos e de hyperlinks).
+    
+    Cada linha recebe uma cópia do w:pPr, sem o que só vale no início ou no fim
+    do parágrafo (numeração só na primeira, w:sectPr só na última; ver
+    _trim_line_pPr), e os runs são partidos na quebra, com cópias do w:rPr e do
+    w:hyperlink, então a formatação de caractere é preservada. O conteúdo é
+    movido, não copiado: o w:p original fica vazio e deve ser substituído pelas
+    linhas retornadas.
+    """
+    pPr = p_element.find(PPR_TAG)
+    lines = []
+    # Linha atual e, dentro dela, a cópia do hyperlink que está recebendo runs
+    state = {'line': None, 'hyperlink': None}
+    
+    def start_line():
+        line = p_element.makeelement(P_TAG, {})
+        for name, value in p_element.attrib.items():
+            if not lines or name not in UNIQUE_P_ATTRS:
+                line.set(name, value)
+        if pPr is not None:
+            line.append(deepcopy(pPr))
+        lines.append(line)
+        state['line'] = line
+        state['hyperlink'] = None
+    
+    def split_run(r_element, hyperlink=None):
+        rPr = r_element.find(RPR_TAG)
+        piece = None
+        for child in list(r_element):
+            if child is rPr:
+                continue
+            if is_line_break(child):
+                start_line()
+                piece = None
+                continue
+            if piece is None:
+                piece = r_element.makeelement(R_TAG, r_element.attrib)
+                if rPr is not None:
+                    piece.append(deepcopy(rPr))
+                container(hyperlink).append(piece)
+            piece.append(child)
+    
+    def container(hyperlink):
+        if hyperlink is None:
+            return state['line']
+        if state['hyperlink'] is None:
+            state['hyperlink'] = hyperlink.makeelement(hyperlink.tag, hyperlink.attrib)
+            state['line'].append(state['hyperlink'])
+        return state['hyperlink']
+    
+    start_line()
+    for child in list(p_element):
+        if child is pPr:
+            continue
+        if child.tag == R_TAG:
+            split_run(child)
+        elif child.tag == HYPERLINK_TAG:
+            for grandchild in list(child):
+                if grandchild.tag == R_TAG:
+                    split_run(grandchild, child)
+                else:
+                    container(child).append(grandchild)
+            state['hyperlink'] = None
+        else:
+            state['line'].append(child)
+    
+    if pPr is not None and len(lines) > 1:
+        keep_lines = _is_on(pPr.find(KEEP_LINES_TAG))
+        for position, line in enumerate(lines):
+            _trim_line_pPr(line.find(PPR_TAG), position == 0, position == len(lines) - 1, keep_lines)
+    return lines
 
 class StyleApplier:
-    def __init__(self, document_path: str):
-        self.document_path = document_path
+    def __init__(self, document: Union[str, Document]):
+        """
+        Recebe o Document já carregado (preferível: evita reler o .docx do disco)
+        ou, por compatibilidade, o caminho do arquivo.
+        """
+        if isinstance(document, str):
+            self.document_path = document
+            self.document = None
+            print(f"StyleApplier inicializado com documento: {document}")
+        else:
+            self.document_path = None
+            self.document = document
+            print("StyleApplier inicializado com documento em memória")
         self.styles_map = {}
-        print(f"StyleApplier inicializado com documento: {document_path}")
+        self.stats = {}
+        # Índice do elemento -> nós w:p/w:tbl do documento, após apply_styles
+        self.element_nodes = {}
+        self.removal_stats = {}
         
     def register_styles(self, styles: List[Dict]):
         """Registra os estilos a serem aplicados"""
@@ -57,271 +243,192 @@ class StyleApplier:
         """
         print(f"\nIniciando aplicação de estilos...")
         
-        # Carrega o documento original
-        doc = Document(self.document_path)
+        # Usa o documento em memória; só carrega do disco se foi criado com um caminho
+        if self.document is None:
+            self.document = Document(self.document_path)
+        doc = self.document
         
         # Garante que todos os estilos customizados existem no documento
         print("\nVerificando/Criando estilos personalizados no documento:")
         for marker, style_config in self.styles_map.items():
             self._ensure_style_exists(doc, style_config)
         
-        # Agrupa elementos marcados por parágrafo original
-        elements_by_para = {}
-        for elem in marked_content:
-            para_idx = elem.get('original_para_index')
-            if para_idx is not None:
-                if para_idx not in elements_by_para:
-                    elements_by_para[para_idx] = []
-                elements_by_para[para_idx].append(elem)
+        started = time.perf_counter()
+        style_ids = self._resolve_style_ids(doc)
         
-        stats = {'styled': 0, 'total': len(doc.paragraphs)}
+        # Filhos do corpo na mesma ordem usada pelo DocumentReader (body_index)
+        body_blocks = list(doc.element.body.iterchildren(P_TAG, TBL_TAG))
+        table_paragraphs = {}
         
-        print(f"\nAplicando estilos em {len(doc.paragraphs)} parágrafos...")
+        def cell_paragraphs(body_index):
+            # Parágrafos da tabela na ordem de cell_paragraph_index, antes de dividir
+            if body_index not in table_paragraphs:
+                table_paragraphs[body_index] = list(body_blocks[body_index].iter(P_TAG))
+            return table_paragraphs[body_index]
         
-        # Processa parágrafos que precisam ser divididos
-        paragraphs_to_split = []
-        for i, para in enumerate(doc.paragraphs):
-            elements = elements_by_para.get(i, [])
-            
-            # Se o parágrafo foi dividido em múltiplos elementos com diferentes estilos
-            if len(elements) > 1 and any(e.get('was_split') for e in elements):
-                # Por enquanto, aplica o estilo do primeiro elemento com marcador
-                for elem in elements:
-                    if elem.get('markers'):
-                        for marker in elem['markers']:
-                            if marker in self.styles_map:
-                                style_info = self.styles_map[marker]
-                                try:
-                                    para.style = doc.styles[style_info['wordStyle']]
-                                    stats['styled'] += 1
-                                    if i < 50:
-                                        print(f"  ✓ Parágrafo {i} (múltiplos elementos): Estilo '{style_info['wordStyle']}' aplicado.")
-                                    break
-                                except Exception as e:
-                                    print(f"  ✗ ERRO ao aplicar estilo no parágrafo {i}: {e}")
-                        break
-            else:
-                # Parágrafo normal - aplica o estilo diretamente
-                if elements:
-                    elem = elements[0]
-                    if elem.get('markers'):
-                        for marker in elem['markers']:
-                            if marker in self.styles_map:
-                                style_info = self.styles_map[marker]
-                                try:
-                                    para.style = doc.styles[style_info['wordStyle']]
-                                    stats['styled'] += 1
-                                    if i < 50:
-                                        print(f"  ✓ Parágrafo {i}: Estilo '{style_info['wordStyle']}' aplicado.")
-                                    break
-                                except Exception as e:
-                                    print(f"  ✗ ERRO ao aplicar estilo no parágrafo {i}: {e}")
+        def paragraph_at(body_index, cell_index):
+            if cell_index is None:
+                return body_blocks[body_index]
+            return cell_paragraphs(body_index)[cell_index]
         
-        print("\nAplicação de estilos concluída.")
-        print(f"  - {stats['styled']} de {stats['total']} parágrafos tiveram um estilo aplicado.")
+        stats = {'styled': 0, 'total': sum(1 for block in body_blocks if block.tag == P_TAG),
+                 'split': 0, 'lines': 0}
         
-        return doc
-    
-    def _prepare_document_with_splits_UNUSED(self, marked_content: List[Dict]) -> Document:
-        """Prepara o documento dividindo parágrafos que contêm múltiplas linhas com estilos diferentes"""
-        # Carrega o documento original
-        original_doc = Document(self.document_path)
-        
-        # IMPORTANTE: Em vez de criar um novo documento, vamos trabalhar com uma cópia do original
-        # Isso preserva todas as relações de mídia (imagens)
-        import os
-        temp_fd, temp_path = tempfile.mkstemp(suffix='.docx')
-        try:
-            # Fecha o descritor de arquivo imediatamente
-            os.close(temp_fd)
-            
-            # Salva o documento original no arquivo temporário
-            original_doc.save(temp_path)
-            
-            # Libera o documento original
-            original_doc = None
-            
-            # Reabre como novo documento
-            new_doc = Document(temp_path)
-        except Exception as e:
-            # Se houver erro, limpa o arquivo temporário
-            if os.path.exists(temp_path):
-                try:
-                    os.unlink(temp_path)
-                except:
-                    pass
-            raise e
+        print(f"\nAplicando estilos em {stats['total']} parágrafos...")
         
-        # Agrupa elementos marcados por parágrafo original
-        elements_by_para = {}
-        for elem in marked_content:
-            para_idx = elem.get('original_para_index')
-            if para_idx is not None:
-                if para_idx not in elements_by_para:
-                    elements_by_para[para_idx] = []
-                elements_by_para[para_idx].append(elem)
-        
-        # Lista para armazenar parágrafos que precisam ser substituídos
-        paragraphs_to_replace = []
-        
-        # Identifica parágrafos que precisam ser divididos
-        for i, para in enumerate(new_doc.paragraphs):
-            elements = elements_by_para.get(i, [])
+        # Plano por posição (body_index, cell_paragraph_index): os elementos e o id
+        # do estilo, ou, para parágrafos que serão divididos, o estilo de cada linha
+        plans = {}
+        for (body_index, cell_index), elements in self._group_by_position(marked_content).items():
+            i = elements[0].get('original_para_index')
+            if i is None:
+                i = body_index
             
-            # Se o parágrafo foi dividido em múltiplos elementos
             if len(elements) > 1 and any(e.get('was_split') for e in elements):
-                # Não tem imagens neste parágrafo dividido (pois foi dividido por ter múltiplas linhas de texto)
-                paragraphs_to_replace.append({
-                    'index': i,
-                    'paragraph': para,
-                    'elements': elements
-                })
-        
-        # Agora substituímos os parágrafos que precisam ser divididos
-        # Fazemos isso de trás para frente para não bagunçar os índices
-        for replacement in reversed(paragraphs_to_replace):
-            para = replacement['paragraph']
-            elements = replacement['elements']
-            
-            # Obtém o elemento pai e a posição do parágrafo
-            parent = para._element.getparent()
-            para_idx = parent.index(para._element)
-            
-            # Remove o parágrafo original
-            parent.remove(para._element)
-            
-            # Insere novos parágrafos para cada elemento
-            for elem_idx, elem in enumerate(reversed(elements)):
-                if elem.get('text', '').strip():
-                    # Cria novo parágrafo
-                    from docx.oxml.text.paragraph import CT_P
-                    new_p = CT_P()
-                    
-                    # Adiciona o texto
-                    from docx.oxml import OxmlElement
-                    from docx.oxml.ns import qn
-                    
-                    new_run = OxmlElement('w:r')
-                    new_text = OxmlElement('w:t')
-                    new_text.text = elem['text']
-                    new_run.append(new_text)
-                    new_p.append(new_run)
-                    
-                    # Marca com índice do elemento
-                    new_p.set('elem_index', str(elem['index']))
-                    
-                    # Insere na posição correta
-                    parent.insert(para_idx, new_p)
-        
-        # Marca parágrafos não divididos com seus índices de elemento
-        for i, para in enumerate(new_doc.paragraphs):
-            if not para._element.get('elem_index'):
-                elements = elements_by_para.get(i, [])
-                if elements:
-                    para._element.set('elem_index', str(elements[0]['index']))
-                else:
-                    para._element.set('elem_index', str(i))
-        
-        # Salva o documento modificado em um novo arquivo temporário e limpa o antigo
-        import os
-        new_temp_fd, new_temp_path = tempfile.mkstemp(suffix='.docx')
-        try:
-            os.close(new_temp_fd)
-            new_doc.save(new_temp_path)
-            
-            # Limpa o arquivo temporário antigo
-            if os.path.exists(temp_path):
-                try:
-                    os.unlink(temp_path)
-                except:
-                    pass
-            
-            # Reabre o documento do novo arquivo temporário
-            final_doc = Document(new_temp_path)
-            
-            # Armazena o caminho para limpeza posterior
-            self._temp_file_to_cleanup = new_temp_path
+                if Config.STYLE_SPLIT_PARAGRAPHS and \
+                        self._lines_match(paragraph_at(body_index, cell_index), elements):
+                    # Um w:p por linha, cada um com o estilo do seu elemento
+                    line_styles = {}
+                    for elem in elements:
+                        marker, style_id = self._marker_style(elem, style_ids, i)
+                        if marker is None:
+                            continue
+                        line_styles[elem['line_in_paragraph']] = style_id
+                        stats['styled'] += 1
+                        if i < 50:
+                            print(f"  ✓ Parágrafo {i}, linha {elem['line_in_paragraph']}: Estilo '{self.styles_map[marker]['wordStyle']}' aplicado.")
+                    plans[(body_index, cell_index)] = (elements, line_styles)
+                    continue
+                # Sem divisão, vale o primeiro elemento com marcador
+                elem = next((e for e in elements if e.get('markers')), None)
+                detail = " (múltiplos elementos)"
+            else:
+                elem = elements[0]
+                detail = ""
             
-            return final_doc
-        except Exception as e:
-            # Limpa ambos os arquivos temporários em caso de erro
-            for path in [temp_path, new_temp_path]:
-                if os.path.exists(path):
-                    try:
-                        os.unlink(path)
-                    except:
-                        pass
-            raise e
-    
-    def _apply_styles_to_document_UNUSED(self, doc: Document, marked_content: List[Dict]) -> Document:
-        """Aplica os estilos ao documento preparado"""
-        # Cria um mapa de índice de elemento para marcações
-        marked_map = {m['index']: m for m in marked_content if 'index' in m}
-
-        
-        # Garante que todos os estilos customizados existem no documento
-        print("\nVerificando/Criando estilos personalizados no documento:")
-        for marker, style_config in self.styles_map.items():
-            self._ensure_style_exists(doc, style_config)
-        
-        stats = {'styled': 0, 'total': len(doc.paragraphs)}
-        
-        print(f"\nAplicando estilos em {len(doc.paragraphs)} parágrafos...")
-        
-        # Itera sobre os parágrafos do documento e aplica o estilo
-        for i, para in enumerate(doc.paragraphs):
-            # Tenta obter o índice do elemento do atributo XML
-            elem_index_str = para._element.get('elem_index')
-            if elem_index_str:
-                elem_index = int(elem_index_str)
-                marked_elem = marked_map.get(elem_index)
-                
-                if marked_elem and marked_elem.get('markers'):
-                    for marker in marked_elem['markers']:
-                        if marker in self.styles_map:
-                            style_info = self.styles_map[marker]
-                            try:
-                                para.style = doc.styles[style_info['wordStyle']]
-                                stats['styled'] += 1
-                                if i < 50:
-                                    was_split = marked_elem.get('was_split', False)
-                                    split_info = " (linha dividida)" if was_split else ""
-                                    print(f"  ✓ Parágrafo {i}{split_info}: Estilo '{style_info['wordStyle']}' aplicado.")
-                                break
-                            except Exception as e:
-                                print(f"  ✗ ERRO ao aplicar estilo no parágrafo {i}: {e}")
-        
+            marker, style_id = self._marker_style(elem, style_ids, i)
+            if marker is None:
+                plans[(body_index, cell_index)] = (elements, _NO_STYLE)
+                continue
+            plans[(body_index, cell_index)] = (elements, style_id)
+            stats['styled'] += 1
+            if i < 50:
+                print(f"  ✓ Parágrafo {i}{detail}: Estilo '{self.styles_map[marker]['wordStyle']}' aplicado.")
+        
+        # Uma passada pelo corpo gravando o w:pStyle direto no XML e dividindo os
+        # parágrafos de várias linhas; guarda os nós de cada elemento
+        self.element_nodes = {}
+        tables = {elem['body_index']: elem for elem in marked_content
+                  if elem.get('type') == 'table' and elem.get('body_index') is not None}
+        tables_with_plans = {body_index for body_index, cell_index in plans if cell_index is not None}
+        for body_index, block in enumerate(body_blocks):
+            if block.tag == P_TAG:
+                plan = plans.get((body_index, None))
+                if plan:
+                    self._apply_plan(block, *plan, stats)
+                continue
+            if body_index in tables:
+                self.element_nodes[tables[body_index].get('index')] = [block]
+            if body_index in tables_with_plans:
+                for cell_index, p_element in enumerate(cell_paragraphs(body_index)):
+                    plan = plans.get((body_index, cell_index))
+                    if plan:
+                        self._apply_plan(p_element, *plan, stats)
+        
+        stats['total'] = sum(1 for _ in doc.element.body.iterchildren(P_TAG))
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        self.stats = stats
         print("\nAplicação de estilos concluída.")
-        print(f"  - {stats['styled']} de {stats['total']} parágrafos tiveram um estilo aplicado.")
-        
-        # Limpa arquivo temporário se existir
-        if hasattr(self, '_temp_file_to_cleanup'):
-            import os
-            if os.path.exists(self._temp_file_to_cleanup):
-                try:
-                    # Salva o documento em um novo arquivo temporário final
-                    final_temp_fd, final_temp_path = tempfile.mkstemp(suffix='.docx')
-                    os.close(final_temp_fd)
-                    doc.save(final_temp_path)
-                    
-                    # Limpa o arquivo temporário anterior
-                    os.unlink(self._temp_file_to_cleanup)
-                    
-                    # Reabre do arquivo final
-                    final_doc = Document(final_temp_path)
-                    
-                    # Limpa o arquivo temporário final após carregar
-                    try:
-                        os.unlink(final_temp_path)
-                    except:
-                        pass
-                    
-                    return final_doc
-                except:
-                    pass
+        if stats['split']:
+            print(f"  - {stats['split']} parágrafos divididos em {stats['lines']} parágrafos, um por linha.")
+        print(f"  - {stats['styled']} de {stats['total']} parágrafos tiveram um estilo aplicado ({stats['seconds']:.2f}s).")
         
         return doc
     
+    def _marker_style(self, elem: Dict, style_ids: Dict, i: int):
+        """
+        Primeiro marcador registrado do elemento cujo estilo pode ser aplicado:
+        (marcador, id do estilo), ou (None, None). Informa os estilos com erro.
+        """
+        if not elem or not elem.get('markers'):
+            return None, None
+        for marker in elem['markers']:
+            if marker not in style_ids:
+                continue
+            style_id = style_ids[marker]
+            if isinstance(style_id, Exception):
+                print(f"  ✗ ERRO ao aplicar estilo no parágrafo {i}: {style_id}")
+                continue
+            return marker, style_id
+        return None, None
+    
+    @staticmethod
+    def _lines_match(p_element, elements: List[Dict]) -> bool:
+        """As linhas do w:p ainda são as que o leitor dividiu (mesmo texto por linha)"""
+        lines = paragraph_text(p_element).split('\n')
+        for elem in elements:
+            line_index = elem.get('line_in_paragraph')
+            if line_index is None or line_index >= len(lines) or lines[line_index] != elem.get('text'):
+                return False
+        return True
+    
+    def _apply_plan(self, p_element, elements: List[Dict], style, stats: Dict):
+        """
+        Aplica o plano de uma posição. Com estilos por linha, substitui o w:p pelas
+        linhas de split_paragraph_at_breaks; linhas sem elemento (vazias) ficam com
+        o elemento anterior em element_nodes.
+        """
+        if not isinstance(style, dict):
+            if style is not _NO_STYLE:
+                set_paragraph_style(p_element, style)
+            for elem in elements:
+                self.element_nodes[elem.get('index')] = [p_element]
+            return
+        
+        lines = split_paragraph_at_breaks(p_element)
+        for line in lines:
+            p_element.addprevious(line)
+        p_element.getparent().remove(p_element)
+        stats['split'] += 1
+        stats['lines'] += len(lines)
+        
+        by_line = {elem['line_in_paragraph']: elem for elem in elements}
+        owner = elements[0]
+        for line_index, line in enumerate(lines):
+            owner = by_line.get(line_index, owner)
+            self.element_nodes.setdefault(owner.get('index'), []).append(line)
+            if line_index in style:
+                set_paragraph_style(line, style[line_index])
+    
+    def _resolve_style_ids(self, doc: Document) -> Dict:
+        """
+        Id do estilo de cada marcador registrado, resolvido uma única vez (None para
+        o estilo padrão, como em paragraph.style = estilo). Um estilo que não pode
+        ser aplicado fica guardado como a exceção, informada em cada parágrafo.
+        """
+        style_ids = {}
+        for marker, style_info in self.styles_map.items():
+            try:
+                style = doc.styles[style_info['wordStyle']]
+                style_ids[marker] = doc.part.get_style_id(style, WD_STYLE_TYPE.PARAGRAPH)
+            except Exception as e:
+                style_ids[marker] = e
+        return style_ids
+    
+    @staticmethod
+    def _group_by_position(marked_content: List[Dict]) -> Dict:
+        """
+        Agrupa os elementos do tipo parágrafo pela posição no corpo (body_index e,
+        para parágrafos de células, cell_paragraph_index)
+        """
+        elements_by_position = {}
+        for elem in marked_content:
+            if elem.get('type') != 'paragraph' or elem.get('body_index') is None:
+                continue
+            key = (elem['body_index'], elem.get('cell_paragraph_index'))
+            elements_by_position.setdefault(key, []).append(elem)
+        return elements_by_position
+    
     def _ensure_style_exists(self, document: Document, style_config: Dict):
         """Garante que um estilo existe no documento com todas as configurações"""
         style_name = style_config['wordStyle']
@@ -384,47 +491,160 @@ class StyleApplier:
             print(f"  ✗ ERRO inesperado ao criar estilo '{style_name}': {e}")
     
     def remove_marked_content(self, document: Document, marked_content: List[Dict], removal_markers: List[Dict]) -> Document:
-        """NÃO remove conteúdo - apenas retorna o documento original"""
-        print(f"\nRemoção DESABILITADA - mantendo todo o conteúdo...")
-        
-        # SIMPLESMENTE RETORNA O DOCUMENTO ORIGINAL SEM REMOVER NADA
+        """
+        Remove do documento os trechos entre os marcadores de início e fim de cada
+        prompt de remoção. Os intervalos de todos os prompts são encontrados em uma
+        passada, unidos em ordem e removidos em uma varredura do corpo. As
+        estatísticas ficam em self.removal_stats.
+        """
+        started = time.perf_counter()
+        stats = {'ranges_found': 0, 'ranges_applied': 0, 'elements_removed': 0, 'nodes_removed': 0,
+                 'section_breaks_kept': 0, 'tables_kept': 0, 'seconds': 0.0}
+        self.removal_stats = stats
+        
+        if not Config.CONTENT_REMOVAL_ENABLED:
+            print(f"\nRemoção DESABILITADA - mantendo todo o conteúdo...")
+            return document
+        if not removal_markers:
+            print("\nNenhum prompt de remoção definido - mantendo todo o conteúdo.")
+            return document
+        
+        print(f"\nRemovendo conteúdo marcado ({len(removal_markers)} prompts de remoção)...")
+        ranges = self._identify_removal_ranges(marked_content, removal_markers)
+        stats['ranges_found'] = len(ranges)
+        ranges = self._validate_removal_ranges(ranges, len(marked_content))
+        stats['ranges_applied'] = len(ranges)
+        
+        if ranges:
+            body = document.element.body
+            to_remove = self._nodes_in_ranges(document, marked_content, ranges, stats)
+            
+            # Uma varredura do corpo; parágrafos com quebra de seção (w:sectPr no
+            # w:pPr) são esvaziados em vez de removidos, para não perder a seção
+            for block in list(body.iterchildren(P_TAG, TBL_TAG)):
+                if block not in to_remove:
+                    continue
+                pPr = block.find(PPR_TAG) if block.tag == P_TAG else None
+                if pPr is not None and pPr.find(SECTPR_TAG) is not None:
+                    for child in list(block):
+                        if child is not pPr:
+                            block.remove(child)
+                    stats['section_breaks_kept'] += 1
+                    continue
+                body.remove(block)
+                stats['nodes_removed'] += 1
+        
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        print("\nRemoção concluída.")
+        print(f"  - {stats['elements_removed']} elementos em {stats['ranges_applied']} intervalos "
+              f"({stats['nodes_removed']} blocos do corpo removidos, {stats['seconds']:.2f}s).")
+        if stats['section_breaks_kept'] or stats['tables_kept']:
+            print(f"  - Mantidos: {stats['section_breaks_kept']} quebras de seção (esvaziadas), "
+                  f"{stats['tables_kept']} tabelas cobertas só em parte.")
         return document
     
+    def _nodes_in_ranges(self, document: Document, marked_content: List[Dict],
+                         ranges: List[tuple], stats: Dict) -> set:
+        """
+        Blocos do corpo (w:p/w:tbl) cobertos pelos intervalos. Usa os nós de
+        element_nodes (já com os parágrafos divididos por apply_styles) ou, sem
+        eles, o body_index. Uma tabela só sai se todos os seus elementos estiverem
+        cobertos.
+        """
+        body = document.element.body
+        body_blocks = None
+        
+        def body_child(node):
+            while node is not None and node.getparent() is not body:
+                node = node.getparent()
+            return node
+        
+        def top_nodes(elem):
+            nonlocal body_blocks
+            nodes = self.element_nodes.get(elem.get('index'))
+            if nodes is None:
+                if elem.get('body_index') is None:
+                    return []
+                if body_blocks is None:
+                    body_blocks = list(body.iterchildren(P_TAG, TBL_TAG))
+                nodes = [body_blocks[elem['body_index']]]
+            return [top for top in map(body_child, nodes) if top is not None]
+        
+        def in_table(elem):
+            return elem.get('cell_paragraph_index') is not None
+        
+        to_remove = set()
+        covered_cells = {}
+        for start, end in ranges:
+            for elem in marked_content[start:end + 1]:
+                tops = top_nodes(elem)
+                if in_table(elem):
+                    for table in tops:
+                        covered_cells[table] = covered_cells.get(table, 0) + 1
+                    continue
+                to_remove.update(tops)
+                stats['elements_removed'] += 1
+        
+        if covered_cells:
+            total_cells = {}
+            for elem in marked_content:
+                if in_table(elem):
+                    for table in top_nodes(elem):
+                        if table in covered_cells:
+                            total_cells[table] = total_cells.get(table, 0) + 1
+            for table, covered in covered_cells.items():
+                if covered == total_cells[table]:
+                    to_remove.add(table)
+                    stats['elements_removed'] += covered
+                else:
+                    stats['tables_kept'] += 1
+        
+        return to_remove
+    
     def _identify_removal_ranges(self, marked_content: List[Dict], removal_markers: List[Dict]) -> List[tuple]:
-        """Identifica intervalos de parágrafos a serem removidos"""
+        """
+        Intervalos (início, fim) de elementos a remover, de todos os prompts em uma
+        única passada. Cada início abre um trecho que o próximo fim do mesmo prompt
+        fecha; um prompt pode ter vários trechos (ex.: um cartão-resposta por simulado).
+        """
         ranges = []
         
         print("\n  Procurando marcadores de remoção:")
         
-        for removal in removal_markers:
-            start_marker = removal['startMarker']
-            end_marker = removal['endMarker']
-            
-            print(f"    Procurando por '{removal['name']}' ({start_marker} / {end_marker})...")
-            
-            start_idx = None
+        # Marcador -> prompts que o usam como início ou fim
+        roles = {}
+        for k, removal in enumerate(removal_markers):
+            roles.setdefault(removal['startMarker'], []).append((k, 'start'))
+            roles.setdefault(removal['endMarker'], []).append((k, 'end'))
+        found = [0] * len(removal_markers)
+        open_starts = {}
+        
+        for i, para in enumerate(marked_content):
+            markers = para.get('markers')
+            if not markers:
+                continue
+            touched = {}
+            for marker in markers:
+                for k, role in roles.get(marker, ()):
+                    touched.setdefault(k, set()).add(role)
             
-            for i, para in enumerate(marked_content):
-                markers = para.get('markers', [])
-                
-                # Debug: mostra quando encontra marcadores
-                if markers and (start_marker in markers or end_marker in markers):
-                    print(f"      Parágrafo {i} tem marcadores: {markers}")
-                
-                if start_marker in markers and start_idx is None:
-                    start_idx = i
-                    print(f"      ✓ Início encontrado no parágrafo {i}: {para.get('text', '')[:50]}...")
-                
-                if end_marker in markers and start_idx is not None:
+            for k in sorted(touched):
+                name = removal_markers[k]['name']
+                if 'start' in touched[k] and k not in open_starts:
+                    open_starts[k] = i
+                    print(f"      ✓ Início de '{name}' no elemento {i}: {para.get('text', '')[:50]}...")
+                if 'end' in touched[k] and k in open_starts:
+                    start_idx = open_starts.pop(k)
                     ranges.append((start_idx, i))
-                    print(f"      ✓ Fim encontrado no parágrafo {i}: {para.get('text', '')[:50]}...")
-                    print(f"      → Intervalo adicionado: {start_idx} até {i} ({i - start_idx + 1} parágrafos)")
-                    start_idx = None
-                    break  # Para após encontrar o fim
-            
+                    found[k] += 1
+                    print(f"      ✓ Fim de '{name}' no elemento {i}: {para.get('text', '')[:50]}...")
+                    print(f"      → Intervalo adicionado: {start_idx} até {i} ({i - start_idx + 1} elementos)")
+        
+        for k, removal in enumerate(removal_markers):
+            print(f"    '{removal['name']}' ({removal['startMarker']} / {removal['endMarker']}): {found[k]} intervalo(s)")
             # Se encontrou início mas não fim
-            if start_idx is not None:
-                print(f"      ⚠️ AVISO: Início encontrado no parágrafo {start_idx} mas sem marcador de fim!")
+            if k in open_starts:
+                print(f"      ⚠️ AVISO: Início encontrado no elemento {open_starts[k]} mas sem marcador de fim!")
         
         return ranges
     
@@ -437,18 +657,20 @@ class StyleApplier:
             print(f"  ⚠️ Aviso ao preparar cópia de mídia: {e}")
     
     def _validate_removal_ranges(self, ranges: List[tuple], total_elements: int) -> List[tuple]:
-        """Valida e ajusta os intervalos de remoção para evitar remoção excessiva"""
+        """
+        Valida os intervalos e une os que se sobrepõem ou se tocam, em ordem
+        (O(k log k)). Nenhum intervalo, nem a soma deles, pode passar de 50% do
+        documento.
+        """
         if not ranges:
             return ranges
         
         print("\n  Validando intervalos de remoção:")
         
-        # Remove sobreposições e intervalos inválidos
-        validated = []
-        
+        merged = []
         for start, end in sorted(ranges):
             # Valida intervalo
-            if start < 0 or end >= total_elements:
+            if start < 0 or end >= total_elements or start > end:
                 print(f"    ⚠️ Intervalo inválido ignorado: {start}-{end} (total de elementos: {total_elements})")
                 continue
             
@@ -457,19 +679,21 @@ class StyleApplier:
             if interval_size > total_elements * 0.5:
                 print(f"    ⚠️ Intervalo muito grande ({interval_size} de {total_elements} elementos)!")
                 print(f"       Limitando remoção para proteger o conteúdo...")
-                # Você pode ajustar ou pular este intervalo
                 continue
             
-            # Verifica sobreposição com intervalos já validados
-            overlap = False
-            for v_start, v_end in validated:
-                if not (end < v_start or start > v_end):
-                    overlap = True
-                    print(f"    ⚠️ Intervalo {start}-{end} sobrepõe com {v_start}-{v_end}")
-                    break
-            
-            if not overlap:
-                validated.append((start, end))
-                print(f"    ✓ Intervalo validado: {start}-{end} ({interval_size} parágrafos)")
+            # Ordenados pelo início: só pode tocar o último intervalo unido
+            if merged and start <= merged[-1][1] + 1:
+                last_start, last_end = merged[-1]
+                merged[-1] = (last_start, max(last_end, end))
+                print(f"    ✓ Intervalo {start}-{end} unido a {last_start}-{last_end}")
+            else:
+                merged.append((start, end))
+                print(f"    ✓ Intervalo validado: {start}-{end} ({interval_size} elementos)")
+        
+        covered = sum(end - start + 1 for start, end in merged)
+        if covered > total_elements * 0.5:
+            print(f"    ⚠️ Os intervalos somam {covered} de {total_elements} elementos (mais de 50%)!")
+            print(f"       Remoção cancelada para proteger o conteúdo.")
+            return []
         
-        return validated
\ No newline at end of file
+        return merged
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark de DocumentReader.get_document_info em livros sintéticos de
+tamanhos crescentes, comparado com a contagem antiga, que procurava cada w:p
+em document.paragraphs (quadrática).
+
+    python benchmarks/bench_document_info.py --sizes 1000 2000 4000 8000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document  # noqa: E402
+from backend.document_reader import DocumentReader  # noqa: E402
+from benchmarks.synthetic_docx import ensure_book  # noqa: E402
+
+
+def legacy_counts(document: Document) -> dict:
+    """Contagem anterior à varredura linear, mantida só como referência"""
+    paragraph_count = image_count = table_count = 0
+    for element in document.element.body:
+        if element.tag.endswith('p'):
+            paragraph_count += 1
+            para = None
+            for p in document.paragraphs:
+                if p._element == element:
+                    para = p
+                    break
+            if para:
+                for run in para.runs:
+                    if run._element.xpath('.//w:drawing') or run._element.xpath('.//w:pict'):
+                        image_count += 1
+                        break
+        elif element.tag.endswith('tbl'):
+            table_count += 1
+    return {'total_paragraphs': paragraph_count, 'total_images': image_count, 'total_tables': table_count}
+
+
+def best_of(func, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 4000, 8000])
+    parser.add_argument('--legacy-max', type=int, default=4000,
+                        help='maior livro medido com a contagem antiga (ela é quadrática)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workdir', default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    print(f"{'parágrafos':>10} {'linear (s)':>11} {'antiga (s)':>11}  contagens")
+    for size in args.sizes:
+        path = ensure_book(os.path.join(args.workdir, f'bench_book_{size}.docx'), size)
+        document = Document(path)
+
+        def linear():
+            # Instância nova a cada rodada: a varredura é cacheada por leitor
+            return DocumentReader(document).get_document_info()
+
+        linear_time, info = best_of(linear, args.repeat)
+        counts = {key: info[key] for key in ('total_paragraphs', 'total_images', 'total_tables')}
+        legacy = '-'
+        if size <= args.legacy_max:
+            legacy_time, legacy_info = best_of(lambda: legacy_counts(document), 1)
+            assert legacy_info == counts, (legacy_info, counts)
+            legacy = f'{legacy_time:.2f}'
+        print(f'{counts["total_paragraphs"]:>10} {linear_time:>11.4f} {legacy:>11}  {counts}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark de DocumentReader.read_paragraphs nos três modos de leitura
+(Config.READER_MODE) em livros sintéticos, conferindo que 'fast' e 'stream'
+produzem os mesmos elementos que 'docx'.
+
+    python benchmarks/bench_reader.py --sizes 2000 10000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document  # noqa: E402
+from backend.document_reader import DocumentReader  # noqa: E402
+from benchmarks.synthetic_docx import ensure_book  # noqa: E402
+
+MODES = ('docx', 'fast', 'stream')
+_NODE_KEYS = ('original_element', 'paragraph_object')
+
+
+def read(path: str, mode: str):
+    # 'docx' e 'fast' recebem o Document já carregado, como no pipeline
+    source = path if mode == 'stream' else Document(path)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        elements = DocumentReader(source, mode=mode).read_paragraphs()
+    elapsed = time.perf_counter() - started
+    return elapsed, [{k: v for k, v in dict(e).items() if k not in _NODE_KEYS} for e in elements]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workdir', default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    print(f"{'elementos':>10} " + ' '.join(f'{mode + " (s)":>11}' for mode in MODES) + '  iguais')
+    for size in args.sizes:
+        path = ensure_book(os.path.join(args.workdir, f'bench_book_{size}.docx'), size)
+        times, outputs = {}, {}
+        for mode in MODES:
+            runs = [read(path, mode) for _ in range(args.repeat)]
+            times[mode] = min(elapsed for elapsed, _ in runs)
+            outputs[mode] = runs[0][1]
+        same = all(outputs[mode] == outputs['docx'] for mode in MODES)
+        print(f'{len(outputs["docx"]):>10} ' + ' '.join(f'{times[mode]:>11.3f}' for mode in MODES) + f'  {same}')
+
+
+if __name__ == '__main__':
+    main()
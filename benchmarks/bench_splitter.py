@@ -0,0 +1,86 @@
+"""
+Benchmark do DocumentSplitter em livros sintéticos com dezenas de simulados:
+split_simulados comparado com a divisão antiga (document.paragraphs[i] a cada
+parágrafo, quadrática) e o tempo de gerar todos os documentos (por simulado e
+completos).
+
+    python benchmarks/bench_splitter.py --sizes 2500 5000 10000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document  # noqa: E402
+from backend.document_reader import DocumentReader  # noqa: E402
+from backend.document_splitter import DocumentSplitter  # noqa: E402
+from benchmarks.synthetic_docx import ensure_book  # noqa: E402
+
+STYLES = [{'marker': '[[ENUNCIADO]]', 'name': 'Enunciado', 'prompt': 'enunciado da questão'},
+          {'marker': '[[GABARITO]]', 'name': 'Gabarito', 'prompt': 'resposta alternativa correta'}]
+
+
+def legacy_boundaries(splitter: DocumentSplitter, document: Document):
+    """Divisão anterior ao snapshot, mantida só como referência"""
+    positions = []
+    for i, para in enumerate(document.paragraphs):
+        text = para.text.strip()
+        if splitter._is_simulado_title(text, para):
+            match = splitter.simulado_pattern.search(text)
+            if match:
+                positions.append((int(match.group(1)), i))
+    boundaries = []
+    for idx, (number, start) in enumerate(positions):
+        end = positions[idx + 1][1] if idx + 1 < len(positions) else len(document.paragraphs)
+        content = [document.paragraphs[i] for i in range(start, end)]
+        boundaries.append((number, start, end - 1, len(content)))
+    return boundaries
+
+
+def timed(func):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2500, 5000, 10000])
+    parser.add_argument('--legacy-max', type=int, default=5000,
+                        help='maior livro medido com a divisão antiga (ela é quadrática)')
+    parser.add_argument('--workdir', default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    print(f"{'parágrafos':>10} {'simulados':>9} {'split (s)':>10} {'antigo (s)':>11} {'documentos (s)':>15} {'docs':>5}")
+    for size in args.sizes:
+        path = ensure_book(os.path.join(args.workdir, f'bench_book_{size}.docx'), size)
+        document = Document(path)
+        _, marked = timed(lambda: DocumentReader(document).read_paragraphs())
+        for element in marked:
+            element['markers'] = ['[[GABARITO]]'] if element['text'].startswith('Resposta') else ['[[ENUNCIADO]]']
+
+        splitter = DocumentSplitter()
+        split_time, simulados = timed(lambda: splitter.split_simulados(document))
+        build_time, documents = timed(lambda: {
+            **splitter.create_split_documents(simulados, document, marked, STYLES),
+            **splitter.create_complete_documents(document, marked)
+        })
+
+        legacy = '-'
+        if size <= args.legacy_max:
+            legacy_time, boundaries = timed(lambda: legacy_boundaries(splitter, document))
+            assert boundaries == [(s['number'], s['start_index'], s['end_index'], s['paragraph_count'])
+                                  for s in simulados]
+            legacy = f'{legacy_time:.2f}'
+        print(f'{len(document.paragraphs):>10} {len(simulados):>9} {split_time:>10.3f} {legacy:>11} '
+              f'{build_time:>15.2f} {len(documents):>5}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Gera livros .docx sintéticos para os benchmarks: títulos "Simulado N",
+enunciados, alternativas, respostas, texto corrido, imagens inline e tabelas.
+"""
+import io
+import os
+import random
+import struct
+import sys
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document  # noqa: E402
+from docx.shared import Inches, Pt  # noqa: E402
+
+# Parágrafos gerados por questão (enunciado, 5 alternativas, resposta, texto)
+PARAGRAPHS_PER_QUESTION = 8
+
+
+def _png(seed: int, size: int = 32) -> bytes:
+    """PNG RGB com ruído: cada imagem é diferente, como num livro real"""
+    rnd = random.Random(seed)
+    raw = b''.join(b'\x00' + bytes(rnd.randrange(256) for _ in range(size * 3)) for _ in range(size))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b'')
+
+
+def build_book(paragraphs: int, simulados: int = 40, image_every: int = 20, table_every: int = 10) -> Document:
+    """
+    Livro com cerca de 'paragraphs' parágrafos divididos em 'simulados' simulados.
+    Uma questão a cada 'image_every' ganha uma imagem e uma a cada 'table_every',
+    uma tabela (0 desativa).
+    """
+    document = Document()
+    document.add_paragraph('Apresentação do livro')
+    questions = max(1, paragraphs // PARAGRAPHS_PER_QUESTION // simulados)
+    for s in range(1, simulados + 1):
+        document.add_paragraph(f'Simulado {s}', style='Heading 1')
+        for q in range(questions):
+            document.add_paragraph(f'{q + 1}. Enunciado da questão {q + 1} do simulado {s} com algum texto.')
+            if image_every and q % image_every == 0:
+                document.add_paragraph().add_run().add_picture(io.BytesIO(_png(s * 1000 + q)), width=Inches(1))
+            for letter in 'abcde':
+                run = document.add_paragraph().add_run(f'{letter}) alternativa {letter}')
+                run.font.size = Pt(11)
+            document.add_paragraph('Resposta: alternativa c')
+            document.add_paragraph('Texto corrido citando o Simulado 2 no meio de uma frase longa que não é título. ' * 2)
+            if table_every and q % table_every == table_every - 1:
+                table = document.add_table(rows=2, cols=3)
+                for c, text in enumerate(('Item', 'Valor', 'Fonte')):
+                    table.cell(0, c).text = text
+    return document
+
+
+def ensure_book(path: str, paragraphs: int, **kwargs) -> str:
+    """Gera o livro em 'path' se ainda não existir (a geração é lenta em livros grandes)"""
+    if not os.path.exists(path):
+        build_book(paragraphs, **kwargs).save(path)
+    return path
@@ -0,0 +1,82 @@
+import base64
+import io
+import os
+import sys
+
+import pytest
+
+# Permite importar 'backend' e 'api' rodando o pytest de qualquer diretório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document  # noqa: E402
+from docx.enum.text import WD_BREAK, WD_UNDERLINE  # noqa: E402
+from docx.oxml import parse_xml  # noqa: E402
+from docx.shared import Pt, RGBColor  # noqa: E402
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+# PNG 1x1 transparente
+PNG_1X1 = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+
+def build_sample_document(questions: int = 3) -> Document:
+    """
+    Documento sintético com o que os caminhos rápido e python-docx precisam
+    tratar igual: formatação de run variada (fonte, cor preta, w:sz="0", cor 'auto'),
+    estilos, listas, quebras de linha, hiperlinks, imagens e tabelas mescladas.
+    """
+    document = Document()
+    document.add_heading('Simulado 1', level=1)
+    for q in range(questions):
+        paragraph = document.add_paragraph()
+        run = paragraph.add_run(f'{q + 1}. Enunciado da questão ')
+        run.bold = True
+        run.font.size = Pt(12)
+        run.font.color.rgb = RGBColor(0, 0, 0)
+        run.font.name = 'Arial'
+        run = paragraph.add_run('com destaque')
+        run.italic = True
+        run.font.underline = WD_UNDERLINE.DOUBLE
+        run.font.color.rgb = RGBColor(0x33, 0x66, 0x99)
+        run = paragraph.add_run(' e tamanho zero.')
+        run._r.get_or_add_rPr().append(parse_xml(f'<w:sz {W} w:val="0"/>'))
+        run._r.get_or_add_rPr().append(parse_xml(f'<w:color {W} w:val="auto"/>'))
+
+        for letter in 'abcd':
+            document.add_paragraph(f'{letter}) alternativa {letter}', style='List Bullet')
+
+        paragraph = document.add_paragraph('Resolução: primeira linha')
+        paragraph.runs[0].add_break(WD_BREAK.LINE)
+        paragraph.add_run('segunda linha').underline = True
+        paragraph.runs[-1].add_break(WD_BREAK.LINE)
+        paragraph.add_run('Gabarito: C')
+
+        if q % 2 == 0:
+            document.add_picture(io.BytesIO(PNG_1X1))
+            paragraph = document.add_paragraph('Figura com texto ')
+            paragraph.add_run().add_picture(io.BytesIO(PNG_1X1))
+
+        document.add_paragraph('')
+
+    paragraph = document.add_paragraph('Veja ')
+    paragraph._p.append(parse_xml(
+        f'<w:hyperlink {W} w:anchor="_Ref1"><w:r><w:t>o item 1</w:t></w:r></w:hyperlink>'))
+    paragraph.add_run(' acima.')
+
+    table = document.add_table(rows=3, cols=3)
+    table.cell(0, 0).merge(table.cell(0, 1)).text = 'Cabeçalho mesclado'
+    table.cell(0, 2).text = 'Valor'
+    table.cell(1, 0).merge(table.cell(2, 0)).text = 'Linha mesclada'
+    table.cell(1, 1).text = 'x'
+    table.cell(2, 2).text = 'y'
+    document.add_paragraph('Fim do simulado.')
+    return document
+
+
+@pytest.fixture
+def sample_docx(tmp_path) -> str:
+    path = str(tmp_path / 'sample.docx')
+    build_sample_document().save(path)
+    return path
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import re
+
+import httpx
+import pytest
+
+from backend import ai_processor
+from backend.ai_processor import AIProcessor
+from backend.config import Config
+
+STYLES = [{'name': 'Enunciado', 'marker': '[[ENUNCIADO]]', 'prompt': 'enunciado de questão'},
+          {'name': 'Gabarito', 'marker': '[[GABARITO]]', 'prompt': 'linha do gabarito'}]
+_BATCH_ITEM = re.compile(r'<<(\d+)>> """(.*?)"""', re.S)
+_SINGLE_ITEM = re.compile(r'PARÁGRAFO ATUAL PARA CLASSIFICAR: """(.*?)"""', re.S)
+
+
+_real_sleep = asyncio.sleep
+
+
+class MockApi:
+    """
+    Servidor falso: 'GABARITO' recebe [[GABARITO]] e o resto [[ENUNCIADO]]; com
+    drop_first, cada lote deixa o primeiro índice sem resposta. As respostas de
+    'scripted' ((status, cabeçalhos)) são servidas antes, uma por requisição;
+    'headers' vai em todas as respostas 200.
+    """
+
+    def __init__(self):
+        self.drop_first = True
+        self.dropped = []
+        # Textos classificados, um por parágrafo pedido
+        self.classified = []
+        self.scripted = []
+        self.headers = {}
+        self.requests = []
+        # Esperas (backoff e baldes) pedidas pelo AIProcessor, em segundos
+        self.sleeps = []
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        data = json.loads(request.content)
+        self.requests.append(data)
+        await _real_sleep(0.005)
+        if self.scripted:
+            status, headers = self.scripted.pop(0)
+            return httpx.Response(status, headers=headers, json={'error': {'message': 'falha simulada'}})
+        if 'response_format' in data:
+            items = [(int(i), text) for i, text in _BATCH_ITEM.findall(data['messages'][1]['content'])]
+            if self.drop_first:
+                self.dropped.append(items.pop(0)[0])
+            self.classified.extend(text for _, text in items)
+            results = [{'index': i, 'marker': self._marker(text)} for i, text in items]
+            content = json.dumps({'results': results})
+        else:
+            text = _SINGLE_ITEM.search(data['messages'][1]['content']).group(1)
+            self.classified.append(text)
+            content = self._marker(text)
+        return httpx.Response(200, headers=self.headers, json={
+            'choices': [{'message': {'content': content}}],
+            'usage': {'prompt_tokens': 1, 'completion_tokens': 1}
+        })
+
+    @staticmethod
+    def _marker(text: str) -> str:
+        return '[[GABARITO]]' if text == 'GABARITO' else '[[ENUNCIADO]]'
+
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    api = MockApi()
+    transport = httpx.MockTransport(api.handler)
+    real_client = httpx.AsyncClient
+
+    async def fake_sleep(seconds):
+        api.sleeps.append(seconds)
+        await _real_sleep(0)
+
+    monkeypatch.setattr(ai_processor.httpx, 'AsyncClient',
+                        lambda **kwargs: real_client(transport=transport, **kwargs))
+    monkeypatch.setattr(ai_processor.time, 'sleep', api.sleeps.append)
+    monkeypatch.setattr(ai_processor.asyncio, 'sleep', fake_sleep)
+    return api
+
+
+def _call(processor: AIProcessor, text: str = 'Questão 1: calcule x.'):
+    """Uma chamada simples (sem lote) pelo motor asyncio"""
+    content = processor._build_user_prompt('INÍCIO DO DOCUMENTO', text, 'FIM DO DOCUMENTO', {})
+    data = {'model': processor.model, 'max_tokens': 10,
+            'messages': [{'role': 'system', 'content': 'sistema'}, {'role': 'user', 'content': content}]}
+
+    async def run():
+        async with ai_processor.httpx.AsyncClient() as client:
+            return await processor._call_api_async(client, data, timeout=5)
+    return asyncio.run(run())
+
+
+def test_asyncio_engine_batch_fallback_marks_every_paragraph(mock_api, monkeypatch):
+    # Concorrência inicial baixa obriga as requisições a esperarem pela condição
+    # do rate limiter tanto no loop dos lotes quanto no loop do reprocessamento
+    monkeypatch.setattr(Config, 'AI_INITIAL_CONCURRENCY', 1)
+    paragraphs = [{'index': i, 'text': f'Questão {i}: calcule o valor de x.'} for i in range(60)]
+
+    processor = AIProcessor('test-key', engine='asyncio')
+    result = processor.process_document(paragraphs, STYLES, [], batch_size=10,
+                                        use_cache=False, use_rules=False, deduplicate=False)
+
+    stats = result['stats']
+    assert len(mock_api.dropped) == 6
+    assert stats['batch_calls'] == 6
+    assert stats['batch_fallbacks'] == 6
+    assert stats['marked'] == 60
+    assert stats['failed_requests'] == 0
+
+
+def test_batch_prompt_matches_context_free_cache_key(mock_api, monkeypatch):
+    monkeypatch.setattr(Config, 'AI_CONTEXT_FREE_MAX_CHARS', 10)
+    paragraphs = [
+        {'index': 0, 'text': 'Texto anterior bem específico deste documento.'},
+        {'index': 1, 'text': 'GABARITO'},
+        {'index': 2, 'text': 'Texto posterior bem específico deste documento.'},
+    ]
+    processor = AIProcessor('test-key', engine='asyncio')
+    processor.styles = STYLES
+
+    prompt = processor._build_batch_user_prompt([paragraphs[1]], paragraphs)
+    inputs = processor._classification_inputs(paragraphs[1], paragraphs)
+
+    assert inputs['prev_text'] == inputs['next_text'] == 'CONTEXTO IGNORADO'
+    assert 'específico' not in prompt
+    assert '<<1>> """GABARITO"""' in prompt
+
+    # Os parágrafos com contexto continuam vendo o vizinho sem contexto
+    prompt = processor._build_batch_user_prompt([paragraphs[0], paragraphs[2]], paragraphs)
+    assert 'CONTEXTO (não classificar): """GABARITO"""' in prompt
+
+
+def test_retryable_errors_are_retried(mock_api):
+    mock_api.scripted = [(429, {}), (503, {}), (500, {})]
+    processor = AIProcessor('test-key', engine='asyncio')
+
+    result = _call(processor)
+
+    assert result['choices'][0]['message']['content'] == '[[ENUNCIADO]]'
+    assert len(mock_api.requests) == 4
+    stats = processor.rate_limiter.stats()
+    assert (stats['retries'], stats['throttled_responses'], stats['failed_requests']) == (3, 1, 0)
+
+
+def test_failures_are_counted_once_per_request(mock_api, monkeypatch):
+    monkeypatch.setattr(Config, 'AI_MAX_RETRIES', 2)
+    processor = AIProcessor('test-key', engine='asyncio')
+
+    mock_api.scripted = [(400, {})]
+    assert _call(processor) is None
+    assert len(mock_api.requests) == 1
+
+    mock_api.scripted = [(502, {})] * 3
+    assert _call(processor) is None
+    assert len(mock_api.requests) == 4
+
+    stats = processor.rate_limiter.stats()
+    assert (stats['retries'], stats['failed_requests']) == (2, 2)
+
+
+def test_throttle_halves_concurrency(mock_api, monkeypatch):
+    monkeypatch.setattr(Config, 'AI_INITIAL_CONCURRENCY', 8)
+    processor = AIProcessor('test-key', engine='asyncio')
+    mock_api.scripted = [(429, {})]
+
+    _call(processor)
+
+    # 8 -> 4 no 429 e +1/4 (aumento aditivo) na resposta seguinte
+    assert processor.rate_limiter.concurrency_limit == pytest.approx(4.25)
+
+
+def test_requests_wait_for_the_token_bucket(mock_api):
+    processor = AIProcessor('test-key', engine='asyncio')
+    # 60 requisições por minuto e nenhuma sobrando: a próxima ficha sai em ~1s
+    mock_api.headers = {'x-ratelimit-limit-requests': '60', 'x-ratelimit-remaining-requests': '0'}
+
+    _call(processor)
+    assert mock_api.sleeps == []
+    _call(processor)
+
+    assert len(mock_api.sleeps) == 1
+    assert 0.9 < mock_api.sleeps[0] <= 1.0
+    assert processor.rate_limiter.stats()['throttle_time_s'] >= 0.9
+
+
+def test_backoff_follows_retry_after_and_reset_headers(mock_api):
+    processor = AIProcessor('test-key', engine='asyncio')
+    mock_api.scripted = [(429, {'retry-after': '7'}),
+                         (429, {'x-ratelimit-reset-requests': '1m30s', 'x-ratelimit-reset-tokens': '2s'}),
+                         (503, {'retry-after-ms': '4500'})]
+
+    _call(processor)
+
+    # O jitter das três primeiras tentativas (até 1s, 2s e 4s) fica abaixo dos cabeçalhos
+    assert mock_api.sleeps == [7.0, 2.0, 4.5]
+
+
+@pytest.mark.parametrize('batch_size', [10, 1])
+def test_dedup_sends_one_request_per_group(mock_api, monkeypatch, batch_size):
+    # Linhas curtas ignoram o contexto, então os 'GABARITO' têm entradas idênticas
+    monkeypatch.setattr(Config, 'AI_CONTEXT_FREE_MAX_CHARS', 10)
+    mock_api.drop_first = False
+    paragraphs = []
+    for q in range(5):
+        paragraphs.append({'index': len(paragraphs), 'text': f'Questão {q}: calcule o valor de x.'})
+        paragraphs.append({'index': len(paragraphs), 'text': 'GABARITO'})
+
+    processor = AIProcessor('test-key', engine='asyncio')
+    result = processor.process_document(paragraphs, STYLES, [], batch_size=batch_size,
+                                        use_cache=False, use_rules=False, deduplicate=True)
+
+    assert mock_api.classified.count('GABARITO') == 1
+    # Lotes: um com as questões e outro só com o representante sem contexto
+    assert len(mock_api.requests) == (2 if batch_size > 1 else 6)
+    assert result['stats']['deduplicated'] == 4
+    marked = result['marked_content']
+    answers = [para for para in marked if para['text'] == 'GABARITO']
+    assert [para['markers'] for para in answers] == [['[[GABARITO]]']] * 5
+    assert len({id(para['markers']) for para in answers}) == 5
+    assert all(para['markers'] == ['[[ENUNCIADO]]'] for para in marked if para['text'] != 'GABARITO')
@@ -0,0 +1,60 @@
+import itertools
+
+import pytest
+
+from backend import classification_cache
+from backend.ai_processor import AIProcessor
+from backend.classification_cache import ClassificationCache
+
+STYLES = [{'name': 'Enunciado', 'marker': '[[ENUNCIADO]]', 'prompt': 'enunciado de questão'},
+          {'name': 'Gabarito', 'marker': '[[GABARITO]]', 'prompt': 'linha com a resposta correta'}]
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # Relógio que sempre avança, para a ordem de uso não depender da resolução de time.time()
+    clock = itertools.count(1)
+    monkeypatch.setattr(classification_cache.time, 'time', lambda: float(next(clock)))
+    cache = ClassificationCache(str(tmp_path / 'cache.sqlite3'), max_entries=3)
+    yield cache
+    cache.close()
+
+
+def _system_prompt(styles) -> str:
+    processor = AIProcessor('test-key')
+    processor.styles = styles
+    return processor._build_system_prompt()
+
+
+def test_stats_count_hits_and_misses_per_lookup(cache):
+    cache.put_many({'a': '[[ENUNCIADO]]', 'b': '[[GABARITO]]'})
+
+    found = cache.get_many(['a', 'a', 'c'])
+
+    assert found == {'a': '[[ENUNCIADO]]'}
+    assert cache.get('b') == '[[GABARITO]]'
+    assert cache.stats() == {'cache_hits': 3, 'cache_misses': 1}
+
+
+def test_eviction_drops_least_recently_used(cache):
+    for key in ('a', 'b', 'c'):
+        cache.put_many({key: '[[ENUNCIADO]]'})
+    # 'a' é consultada de novo e passa a ser a mais recente
+    assert cache.get('a') == '[[ENUNCIADO]]'
+
+    cache.put_many({'d': '[[GABARITO]]'})
+
+    assert set(cache.get_many(['a', 'b', 'c', 'd'])) == {'a', 'c', 'd'}
+
+
+def test_key_changes_with_style_prompt_and_model():
+    inputs = {'prev_text': '', 'text': 'GABARITO: C', 'next_text': ''}
+    prompt = _system_prompt(STYLES)
+    key = ClassificationCache.make_key('gpt-4o-mini', prompt, inputs)
+
+    changed_styles = [dict(STYLES[0]), dict(STYLES[1], prompt='letra da alternativa correta')]
+
+    assert ClassificationCache.make_key('gpt-4o-mini', _system_prompt(STYLES), dict(inputs)) == key
+    assert ClassificationCache.make_key('gpt-4o-mini', _system_prompt(changed_styles), inputs) != key
+    assert ClassificationCache.make_key('gpt-4o', prompt, inputs) != key
+    assert ClassificationCache.make_key('gpt-4o-mini', prompt, dict(inputs, next_text='Questão 2')) != key
@@ -0,0 +1,27 @@
+import pytest
+
+from backend.document_reader import DocumentReader
+
+# Referências a nós do XML/objetos do python-docx, que não se comparam entre modos
+_NODE_KEYS = ('original_element', 'paragraph_object')
+
+
+def _read(path: str, mode: str):
+    elements = []
+    for element in DocumentReader(path, mode=mode).iter_paragraphs():
+        elements.append({key: value for key, value in dict(element).items() if key not in _NODE_KEYS})
+    return elements
+
+
+@pytest.mark.parametrize('mode', ['fast', 'stream'])
+def test_fast_modes_match_docx_mode(sample_docx, mode):
+    expected = _read(sample_docx, 'docx')
+    assert any(element['type'] == 'table' for element in expected)
+    assert any(element.get('is_image_paragraph') for element in expected)
+    assert _read(sample_docx, mode) == expected
+
+
+def test_zero_font_size_reads_as_none(sample_docx):
+    runs = [run for element in _read(sample_docx, 'fast') for run in element.get('runs', [])
+            if run['text'] == ' e tamanho zero.']
+    assert runs and all(run['font_size'] is None for run in runs)
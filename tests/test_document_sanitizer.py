@@ -0,0 +1,111 @@
+import contextlib
+import io
+
+import pytest
+from docx import Document
+from docx.shared import Pt
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from backend.config import Config
+from backend.document_sanitizer import DocumentSanitizer
+
+
+def _sanitized_body(path: str, mode: str, monkeypatch) -> bytes:
+    monkeypatch.setattr(Config, 'SANITIZER_MODE', mode)
+    document = Document(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sanitizer = DocumentSanitizer(document, profile='legacy')
+        sanitizer.sanitize_local_formatting()
+    return etree.tostring(document.element.body), sanitizer.stats
+
+
+def test_fast_path_matches_docx_path(sample_docx, monkeypatch):
+    slow_xml, slow_stats = _sanitized_body(sample_docx, 'docx', monkeypatch)
+    fast_xml, fast_stats = _sanitized_body(sample_docx, 'fast', monkeypatch)
+
+    assert slow_xml != etree.tostring(Document(sample_docx).element.body)
+    assert fast_xml == slow_xml
+    for key in ('paragraphs_processed', 'styles_preserved'):
+        assert fast_stats[key] == slow_stats[key], key
+    # row.cells devolve a célula mesclada uma vez por coluna/linha que ela cobre,
+    # então o caminho 'docx' conta os runs dela mais de uma vez; o rápido, uma só
+    merged_cell_repeats = 2
+    assert fast_stats['runs_cleaned'] == slow_stats['runs_cleaned'] - merged_cell_repeats
+
+
+@pytest.mark.parametrize('tag', ['w:sz', 'w:color', 'w:rFonts'])
+def test_fast_path_removes_legacy_formatting(sample_docx, monkeypatch, tag):
+    fast_xml, _ = _sanitized_body(sample_docx, 'fast', monkeypatch)
+    body = etree.fromstring(fast_xml)
+    values = [element.get('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}val')
+              for element in body.iter('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+                                       + tag.split(':')[1])]
+    if tag == 'w:sz':
+        assert values == ['0'] * len(values)
+    elif tag == 'w:color':
+        assert '000000' not in values
+    else:
+        assert values == []
+
+
+def _sanitized_header(path: str, monkeypatch, workers: int):
+    monkeypatch.setattr(Config, 'SANITIZER_WORKERS', workers)
+    monkeypatch.setattr(Config, 'SANITIZER_PARALLEL_MIN_BYTES', 0)
+    document = Document(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        DocumentSanitizer(document, profile='default').sanitize_local_formatting()
+    return etree.tostring(document.sections[0].header._element)
+
+
+def test_part_pool_is_shared_between_sanitizations(tmp_path, monkeypatch):
+    from backend import document_sanitizer
+
+    document = Document()
+    run = document.sections[0].header.paragraphs[0].add_run('Cabeçalho do livro')
+    run.font.name = 'Arial'
+    run.font.size = Pt(9)
+    path = str(tmp_path / 'header.docx')
+    document.save(path)
+
+    inline = _sanitized_header(path, monkeypatch, workers=1)
+    assert document_sanitizer._part_executor is None
+
+    try:
+        first = _sanitized_header(path, monkeypatch, workers=2)
+        executor = document_sanitizer._part_executor
+        second = _sanitized_header(path, monkeypatch, workers=2)
+        assert executor is not None
+        assert document_sanitizer._part_executor is executor
+    finally:
+        document_sanitizer._discard_part_executor()
+
+    assert first == second == inline
+    assert b'Arial' not in inline
+
+
+def test_default_profile_cleans_nested_tables_and_merge_continuations(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SANITIZER_MODE', 'fast')
+    document = Document()
+    outer = document.add_table(rows=2, cols=1)
+    nested = outer.cell(0, 0).add_table(rows=1, cols=1)
+    runs = [nested.cell(0, 0).paragraphs[0].add_run('Tabela aninhada')]
+    merged = document.add_table(rows=2, cols=1)
+    merged.cell(0, 0).merge(merged.cell(1, 0))
+    # Parágrafo que ficou na célula de continuação da mescla vertical
+    continuation = Paragraph(merged.rows[1]._tr.tc_lst[0].add_p(), None)
+    runs.append(continuation.add_run('Continuação'))
+    for run in runs:
+        run.font.name = 'Arial'
+        run.font.size = Pt(14)
+    path = str(tmp_path / 'aninhada.docx')
+    document.save(path)
+
+    document = Document(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        DocumentSanitizer(document, profile='default').sanitize_local_formatting()
+
+    body = etree.tostring(document.element.body)
+    assert b'Tabela aninhada' in body and b'Continua' in body
+    assert b'<w:sz ' not in body
+    assert b'<w:rFonts ' not in body
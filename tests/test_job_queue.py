@@ -0,0 +1,168 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from backend import job_queue as job_queue_module
+from backend.config import Config
+from backend.file_manager import FileManager
+from backend.job_queue import JobQueue, JobStore
+
+
+@pytest.fixture
+def isolated_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'JOBS_DIR', str(tmp_path / 'jobs'))
+    monkeypatch.setattr(Config, 'WORKSPACE_DIR', str(tmp_path / 'workspaces'))
+    return tmp_path
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _set_owner(store: JobStore, job_id: str, pid: int):
+    with store._connect() as conn:
+        conn.execute('UPDATE jobs SET owner_pid = ? WHERE id = ?', (pid, job_id))
+
+
+def test_jobs_of_a_dead_process_are_failed_on_startup(isolated_dirs):
+    store = JobStore()
+    dead = _dead_pid()
+    for job_id, state in (('queued-job', 'queued'), ('running-job', 'running'), ('done-job', 'completed')):
+        store.create(job_id, 'Livro')
+        store.update(job_id, state=state)
+        _set_owner(store, job_id, dead)
+        os.makedirs(os.path.join(Config.WORKSPACE_DIR, job_id))
+    store.create('live-job', 'Livro')
+    _set_owner(store, 'live-job', os.getppid())
+
+    JobQueue()
+
+    assert store.get('queued-job')['state'] == 'failed'
+    assert store.get('running-job')['state'] == 'failed'
+    assert store.get('done-job')['state'] == 'completed'
+    assert store.get('live-job')['state'] == 'queued'
+    assert sorted(os.listdir(Config.WORKSPACE_DIR)) == ['done-job']
+
+
+def test_event_stream_stops_when_job_is_idle(isolated_dirs, monkeypatch):
+    from api import routes
+
+    monkeypatch.setattr(routes, 'job_queue', JobQueue())
+    monkeypatch.setattr(Config, 'SSE_IDLE_TIMEOUT_SECONDS', 0)
+    monkeypatch.setattr(Config, 'SSE_POLL_INTERVAL', 0)
+    routes.job_queue.store.create('stuck-job', 'Livro')
+    _set_owner(routes.job_queue.store, 'stuck-job', os.getppid())
+
+    response = routes.app.test_client().get('/api/jobs/stuck-job/events')
+    body = response.get_data(as_text=True)
+
+    assert 'event: progress' in body
+    assert body.rstrip().splitlines()[-2] == 'event: error'
+
+
+def _quick_job(*args):
+    """Substitui run_job nos workers: os testes verificam o pool, não o pipeline"""
+    return None
+
+
+def _exit_worker(*args):
+    """Worker morto no meio do job (ex.: falta de memória num livro grande)"""
+    os._exit(1)
+
+
+def _submit(queue: JobQueue, job_id: str) -> str:
+    workspace = FileManager.create_workspace(job_id)
+    return queue.submit(os.path.join(workspace, 'livro.docx'), 'Livro', 'key', [], [], job_id=job_id)
+
+
+def _wait_for_state(queue: JobQueue, job_id: str, state: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while queue.get(job_id)['state'] != state and time.time() < deadline:
+        time.sleep(0.05)
+    return queue.get(job_id)['state']
+
+
+def test_broken_pool_is_replaced_on_next_submit(isolated_dirs, monkeypatch):
+    monkeypatch.setattr(job_queue_module, 'run_job', _quick_job)
+    queue = JobQueue(max_workers=1)
+    try:
+        broken = queue._get_executor()
+        with pytest.raises(BrokenProcessPool):
+            broken.submit(os._exit, 1).result(timeout=60)
+
+        job_id = _submit(queue, 'after-crash')
+
+        assert queue._executor is not broken
+        assert queue.get(job_id)['state'] == 'queued'
+    finally:
+        queue.shutdown()
+    # O job rodou no pool novo sem falhar
+    assert queue.get(job_id)['state'] == 'queued'
+    assert queue.get(job_id)['error'] is None
+
+
+def test_failed_enqueue_marks_job_failed_and_removes_workspace(isolated_dirs, monkeypatch):
+    class AlwaysBroken:
+        def submit(self, *args):
+            raise BrokenProcessPool('pool inutilizável')
+
+        def shutdown(self, wait=True):
+            pass
+
+    queue = JobQueue(max_workers=1)
+    monkeypatch.setattr(queue, '_get_executor', lambda: AlwaysBroken())
+
+    with pytest.raises(BrokenProcessPool):
+        _submit(queue, 'never-queued')
+
+    assert queue.get('never-queued')['state'] == 'failed'
+    assert not os.path.exists(FileManager.workspace_path('never-queued'))
+
+
+def test_worker_death_during_job_fails_it_and_drops_the_pool(isolated_dirs, monkeypatch):
+    monkeypatch.setattr(job_queue_module, 'run_job', _exit_worker)
+    queue = JobQueue(max_workers=1)
+    try:
+        executor = queue._get_executor()
+        job_id = _submit(queue, 'killed-job')
+
+        assert _wait_for_state(queue, job_id, 'failed') == 'failed'
+        assert queue._executor is not executor
+        assert not os.path.exists(FileManager.workspace_path(job_id))
+    finally:
+        queue.shutdown()
+
+
+def test_uploads_with_the_same_name_get_separate_workspaces(isolated_dirs, monkeypatch):
+    from api import routes
+
+    submitted = []
+
+    class RecordingQueue:
+        def submit(self, file_path, *args, job_id=None, **kwargs):
+            submitted.append((job_id, file_path))
+            return job_id
+
+    monkeypatch.setattr(routes, 'job_queue', RecordingQueue())
+    client = routes.app.test_client()
+    for content in (b'primeiro', b'segundo'):
+        response = client.post('/api/jobs', content_type='multipart/form-data', data={
+            'file': (io.BytesIO(content), 'livro.docx'), 'book_name': 'Livro', 'api_key': 'chave',
+            'styles': json.dumps([{'name': 'Enunciado'}])})
+        assert response.status_code == 202
+
+    (first_id, first_path), (second_id, second_path) = submitted
+    assert first_id != second_id
+    assert first_path == os.path.join(Config.WORKSPACE_DIR, first_id, 'livro.docx')
+    assert second_path == os.path.join(Config.WORKSPACE_DIR, second_id, 'livro.docx')
+    with open(first_path, 'rb') as first, open(second_path, 'rb') as second:
+        assert (first.read(), second.read()) == (b'primeiro', b'segundo')
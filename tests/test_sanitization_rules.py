@@ -0,0 +1,62 @@
+from docx import Document
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.opc.part import Part
+from docx.oxml import parse_xml
+
+from backend.sanitization_rules import (SANITIZATION_PROFILES, SANITIZATION_RULES, compile_profile,
+                                        remove_unreferenced_bookmarks)
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def _bookmark(bookmark_id: str, name: str) -> str:
+    return (f'<w:bookmarkStart w:id="{bookmark_id}" w:name="{name}"/>'
+            f'<w:r><w:t>{name}</w:t></w:r><w:bookmarkEnd w:id="{bookmark_id}"/>')
+
+
+def _body_paragraph(document, inner: str):
+    body = document.element.body
+    body.insert(len(body) - 1, parse_xml(f'<w:p {W}>{inner}</w:p>'))
+
+
+def _bookmark_names(document) -> set:
+    return {element.get('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}name')
+            for element in document.element.body.iter(
+                '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}bookmarkStart')}
+
+
+def test_field_instruction_split_across_runs_keeps_its_bookmark():
+    document = Document()
+    _body_paragraph(document, _bookmark('1', '_Toc123456') + _bookmark('2', '_GoBack'))
+    _body_paragraph(document,
+                    '<w:r><w:fldChar w:fldCharType="begin"/></w:r>'
+                    '<w:r><w:instrText xml:space="preserve"> PAGEREF _Toc12</w:instrText></w:r>'
+                    '<w:r><w:instrText xml:space="preserve">3456 \\h </w:instrText></w:r>'
+                    '<w:r><w:fldChar w:fldCharType="separate"/></w:r>'
+                    '<w:r><w:t>7</w:t></w:r>'
+                    '<w:r><w:fldChar w:fldCharType="end"/></w:r>')
+
+    assert remove_unreferenced_bookmarks(document) == 2
+    assert _bookmark_names(document) == {'_Toc123456'}
+
+
+def test_reference_from_footnotes_part_keeps_its_bookmark():
+    document = Document()
+    _body_paragraph(document, _bookmark('1', '_Ref42') + _bookmark('2', '_Ref43'))
+    footnotes = (f'<w:footnotes {W}><w:footnote w:id="1"><w:p>'
+                 '<w:fldSimple w:instr=" REF _Ref42 \\h "><w:r><w:t>1</w:t></w:r></w:fldSimple>'
+                 '</w:p></w:footnote></w:footnotes>').encode('utf-8')
+    part = Part(PackURI('/word/footnotes.xml'), CT.WML_FOOTNOTES, footnotes, document.part.package)
+    document.part.relate_to(part, RT.FOOTNOTES)
+
+    remove_unreferenced_bookmarks(document)
+    assert _bookmark_names(document) == {'_Ref42'}
+
+
+def test_rule_names_are_unique_and_profiles_reference_known_rules():
+    names = [name for name, _, _ in SANITIZATION_RULES]
+    assert len(names) == len(set(names))
+    for profile, enabled in SANITIZATION_PROFILES.items():
+        assert set(enabled) <= set(names), profile
+        assert sum(len(rules) for rules in compile_profile(profile).values()) == len(set(enabled))
@@ -0,0 +1,247 @@
+import pytest
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+
+from backend.config import Config
+from backend.document_reader import DocumentReader, paragraph_text
+from backend.style_applier import StyleApplier, split_paragraph_at_breaks
+
+from conftest import W, build_sample_document
+
+W14 = 'xmlns:w14="http://schemas.microsoft.com/office/word/2010/wordml"'
+
+
+def _split(inner: str, attrs: str = ''):
+    return split_paragraph_at_breaks(parse_xml(f'<w:p {W} {W14} {attrs}>{inner}</w:p>'))
+
+
+def _text(element) -> str:
+    return ''.join(t.text for t in element.iter(qn('w:t')))
+
+
+def _ppr_children(line):
+    return [child.tag for child in line.find(qn('w:pPr'))]
+
+
+def test_numbering_only_on_first_line():
+    lines = _split('<w:pPr><w:pStyle w:val="ListParagraph"/>'
+                   '<w:numPr><w:ilvl w:val="0"/><w:numId w:val="3"/></w:numPr></w:pPr>'
+                   '<w:r><w:t>um</w:t><w:br/><w:t>dois</w:t><w:br/><w:t>três</w:t></w:r>')
+
+    assert [_text(line) for line in lines] == ['um', 'dois', 'três']
+    assert lines[0].find(qn('w:pPr')).find(qn('w:numPr')) is not None
+    for line in lines[1:]:
+        assert qn('w:numPr') not in _ppr_children(line)
+        assert qn('w:pStyle') in _ppr_children(line)
+
+
+def test_sectpr_only_on_last_line():
+    lines = _split('<w:pPr><w:sectPr><w:pgSz w:w="11906" w:h="16838"/></w:sectPr></w:pPr>'
+                   '<w:r><w:t>um</w:t><w:br/><w:t>dois</w:t><w:cr/><w:t>três</w:t></w:r>')
+
+    assert [qn('w:sectPr') in _ppr_children(line) for line in lines] == [False, False, True]
+
+
+def test_start_and_end_properties_stay_on_first_and_last_line():
+    lines = _split('<w:pPr><w:keepNext/><w:keepLines/><w:pageBreakBefore/>'
+                   '<w:pBdr><w:top w:val="single"/><w:left w:val="single"/><w:bottom w:val="single"/></w:pBdr>'
+                   '<w:spacing w:before="240" w:after="120" w:line="360"/>'
+                   '<w:ind w:left="720" w:hanging="360"/></w:pPr>'
+                   '<w:r><w:t>um</w:t><w:br/><w:t>dois</w:t><w:br/><w:t>três</w:t></w:r>')
+    first, middle, last = (line.find(qn('w:pPr')) for line in lines)
+
+    assert first.find(qn('w:pageBreakBefore')) is not None
+    assert middle.find(qn('w:pageBreakBefore')) is None
+    assert [ppr.find(qn('w:spacing')).get(qn('w:before')) for ppr in (first, middle, last)] == ['240', None, None]
+    assert [ppr.find(qn('w:spacing')).get(qn('w:after')) for ppr in (first, middle, last)] == [None, None, '120']
+    assert [ppr.find(qn('w:spacing')).get(qn('w:line')) for ppr in (first, middle, last)] == ['360'] * 3
+    assert [ppr.find(qn('w:ind')).get(qn('w:hanging')) for ppr in (first, middle, last)] == ['360', None, None]
+    assert [[child.tag for child in ppr.find(qn('w:pBdr'))] for ppr in (first, middle, last)] == [
+        [qn('w:top'), qn('w:left')], [qn('w:left')], [qn('w:left'), qn('w:bottom')]]
+    # w:keepLines no original: as linhas continuam juntas e a última mantém com o próximo
+    assert all(ppr.find(qn('w:keepNext')) is not None for ppr in (first, middle, last))
+
+
+def test_keep_next_only_on_last_line():
+    lines = _split('<w:pPr><w:pStyle w:val="Enunciado"/><w:keepNext/></w:pPr>'
+                   '<w:r><w:t>um</w:t><w:br/><w:t>dois</w:t></w:r>')
+
+    assert [qn('w:keepNext') in _ppr_children(line) for line in lines] == [False, True]
+
+
+def test_hyperlink_spanning_a_break_is_recreated_on_each_line():
+    lines = _split('<w:r><w:t>Veja </w:t></w:r>'
+                   '<w:hyperlink w:anchor="_Ref1" w:history="1">'
+                   '<w:r><w:t>a questão</w:t><w:br/><w:t>anterior</w:t></w:r></w:hyperlink>'
+                   '<w:r><w:t>.</w:t></w:r>')
+
+    assert [_text(line) for line in lines] == ['Veja a questão', 'anterior.']
+    for line, text in zip(lines, ('a questão', 'anterior')):
+        hyperlinks = line.findall(qn('w:hyperlink'))
+        assert len(hyperlinks) == 1
+        assert hyperlinks[0].get(qn('w:anchor')) == '_Ref1'
+        assert _text(hyperlinks[0]) == text
+
+
+def test_run_properties_are_copied_to_each_piece():
+    lines = _split('<w:r><w:rPr><w:b/><w:sz w:val="28"/></w:rPr>'
+                   '<w:t>um</w:t><w:br/><w:t>dois</w:t></w:r>')
+
+    pieces = [line.find(qn('w:r')) for line in lines]
+    rprs = [piece.find(qn('w:rPr')) for piece in pieces]
+    assert [_text(piece) for piece in pieces] == ['um', 'dois']
+    assert all(rpr.find(qn('w:b')) is not None for rpr in rprs)
+    assert [rpr.find(qn('w:sz')).get(qn('w:val')) for rpr in rprs] == ['28', '28']
+    # Cópias independentes: mudar uma não altera a outra
+    assert rprs[0] is not rprs[1]
+    rprs[0].remove(rprs[0].find(qn('w:b')))
+    assert rprs[1].find(qn('w:b')) is not None
+
+
+def test_paragraph_ids_only_on_first_line():
+    lines = _split('<w:r><w:t>um</w:t><w:br/><w:t>dois</w:t></w:r>',
+                   'w14:paraId="1A2B3C4D" w14:textId="77777777"')
+
+    para_id = '{http://schemas.microsoft.com/office/word/2010/wordml}paraId'
+    assert [line.get(para_id) for line in lines] == ['1A2B3C4D', None]
+
+
+STYLES = [{'name': 'Gabarito', 'marker': '[[GABARITO]]', 'wordStyle': 'Gabarito'}]
+REMOVALS = [{'name': 'Resolução', 'startMarker': '[[INICIO_RES]]', 'endMarker': '[[FIM_RES]]'},
+            {'name': 'Alternativas', 'startMarker': '[[INICIO_ALT]]', 'endMarker': '[[FIM_ALT]]'}]
+
+
+@pytest.fixture
+def removal_config(monkeypatch):
+    monkeypatch.setattr(Config, 'CONTENT_REMOVAL_ENABLED', True)
+    monkeypatch.setattr(Config, 'STYLE_SPLIT_PARAGRAPHS', True)
+    monkeypatch.setattr(Config, 'READER_TABLE_CELLS', False)
+
+
+def _elements(document):
+    return DocumentReader(document, mode='fast').read_paragraphs()
+
+
+def _find(elements, text: str, nth: int = 0) -> int:
+    return [elem['index'] for elem in elements if elem.get('text') == text][nth]
+
+
+def _mark(elements, markers):
+    """markers: {índice do elemento: [marcadores]}; os demais ficam sem marcador"""
+    for elem in elements:
+        elem['markers'] = markers.get(elem['index'], [])
+
+
+def _remove(document, elements):
+    applier = StyleApplier(document)
+    applier.register_styles(STYLES)
+    applier.apply_styles(elements)
+    applier.remove_marked_content(document, elements, REMOVALS)
+    return applier.removal_stats
+
+
+def _body_lines(document):
+    """Linhas de texto do corpo; iguais antes e depois da divisão dos parágrafos"""
+    return [line for p_element in document.element.body.iterchildren(qn('w:p'))
+            for line in paragraph_text(p_element).split('\n')]
+
+
+def test_touching_ranges_are_merged(removal_config):
+    document = build_sample_document(4)
+    elements = _elements(document)
+    start = _find(elements, 'a) alternativa a')
+    _mark(elements, {start: ['[[INICIO_ALT]]'], start + 3: ['[[FIM_ALT]]'],
+                     start + 4: ['[[INICIO_RES]]'], start + 6: ['[[FIM_RES]]']})
+
+    stats = _remove(document, elements)
+
+    assert (stats['ranges_found'], stats['ranges_applied'], stats['elements_removed']) == (2, 1, 7)
+    lines = _body_lines(document)
+    assert lines[1].startswith('1. Enunciado') and lines[2] == ''
+
+
+def test_range_over_half_the_document_is_skipped(removal_config):
+    document = build_sample_document(4)
+    elements = _elements(document)
+    small = _find(elements, 'a) alternativa a', nth=3)
+    _mark(elements, {1: ['[[INICIO_RES]]'], len(elements) // 2 + 2: ['[[FIM_RES]]'],
+                     small: ['[[INICIO_ALT]]'], small + 1: ['[[FIM_ALT]]']})
+    before = _body_lines(document)
+
+    stats = _remove(document, elements)
+
+    assert (stats['ranges_found'], stats['ranges_applied'], stats['elements_removed']) == (2, 1, 2)
+    after = _body_lines(document)
+    assert len(after) == len(before) - 2
+    assert after.count('a) alternativa a') == 3 and after.count('b) alternativa b') == 3
+
+
+def test_ranges_summing_over_half_cancel_the_removal(removal_config):
+    document = build_sample_document(4)
+    elements = _elements(document)
+    # Trechos separados, cada um com menos da metade, que juntos passam dela
+    first_end = len(elements) // 2 - 2
+    _mark(elements, {0: ['[[INICIO_ALT]]'], first_end: ['[[FIM_ALT]]'],
+                     first_end + 2: ['[[INICIO_RES]]'], first_end + 6: ['[[FIM_RES]]']})
+    before = _body_lines(document)
+
+    stats = _remove(document, elements)
+
+    assert (stats['ranges_found'], stats['ranges_applied'], stats['nodes_removed']) == (2, 0, 0)
+    assert _body_lines(document) == before
+
+
+def test_section_break_paragraph_is_emptied_not_removed(removal_config):
+    document = build_sample_document(4)
+    document.add_paragraph('Última linha da seção')
+    # add_section cria um w:p vazio com o w:sectPr da seção que termina
+    document.add_section()
+    document.add_paragraph('Seção seguinte')
+    elements = _elements(document)
+    section_end = _find(elements, 'Última linha da seção') + 1
+    _mark(elements, {section_end - 2: ['[[INICIO_RES]]'], section_end: ['[[FIM_RES]]']})
+    sections = len(document.sections)
+
+    stats = _remove(document, elements)
+
+    assert stats['section_breaks_kept'] == 1
+    assert stats['nodes_removed'] == 2
+    assert len(document.sections) == sections
+    lines = _body_lines(document)
+    assert 'Última linha da seção' not in lines
+    assert lines[-2:] == ['', 'Seção seguinte']
+
+
+def test_partially_covered_table_is_kept(removal_config, monkeypatch):
+    monkeypatch.setattr(Config, 'READER_TABLE_CELLS', True)
+    document = build_sample_document(2)
+    elements = _elements(document)
+    first_cell = next(elem['index'] for elem in elements if elem.get('cell_paragraph_index') is not None)
+    _mark(elements, {first_cell - 1: ['[[INICIO_RES]]'], first_cell + 1: ['[[FIM_RES]]']})
+
+    stats = _remove(document, elements)
+
+    assert stats['tables_kept'] == 1
+    assert stats['elements_removed'] == 1
+    assert len(document.tables) == 1
+    assert 'Veja o item 1 acima.' not in _body_lines(document)
+
+
+def test_removal_starting_inside_a_split_paragraph(removal_config):
+    document = build_sample_document(4)
+    elements = _elements(document)
+    start = _find(elements, 'segunda linha')
+    _mark(elements, {start - 1: ['[[GABARITO]]'], start: ['[[INICIO_RES]]'],
+                     start + 1: ['[[GABARITO]]', '[[FIM_RES]]']})
+
+    stats = _remove(document, elements)
+
+    assert stats['elements_removed'] == 2
+    assert stats['nodes_removed'] == 2
+    # Só as duas últimas linhas da primeira resolução saem
+    lines = _body_lines(document)
+    assert lines.count('Resolução: primeira linha') == 4
+    assert lines.count('segunda linha') == 3
+    assert lines.count('Gabarito: C') == 3
+    first = lines.index('Resolução: primeira linha')
+    assert lines[first + 1] != 'segunda linha'